@@ -5,7 +5,7 @@ from sqlmodel import SQLModel
 from app.core.config import settings
 from app.models import (
     User, Film, Theater, CinemaRoom, Seat,
-    Showtime, SeatStatus, Booking, BookingDetail
+    Showtime, SeatStatus, Booking, BookingDetail, OutboxEvent, FilmSchedule
 )
 # Alembic Config
 config = context.config
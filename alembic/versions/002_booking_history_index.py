@@ -0,0 +1,32 @@
+"""Composite index for paginated booking history
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "002"
+down_revision: Union[str, Sequence[str], None] = "001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Lịch sử booking của user: WHERE user_id = ? ORDER BY booking_date DESC, id DESC
+    op.create_index(
+        'ix_bookings_user_id_booking_date_id',
+        'bookings',
+        ['user_id', sa.text('booking_date DESC'), sa.text('id DESC')]
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_bookings_user_id_booking_date_id', table_name='bookings')
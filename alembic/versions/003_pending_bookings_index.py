@@ -0,0 +1,33 @@
+"""Partial index for the expired-booking sweeper
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "003"
+down_revision: Union[str, Sequence[str], None] = "002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Chỉ index booking PENDING: WHERE booking_status = 'PENDING' AND booking_date <= ?
+    op.create_index(
+        'ix_bookings_pending_booking_date',
+        'bookings',
+        ['booking_date'],
+        postgresql_where=sa.text("booking_status = 'PENDING'")
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_bookings_pending_booking_date', table_name='bookings')
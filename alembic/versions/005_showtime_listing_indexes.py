@@ -0,0 +1,35 @@
+"""Partial composite index for showtime listing and theater-by-film
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "005"
+down_revision: Union[str, Sequence[str], None] = "004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Chỉ index suất chiếu ACTIVE:
+    # - danh sách suất chiếu: film_id = ? AND show_date = ? AND room_id IN (phòng của rạp)
+    # - rạp theo phim: DISTINCT room_id WHERE film_id = ? (index-only scan)
+    op.create_index(
+        'ix_showtimes_active_film_date_room',
+        'showtimes',
+        ['film_id', 'show_date', 'room_id'],
+        postgresql_where=sa.text("status = 'ACTIVE'")
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_showtimes_active_film_date_room', table_name='showtimes')
@@ -0,0 +1,61 @@
+"""Film schedule read model (film, theater, date)
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "006"
+down_revision: Union[str, Sequence[str], None] = "005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Create Film Schedule table
+    op.create_table(
+        'film_schedules',
+        sa.Column('film_id', sa.Integer(), nullable=False),
+        sa.Column('theater_id', sa.Integer(), nullable=False),
+        sa.Column('show_date', sa.Date(), nullable=False),
+        sa.Column('showtime_ids', postgresql.ARRAY(sa.Integer()), nullable=False),
+        sa.Column('room_ids', postgresql.ARRAY(sa.Integer()), nullable=False),
+        sa.Column('start_times', postgresql.ARRAY(sa.Time()), nullable=False),
+        sa.Column('end_times', postgresql.ARRAY(sa.Time()), nullable=False),
+        sa.Column('formats', postgresql.ARRAY(sa.String(length=20)), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('film_id', 'theater_id', 'show_date')
+    )
+
+    # Nạp dữ liệu ban đầu từ các suất chiếu ACTIVE
+    op.execute("""
+        INSERT INTO film_schedules
+            (film_id, theater_id, show_date, showtime_ids, room_ids, start_times, end_times, formats, updated_at)
+        SELECT
+            s.film_id,
+            r.theater_id,
+            s.show_date,
+            array_agg(s.id ORDER BY s.start_time, s.id),
+            array_agg(s.room_id ORDER BY s.start_time, s.id),
+            array_agg(s.start_time ORDER BY s.start_time, s.id),
+            array_agg(s.end_time ORDER BY s.start_time, s.id),
+            array_agg(s.format ORDER BY s.start_time, s.id),
+            timezone('utc', now())
+        FROM showtimes s
+        JOIN cinema_rooms r ON r.id = s.room_id
+        WHERE s.status = 'ACTIVE'
+        GROUP BY s.film_id, r.theater_id, s.show_date
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('film_schedules')
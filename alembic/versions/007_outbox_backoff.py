@@ -0,0 +1,31 @@
+"""Outbox retry backoff (available_at)
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "007"
+down_revision: Union[str, Sequence[str], None] = "006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Event lỗi chỉ được relay lại sau available_at (backoff theo số lần thử)
+    op.add_column(
+        'outbox_events',
+        sa.Column('available_at', sa.DateTime(), nullable=False, server_default=sa.text("(now() AT TIME ZONE 'utc')"))
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('outbox_events', 'available_at')
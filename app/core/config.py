@@ -26,6 +26,40 @@ class Settings(BaseSettings):
     SMTP_PASSWORD: str | None = None
     SMTP_FROM: str | None = None
     SMTP_TLS: bool = True
+    SMTP_POOL_SIZE: int = 2
+    SMTP_POOL_IDLE_SECONDS: float = 30
+    EMAIL_BATCH_SIZE: int = 100
+    OUTBOX_BATCH_SIZE: int = 100
+    ROOM_LAYOUT_CACHE_SIZE: int = 256
+    ROOM_LAYOUT_CACHE_TTL: int = 3600
+    TOKEN_CACHE_SIZE: int = 10000
+    TOKEN_CACHE_TTL_SECONDS: int = 60
+    REVOKED_TOKEN_FILTER_CAPACITY: int = 100000
+    REVOKED_TOKEN_FILTER_ERROR_RATE: float = 0.01
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_POOL_WORKERS: int = 2
+    PASSWORD_POOL_MAX_PENDING: int = 64
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_LOGIN: int = 10
+    RATE_LIMIT_LOGIN_WINDOW_SECONDS: int = 60
+    RATE_LIMIT_SEAT_HOLD: int = 30
+    RATE_LIMIT_SEAT_HOLD_WINDOW_SECONDS: int = 60
+    CATALOG_CACHE_FILM_TTL: int = 600
+    CATALOG_CACHE_THEATER_TTL: int = 3600
+    CATALOG_CACHE_ROOM_TTL: int = 3600
+    CATALOG_CACHE_SHOWTIME_TTL: int = 300
+    SHOWTIME_DETAIL_CACHE_SIZE: int = 2048
+    SHOWTIME_DETAIL_CACHE_TTL: int = 60
+    FILM_SCHEDULE_REFRESH_BATCH_SIZE: int = 500
+    ASYNC_REQUEST_PATH: bool = False
+    ASYNC_DATABASE_URL: str | None = None
+    ASYNC_DB_POOL_SIZE: int = 20
+    ASYNC_DB_MAX_OVERFLOW: int = 20
+    ASYNC_REDIS_MAX_CONNECTIONS: int = 200
+    BOOKING_PAGE_SIZE: int = 20
+    BOOKING_PAGE_SIZE_MAX: int = 100
+    BOOKING_EXPIRE_MINUTES: int = 10
+    BOOKING_SWEEP_CHUNK_SIZE: int = 500
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
     CORS_ORIGINS: str
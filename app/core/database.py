@@ -1,11 +1,15 @@
+from typing import Optional
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlmodel import SQLModel, Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.core.config import settings
 import logging
 
 # Import all models so Alembic & SQLModel know them
 from app.models import (
     User, Film, Theater, CinemaRoom, Seat,
-    Showtime, SeatStatus, Booking, BookingDetail
+    Showtime, SeatStatus, Booking, BookingDetail, OutboxEvent, FilmSchedule
 )
 
 logger = logging.getLogger(__name__)
@@ -30,3 +34,36 @@ def get_session():
         yield session
 
 
+_async_engine: Optional[AsyncEngine] = None
+
+
+def get_async_engine() -> AsyncEngine:
+    """
+    Engine async (asyncpg) cho request path async, tạo khi dùng lần đầu
+    ASYNC_DATABASE_URL không đặt → dùng DATABASE_URL với driver asyncpg
+    """
+    global _async_engine
+    if _async_engine is None:
+        url = settings.ASYNC_DATABASE_URL or make_url(settings.DATABASE_URL).set(drivername="postgresql+asyncpg")
+        _async_engine = create_async_engine(
+            url,
+            echo=False,
+            pool_pre_ping=True,
+            pool_size=settings.ASYNC_DB_POOL_SIZE,
+            max_overflow=settings.ASYNC_DB_MAX_OVERFLOW,
+        )
+    return _async_engine
+
+
+async def get_async_session():
+    # expire_on_commit=False: đọc thuộc tính sau commit không phát sinh query ngầm (không được phép khi async)
+    async with AsyncSession(get_async_engine(), expire_on_commit=False) as session:
+        yield session
+
+
+async def dispose_async_engine() -> None:
+    """Đóng pool kết nối async (khi tắt ứng dụng)"""
+    global _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
@@ -1,4 +1,5 @@
 import redis
+import redis.asyncio
 from app.core.config import settings
 
 redis_client = redis.Redis(
@@ -7,3 +8,15 @@ redis_client = redis.Redis(
     db=settings.REDIS_DB,
     decode_responses=True
 )
+
+# Client async cho request path async (ASYNC_REQUEST_PATH), kết nối khi dùng lần đầu
+# Hết kết nối trong pool thì request chờ kết nối rảnh thay vì báo lỗi
+async_redis_client = redis.asyncio.Redis(
+    connection_pool=redis.asyncio.BlockingConnectionPool(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        db=settings.REDIS_DB,
+        decode_responses=True,
+        max_connections=settings.ASYNC_REDIS_MAX_CONNECTIONS
+    )
+)
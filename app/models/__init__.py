@@ -7,3 +7,5 @@ from .showtime import Showtime
 from .seat_status import SeatStatus
 from .booking import Booking
 from .booking_detail import BookingDetail
+from .outbox_event import OutboxEvent
+from .film_schedule import FilmSchedule
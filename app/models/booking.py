@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index, text
 from typing import Optional, List
 from datetime import datetime
 
@@ -6,6 +7,17 @@ from datetime import datetime
 class Booking(SQLModel, table=True):
     __tablename__ = "bookings"
 
+    __table_args__ = (
+        # Lịch sử booking của user (phân trang keyset theo booking_date, id)
+        Index("ix_bookings_user_id_booking_date_id", "user_id", text("booking_date DESC"), text("id DESC")),
+        # Sweeper hủy booking PENDING quá hạn
+        Index(
+            "ix_bookings_pending_booking_date",
+            "booking_date",
+            postgresql_where=text("booking_status = 'PENDING'")
+        ),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
 
     user_id: int = Field(foreign_key="users.id", index=True)
@@ -0,0 +1,25 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Column, Integer, String, Time
+from sqlalchemy.dialects.postgresql import ARRAY
+from typing import List
+from datetime import date, datetime, time
+
+
+class FilmSchedule(SQLModel, table=True):
+    """
+    Read model lịch chiếu: suất chiếu ACTIVE của 1 phim tại 1 rạp trong 1 ngày
+    Dữ liệu dẫn xuất từ showtimes + cinema_rooms (FilmScheduleService cập nhật), các mảng sắp theo giờ chiếu
+    """
+    __tablename__ = "film_schedules"
+
+    film_id: int = Field(primary_key=True)
+    theater_id: int = Field(primary_key=True)
+    show_date: date = Field(primary_key=True)
+
+    showtime_ids: List[int] = Field(sa_column=Column(ARRAY(Integer), nullable=False))
+    room_ids: List[int] = Field(sa_column=Column(ARRAY(Integer), nullable=False))
+    start_times: List[time] = Field(sa_column=Column(ARRAY(Time), nullable=False))
+    end_times: List[time] = Field(sa_column=Column(ARRAY(Time), nullable=False))
+    formats: List[str] = Field(sa_column=Column(ARRAY(String(20)), nullable=False))
+
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
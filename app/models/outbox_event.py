@@ -0,0 +1,28 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Column, Index, text
+from sqlalchemy.dialects.postgresql import JSONB
+from typing import Optional, Dict
+from datetime import datetime
+
+
+class OutboxEvent(SQLModel, table=True):
+    __tablename__ = "outbox_events"
+
+    __table_args__ = (
+        # Relay chỉ đọc các event chưa xử lý
+        Index("ix_outbox_events_pending", "id", postgresql_where=text("processed_at IS NULL")),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+
+    event_type: str = Field(max_length=50)
+    aggregate_id: int
+    payload: Dict = Field(default_factory=dict, sa_column=Column(JSONB, nullable=False))
+
+    attempts: int = Field(default=0)
+    last_error: Optional[str] = None
+
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    # Thời điểm event được relay (lần thử tiếp theo của event lỗi)
+    available_at: datetime = Field(default_factory=datetime.utcnow)
+    processed_at: Optional[datetime] = None
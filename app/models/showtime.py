@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index, text
 from typing import Optional, List
 from datetime import date, time
 
@@ -6,6 +7,17 @@ from datetime import date, time
 class Showtime(SQLModel, table=True):
     __tablename__ = "showtimes"
 
+    __table_args__ = (
+        # Danh sách suất chiếu theo phim/rạp/ngày và rạp theo phim (chỉ suất chiếu ACTIVE)
+        Index(
+            "ix_showtimes_active_film_date_room",
+            "film_id",
+            "show_date",
+            "room_id",
+            postgresql_where=text("status = 'ACTIVE'")
+        ),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
 
     film_id: int = Field(foreign_key="films.id", index=True)
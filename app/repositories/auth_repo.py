@@ -1,4 +1,5 @@
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import Optional
 from app.models.user import User
 
@@ -8,6 +9,11 @@ class AuthRepository:
         statement = select(User).where(User.username == username)
         return session.exec(statement).first()
 
+    @staticmethod
+    async def get_user_by_username_async(session: AsyncSession,username: str) -> Optional[User]:
+        statement = select(User).where(User.username == username)
+        return (await session.exec(statement)).first()
+
     @staticmethod
     def get_user_by_email(session: Session,email: str) -> Optional[User]:
         statement = select(User).where(User.email == email)
@@ -23,3 +29,23 @@ class AuthRepository:
     @staticmethod
     def get_user(session: Session,user_id: int) -> Optional[User]:
         return session.get(User, user_id)
+
+    @staticmethod
+    async def get_user_async(session: AsyncSession,user_id: int) -> Optional[User]:
+        return await session.get(User, user_id)
+
+    @staticmethod
+    def update_password(session: Session,user: User,hashed_password: str) -> User:
+        user.password = hashed_password
+        session.add(user)
+        session.commit()
+        session.refresh(user)
+        return user
+
+    @staticmethod
+    async def update_password_async(session: AsyncSession,user: User,hashed_password: str) -> User:
+        user.password = hashed_password
+        session.add(user)
+        await session.commit()
+        await session.refresh(user)
+        return user
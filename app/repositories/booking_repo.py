@@ -1,14 +1,18 @@
-from typing import List, Optional
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import tuple_, update
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.models.booking import Booking
 from app.models.booking_detail import BookingDetail
-from app.models.seat_status import SeatStatus
 from app.models.showtime import Showtime
 from app.models.film import Film
 from app.models.cinema_room import CinemaRoom
 from app.models.theater import Theater
 from app.models.seat import Seat
 from app.models.user import User
+from app.repositories.seat_repo import SeatRepository
+from app.utils.enum import BookingStatus, PaymentStatus
 
 
 class BookingRepository:
@@ -38,109 +42,221 @@ class BookingRepository:
         db.flush()
         return booking_details
     
+    @staticmethod
+    async def create_booking_async(db: AsyncSession, booking_data: dict) -> Booking:
+        """create_booking trên session async"""
+        booking = Booking(**booking_data)
+        db.add(booking)
+        await db.flush()
+        await db.refresh(booking)
+        return booking
+    
+    @staticmethod
+    async def create_booking_details_async(db: AsyncSession, booking_id: int, seats: List[dict]) -> List[BookingDetail]:
+        """create_booking_details trên session async (1 lần flush cho tất cả ghế)"""
+        booking_details = [
+            BookingDetail(booking_id=booking_id, seat_id=seat["seat_id"], price=seat["price"])
+            for seat in seats
+        ]
+        db.add_all(booking_details)
+        await db.flush()
+        return booking_details
+    
     @staticmethod
     def update_seat_status_to_booked(
         db: Session, 
         showtime_id: int, 
         seat_ids: List[int]
-    ) -> None:
-        """Cập nhật trạng thái ghế thành BOOKED trong database"""
-        for seat_id in seat_ids:
-            # Kiểm tra xem đã có seat_status chưa
-            statement = select(SeatStatus).where(
-                SeatStatus.showtime_id == showtime_id,
-                SeatStatus.seat_id == seat_id
-            )
-            seat_status = db.exec(statement).first()
-            
-            if seat_status:
-                # Update trạng thái hiện tại
-                seat_status.status = "BOOKED"
-                seat_status.hold_by_user_id = None
-                seat_status.hold_expired_at = None
-            else:
-                # Tạo mới seat_status
-                new_seat_status = SeatStatus(
-                    showtime_id=showtime_id,
-                    seat_id=seat_id,
-                    status="BOOKED"
-                )
-                db.add(new_seat_status)
-    
-    @staticmethod
-    def get_booking_by_id(db: Session, booking_id: int) -> Optional[Booking]:
-        """Lấy booking theo ID"""
+    ) -> List[int]:
+        """
+        Cập nhật trạng thái ghế thành BOOKED trong database (1 câu lệnh UPSERT)
+        Trả về các seat_id vừa được BOOKED, thiếu ghế nghĩa là ghế đã bị đặt bởi booking khác
+        """
+        return SeatRepository.book_seats(db=db, showtime_id=showtime_id, seat_ids=seat_ids)
+    
+    @staticmethod
+    def get_booking_by_id(db: Session, booking_id: int, for_update: bool = False) -> Optional[Booking]:
+        """
+        Lấy booking theo ID
+        for_update=True → khóa dòng booking (SELECT ... FOR UPDATE) đến hết transaction
+        """
         statement = select(Booking).where(Booking.id == booking_id)
+        if for_update:
+            statement = statement.with_for_update()
         return db.exec(statement).first()
     
     @staticmethod
-    def get_booking_with_details(db: Session, booking_id: int) -> Optional[dict]:
-        """Lấy booking với đầy đủ thông tin chi tiết"""
-        booking = BookingRepository.get_booking_by_id(db, booking_id)
-        if not booking:
-            return None
-        
-        # Lấy thông tin user
-        statement = select(User).where(User.id == booking.user_id)
-        user = db.exec(statement).first()
-        
-        # Lấy thông tin showtime
-        statement = select(Showtime).where(Showtime.id == booking.showtime_id)
-        showtime = db.exec(statement).first()
-        
-        # Lấy thông tin film
-        film = None
-        room = None
-        theater = None
-        if showtime:
-            statement = select(Film).where(Film.id == showtime.film_id)
-            film = db.exec(statement).first()
-            
-            statement = select(CinemaRoom).where(CinemaRoom.id == showtime.room_id)
-            room = db.exec(statement).first()
-            
-            if room:
-                statement = select(Theater).where(Theater.id == room.theater_id)
-                theater = db.exec(statement).first()
-        
-        # Lấy danh sách ghế đã đặt với thông tin chi tiết
-        statement = select(BookingDetail).where(BookingDetail.booking_id == booking_id)
-        booking_details = db.exec(statement).all()
-        
-        seats_info = []
-        for detail in booking_details:
-            # Lấy thông tin ghế
-            seat_statement = select(Seat).where(Seat.id == detail.seat_id)
-            seat = db.exec(seat_statement).first()
-            
-            seats_info.append({
-                "seat_id": detail.seat_id,
-                "seat_name": seat.seat_name if seat else None,
-                "seat_type": seat.seat_type if seat else None,
-                "price": detail.price
+    def _select_booking_details():
+        """
+        Projection dùng chung cho chi tiết booking:
+        booking + user + suất chiếu + phim + phòng + rạp trong 1 query (LEFT JOIN)
+        """
+        return (
+            select(
+                Booking.id,
+                Booking.user_id,
+                Booking.showtime_id,
+                Booking.booking_date,
+                Booking.total_amount,
+                Booking.payment_method,
+                Booking.payment_status,
+                Booking.booking_status,
+                Film.title,
+                Film.image,
+                Theater.name,
+                CinemaRoom.name,
+                Showtime.show_date,
+                Showtime.start_time,
+                User.full_name,
+                User.email,
+                User.phone
+            )
+            .select_from(Booking)
+            .outerjoin(User, User.id == Booking.user_id)
+            .outerjoin(Showtime, Showtime.id == Booking.showtime_id)
+            .outerjoin(Film, Film.id == Showtime.film_id)
+            .outerjoin(CinemaRoom, CinemaRoom.id == Showtime.room_id)
+            .outerjoin(Theater, Theater.id == CinemaRoom.theater_id)
+        )
+    
+    @staticmethod
+    def _build_booking_details(db: Session, rows: List[tuple]) -> List[dict]:
+        """Ghép kết quả projection với danh sách ghế (1 query cho tất cả booking)"""
+        if not rows:
+            return []
+        seat_rows = db.exec(BookingRepository._booking_seats_statement([row[0] for row in rows])).all()
+        return BookingRepository._assemble_booking_details(rows, seat_rows)
+    
+    @staticmethod
+    async def _build_booking_details_async(db: AsyncSession, rows: List[tuple]) -> List[dict]:
+        """_build_booking_details trên session async"""
+        if not rows:
+            return []
+        seat_rows = (await db.exec(BookingRepository._booking_seats_statement([row[0] for row in rows]))).all()
+        return BookingRepository._assemble_booking_details(rows, seat_rows)
+    
+    @staticmethod
+    def _booking_seats_statement(booking_ids: List[int]):
+        """Ghế của các booking (booking_id, seat_id, seat_name, seat_type, price)"""
+        return (
+            select(
+                BookingDetail.booking_id,
+                BookingDetail.seat_id,
+                Seat.seat_name,
+                Seat.seat_type,
+                BookingDetail.price
+            )
+            .select_from(BookingDetail)
+            .outerjoin(Seat, Seat.id == BookingDetail.seat_id)
+            .where(BookingDetail.booking_id.in_(booking_ids))
+            .order_by(BookingDetail.booking_id, BookingDetail.id)
+        )
+    
+    @staticmethod
+    def _assemble_booking_details(rows: List[tuple], seat_rows: List[tuple]) -> List[dict]:
+        seats_by_booking = {row[0]: [] for row in rows}
+        for booking_id, seat_id, seat_name, seat_type, price in seat_rows:
+            seats_by_booking[booking_id].append({
+                "seat_id": seat_id,
+                "seat_name": seat_name,
+                "seat_type": seat_type,
+                "price": price
             })
         
-        return {
-            "id": booking.id,
-            "bookingId": booking.id,
-            "userId": booking.user_id,
-            "showtimeId": booking.showtime_id,
-            "bookingDate": booking.booking_date,
-            "totalAmount": booking.total_amount,
-            "paymentMethod": booking.payment_method,
-            "paymentStatus": booking.payment_status,
-            "bookingStatus": booking.booking_status,
-            "filmTitle": film.title if film else None,
-            "filmImage": film.image if film else None,
-            "theaterName": theater.name if theater else None,
-            "roomName": room.name if room else None,
-            "showDate": str(showtime.show_date) if showtime else None,
-            "startTime": str(showtime.start_time) if showtime else None,
-            "fullName": user.full_name if user else None,
-            "email": user.email if user else None,
-            "phone": user.phone if user else None,
-            "seats": seats_info
+        return [
+            {
+                "id": booking_id,
+                "bookingId": booking_id,
+                "userId": user_id,
+                "showtimeId": showtime_id,
+                "bookingDate": booking_date,
+                "totalAmount": total_amount,
+                "paymentMethod": payment_method,
+                "paymentStatus": payment_status,
+                "bookingStatus": booking_status,
+                "filmTitle": film_title,
+                "filmImage": film_image,
+                "theaterName": theater_name,
+                "roomName": room_name,
+                "showDate": str(show_date) if show_date is not None else None,
+                "startTime": str(start_time) if start_time is not None else None,
+                "fullName": full_name,
+                "email": email,
+                "phone": phone,
+                "seats": seats_by_booking[booking_id]
+            }
+            for (
+                booking_id, user_id, showtime_id, booking_date, total_amount,
+                payment_method, payment_status, booking_status,
+                film_title, film_image, theater_name, room_name,
+                show_date, start_time, full_name, email, phone
+            ) in rows
+        ]
+    
+    @staticmethod
+    def get_booking_with_details(db: Session, booking_id: int) -> Optional[dict]:
+        """Lấy booking với đầy đủ thông tin chi tiết (2 query, không phụ thuộc số ghế)"""
+        statement = BookingRepository._select_booking_details().where(Booking.id == booking_id)
+        details = BookingRepository._build_booking_details(db, db.exec(statement).all())
+        return details[0] if details else None
+    
+    @staticmethod
+    def get_bookings_with_details(db: Session, booking_ids: List[int]) -> List[dict]:
+        """Lấy chi tiết nhiều booking (2 query), giữ thứ tự booking_ids"""
+        if not booking_ids:
+            return []
+        statement = BookingRepository._select_booking_details().where(Booking.id.in_(booking_ids))
+        details = {
+            detail["id"]: detail
+            for detail in BookingRepository._build_booking_details(db, db.exec(statement).all())
         }
+        return [details[booking_id] for booking_id in booking_ids if booking_id in details]
+    
+    @staticmethod
+    def get_user_bookings_with_details(
+        db: Session,
+        user_id: int,
+        limit: Optional[int] = None,
+        before: Optional[Tuple[datetime, int]] = None
+    ) -> List[dict]:
+        """
+        Lấy chi tiết bookings của user, mới nhất trước (2 query)
+        Phân trang keyset theo (booking_date, id), dùng index ix_bookings_user_id_booking_date_id
+        
+        Args:
+            limit: số booking tối đa
+            before: (booking_date, id) của booking cuối trang trước
+        """
+        statement = BookingRepository._user_bookings_statement(user_id, limit, before)
+        return BookingRepository._build_booking_details(db, db.exec(statement).all())
+    
+    @staticmethod
+    async def get_user_bookings_with_details_async(
+        db: AsyncSession,
+        user_id: int,
+        limit: Optional[int] = None,
+        before: Optional[Tuple[datetime, int]] = None
+    ) -> List[dict]:
+        """get_user_bookings_with_details trên session async"""
+        statement = BookingRepository._user_bookings_statement(user_id, limit, before)
+        return await BookingRepository._build_booking_details_async(db, (await db.exec(statement)).all())
+    
+    @staticmethod
+    def _user_bookings_statement(
+        user_id: int,
+        limit: Optional[int],
+        before: Optional[Tuple[datetime, int]]
+    ):
+        statement = (
+            BookingRepository._select_booking_details()
+            .where(Booking.user_id == user_id)
+            .order_by(Booking.booking_date.desc(), Booking.id.desc())
+        )
+        if before is not None:
+            statement = statement.where(tuple_(Booking.booking_date, Booking.id) < tuple_(*before))
+        if limit is not None:
+            statement = statement.limit(limit)
+        return statement
     
     @staticmethod
     def get_bookings_by_user(db: Session, user_id: int) -> List[Booking]:
@@ -148,6 +264,77 @@ class BookingRepository:
         statement = select(Booking).where(Booking.user_id == user_id).order_by(Booking.booking_date.desc())
         return db.exec(statement).all()
     
+    @staticmethod
+    def _expire_bookings(db: Session, candidates) -> List[Tuple[int, int, int]]:
+        """
+        Hủy các booking PENDING chọn bởi candidates trong 1 câu lệnh:
+        UPDATE ... WHERE id IN (SELECT ... FOR UPDATE SKIP LOCKED) RETURNING
+        Booking đang bị khóa (đang xác nhận thanh toán, worker khác đang hủy) được bỏ qua
+        
+        Returns:
+            Danh sách (booking_id, showtime_id, user_id) đã hủy
+        """
+        expired_ids = (
+            candidates
+            .where(Booking.booking_status == BookingStatus.PENDING)
+            .with_for_update(skip_locked=True)
+        )
+        statement = (
+            update(Booking)
+            .where(Booking.id.in_(expired_ids.scalar_subquery()))
+            .values(
+                booking_status=BookingStatus.CANCELLED.value,
+                payment_status=PaymentStatus.FAILED.value
+            )
+            .returning(Booking.id, Booking.showtime_id, Booking.user_id)
+        )
+        return [tuple(row) for row in db.execute(statement).all()]
+    
+    @staticmethod
+    def expire_pending_bookings(db: Session, cutoff: datetime, limit: int) -> List[Tuple[int, int, int]]:
+        """Hủy tối đa limit booking PENDING đặt trước cutoff (cũ nhất trước)"""
+        return BookingRepository._expire_bookings(
+            db,
+            select(Booking.id)
+            .where(Booking.booking_date <= cutoff)
+            .order_by(Booking.booking_date)
+            .limit(limit)
+        )
+    
+    @staticmethod
+    def expire_bookings_by_ids(db: Session, booking_ids: List[int]) -> List[Tuple[int, int, int]]:
+        """Hủy các booking được chỉ định nếu vẫn còn PENDING"""
+        if not booking_ids:
+            return []
+        return BookingRepository._expire_bookings(
+            db,
+            select(Booking.id).where(Booking.id.in_(booking_ids))
+        )
+    
+    @staticmethod
+    def get_pending_booking_ids(db: Session, booking_ids: List[int]) -> List[int]:
+        """Các booking trong danh sách vẫn còn PENDING (không chờ khóa dòng)"""
+        if not booking_ids:
+            return []
+        statement = select(Booking.id).where(
+            Booking.id.in_(booking_ids),
+            Booking.booking_status == BookingStatus.PENDING
+        )
+        return list(db.exec(statement).all())
+    
+    @staticmethod
+    def get_seat_ids_by_bookings(db: Session, booking_ids: List[int]) -> Dict[int, List[int]]:
+        """booking_id -> danh sách seat_id (1 query cho tất cả booking)"""
+        result = {booking_id: [] for booking_id in booking_ids}
+        if not booking_ids:
+            return result
+        statement = select(BookingDetail.booking_id, BookingDetail.seat_id).where(
+            BookingDetail.booking_id.in_(booking_ids)
+        )
+        for booking_id, seat_id in db.exec(statement).all():
+            result[booking_id].append(seat_id)
+        return result
+    
     @staticmethod
     def update_payment_status(db: Session, booking_id: int, payment_status: str) -> Optional[Booking]:
         """Cập nhật trạng thái thanh toán"""
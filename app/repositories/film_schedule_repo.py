@@ -0,0 +1,86 @@
+from datetime import date, datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import delete, func, insert, literal, tuple_
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlmodel import Session, select
+from app.models.cinema_room import CinemaRoom
+from app.models.film_schedule import FilmSchedule
+from app.models.showtime import Showtime
+from app.models.theater import Theater
+
+
+class FilmScheduleRepository:
+    """Repository read model lịch chiếu (film_schedules)"""
+
+    @staticmethod
+    def get_theaters_by_film(db: Session, film_id: int) -> List[Theater]:
+        """Rạp có suất chiếu ACTIVE của phim (quét PK theo film_id, không join showtimes)"""
+        theater_ids = select(FilmSchedule.theater_id).where(FilmSchedule.film_id == film_id)
+        stmt = (
+            select(Theater)
+            .where(Theater.id.in_(theater_ids))
+            .order_by(Theater.name)
+        )
+        return list(db.exec(stmt).all())
+
+    @staticmethod
+    def get_schedule(db: Session, film_id: int, theater_id: int, show_date: date) -> Optional[FilmSchedule]:
+        """Lịch chiếu của phim tại rạp trong ngày (1 lần tra PK)"""
+        return db.get(FilmSchedule, (film_id, theater_id, show_date))
+
+    @staticmethod
+    def _select_schedules():
+        """Tính lịch chiếu từ showtimes + cinema_rooms (mảng sắp theo giờ chiếu)"""
+        def ordered(column):
+            return func.array_agg(aggregate_order_by(column, Showtime.start_time, Showtime.id))
+
+        return (
+            select(
+                Showtime.film_id,
+                CinemaRoom.theater_id,
+                Showtime.show_date,
+                ordered(Showtime.id),
+                ordered(Showtime.room_id),
+                ordered(Showtime.start_time),
+                ordered(Showtime.end_time),
+                ordered(Showtime.format),
+                literal(datetime.utcnow()),
+            )
+            .join(CinemaRoom, CinemaRoom.id == Showtime.room_id)
+            .where(Showtime.status == "ACTIVE")
+            .group_by(Showtime.film_id, CinemaRoom.theater_id, Showtime.show_date)
+        )
+
+    @staticmethod
+    def _insert_from(schedules):
+        return insert(FilmSchedule).from_select(
+            [
+                "film_id", "theater_id", "show_date",
+                "showtime_ids", "room_ids", "start_times", "end_times", "formats",
+                "updated_at",
+            ],
+            schedules
+        )
+
+    @staticmethod
+    def refresh(db: Session, keys: List[Tuple[int, date]]) -> None:
+        """
+        Tính lại lịch chiếu của các (film_id, show_date) (mọi rạp), không commit
+        Xóa rồi chèn lại trong cùng transaction → người đọc thấy dữ liệu cũ đến khi commit
+        """
+        if not keys:
+            return
+        db.execute(
+            delete(FilmSchedule)
+            .where(tuple_(FilmSchedule.film_id, FilmSchedule.show_date).in_(keys))
+        )
+        schedules = FilmScheduleRepository._select_schedules().where(
+            tuple_(Showtime.film_id, Showtime.show_date).in_(keys)
+        )
+        db.execute(FilmScheduleRepository._insert_from(schedules))
+
+    @staticmethod
+    def rebuild(db: Session) -> None:
+        """Tính lại toàn bộ lịch chiếu, không commit"""
+        db.execute(delete(FilmSchedule))
+        db.execute(FilmScheduleRepository._insert_from(FilmScheduleRepository._select_schedules()))
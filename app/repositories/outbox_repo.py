@@ -0,0 +1,57 @@
+from datetime import datetime
+from typing import Dict, Iterable, List
+from sqlalchemy import func, update
+from sqlmodel import Session, select
+from app.models.outbox_event import OutboxEvent
+
+
+class OutboxRepository:
+    """Repository xử lý bảng outbox (side effect chờ relay)"""
+
+    NOTIFY_CHANNEL = "outbox_events"
+
+    @staticmethod
+    def add_event(db: Session, event_type: str, aggregate_id: int, payload: Dict) -> OutboxEvent:
+        """
+        Ghi event vào outbox trong transaction hiện tại (không commit)
+        NOTIFY được gửi khi transaction commit để đánh thức relay
+        """
+        event = OutboxEvent(event_type=event_type, aggregate_id=aggregate_id, payload=payload)
+        db.add(event)
+        db.flush()
+        db.execute(select(func.pg_notify(OutboxRepository.NOTIFY_CHANNEL, str(event.id))))
+        return event
+
+    @staticmethod
+    def claim_pending(db: Session, limit: int, exclude_ids: Iterable[int] = ()) -> List[OutboxEvent]:
+        """
+        Lấy tối đa limit event chưa xử lý đã đến lượt relay (cũ nhất trước), khóa đến hết transaction
+        FOR UPDATE SKIP LOCKED → nhiều relay chạy song song không xử lý trùng event
+
+        Args:
+            exclude_ids: event đã lỗi trong lượt relay hiện tại (không lấy lại trong cùng lượt)
+        """
+        statement = (
+            select(OutboxEvent)
+            .where(
+                OutboxEvent.processed_at.is_(None),
+                OutboxEvent.available_at <= datetime.utcnow()
+            )
+            .order_by(OutboxEvent.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        exclude_ids = list(exclude_ids)
+        if exclude_ids:
+            statement = statement.where(OutboxEvent.id.notin_(exclude_ids))
+        return list(db.exec(statement).all())
+
+    @staticmethod
+    def mark_processed(db: Session, event_ids: List[int]) -> None:
+        if not event_ids:
+            return
+        db.execute(
+            update(OutboxEvent)
+            .where(OutboxEvent.id.in_(event_ids))
+            .values(processed_at=datetime.utcnow())
+        )
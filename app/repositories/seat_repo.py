@@ -1,6 +1,11 @@
 from typing import List, Optional
 from datetime import datetime, timedelta
-from sqlmodel import Session, select
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, select, and_
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.booking import Booking
+from app.models.booking_detail import BookingDetail
 from app.models.seat import Seat
 from app.models.seat_status import SeatStatus
 from app.models.showtime import Showtime
@@ -23,6 +28,69 @@ class SeatRepository:
         statement = select(Seat).where(Seat.room_id == room_id).order_by(Seat.seat_name)
         return list(db.exec(statement).all())
     
+    @staticmethod
+    async def get_seats_by_room_async(db: AsyncSession, room_id: int) -> List[Seat]:
+        """get_seats_by_room trên session async"""
+        statement = select(Seat).where(Seat.room_id == room_id).order_by(Seat.seat_name)
+        return list((await db.exec(statement)).all())
+    
+    @staticmethod
+    def get_seat_map_rows(
+        db: Session,
+        showtime_id: int,
+        seat_ids: Optional[List[int]] = None
+    ) -> List[tuple]:
+        """
+        Lấy sơ đồ ghế của suất chiếu trong 1 query (không tạo ORM object)
+        Truyền seat_ids để chỉ lấy các ghế được chỉ định
+        
+        Returns:
+            Danh sách tuple (room_id, seat_id, seat_name, seat_type, price, booked) sắp theo tên ghế
+            Rỗng nếu suất chiếu không tồn tại; 1 dòng seat_id = None nếu không có ghế nào (phù hợp)
+        """
+        statement = SeatRepository._seat_map_statement(showtime_id, seat_ids)
+        return [tuple(row) for row in db.exec(statement).all()]
+    
+    @staticmethod
+    async def get_seat_map_rows_async(
+        db: AsyncSession,
+        showtime_id: int,
+        seat_ids: Optional[List[int]] = None
+    ) -> List[tuple]:
+        """get_seat_map_rows trên session async"""
+        statement = SeatRepository._seat_map_statement(showtime_id, seat_ids)
+        return [tuple(row) for row in (await db.exec(statement)).all()]
+    
+    @staticmethod
+    def _seat_map_statement(showtime_id: int, seat_ids: Optional[List[int]]):
+        seat_join = Seat.room_id == Showtime.room_id
+        if seat_ids is not None:
+            seat_join = and_(seat_join, Seat.id.in_(seat_ids))
+        
+        statement = (
+            select(
+                Showtime.room_id,
+                Seat.id,
+                Seat.seat_name,
+                Seat.seat_type,
+                Seat.price,
+                SeatStatus.id.is_not(None).label("booked")
+            )
+            .select_from(Showtime)
+            .outerjoin(Seat, seat_join)
+            .outerjoin(
+                SeatStatus,
+                and_(
+                    SeatStatus.showtime_id == Showtime.id,
+                    SeatStatus.seat_id == Seat.id,
+                    SeatStatus.status == SeatStatusEnum.BOOKED
+                )
+            )
+            .where(Showtime.id == showtime_id)
+            .order_by(Seat.seat_name)
+        )
+        return statement
+    
     @staticmethod
     def get_seat_status(db: Session, showtime_id: int, seat_id: int) -> Optional[SeatStatus]:
         """Lấy trạng thái ghế cho suất chiếu"""
@@ -32,6 +100,40 @@ class SeatRepository:
         )
         return db.exec(statement).first()
     
+    @staticmethod
+    def get_booked_seat_ids(
+        db: Session,
+        showtime_id: int,
+        seat_ids: Optional[List[int]] = None
+    ) -> List[int]:
+        """Lấy các ghế đã BOOKED cho suất chiếu trong 1 query (lọc theo danh sách nếu có)"""
+        if seat_ids is not None and not seat_ids:
+            return []
+        statement = SeatRepository._booked_seat_ids_statement(showtime_id, seat_ids)
+        return list(db.exec(statement).all())
+    
+    @staticmethod
+    async def get_booked_seat_ids_async(
+        db: AsyncSession,
+        showtime_id: int,
+        seat_ids: Optional[List[int]] = None
+    ) -> List[int]:
+        """get_booked_seat_ids trên session async"""
+        if seat_ids is not None and not seat_ids:
+            return []
+        statement = SeatRepository._booked_seat_ids_statement(showtime_id, seat_ids)
+        return list((await db.exec(statement)).all())
+    
+    @staticmethod
+    def _booked_seat_ids_statement(showtime_id: int, seat_ids: Optional[List[int]]):
+        statement = select(SeatStatus.seat_id).where(
+            SeatStatus.showtime_id == showtime_id,
+            SeatStatus.status == SeatStatusEnum.BOOKED
+        )
+        if seat_ids is not None:
+            statement = statement.where(SeatStatus.seat_id.in_(seat_ids))
+        return statement
+    
     @staticmethod
     def get_seats_status_by_showtime(db: Session, showtime_id: int) -> List[SeatStatus]:
         """Lấy trạng thái tất cả ghế trong suất chiếu"""
@@ -112,20 +214,72 @@ class SeatRepository:
         return False
     
     @staticmethod
-    def book_seat(db: Session, showtime_id: int, seat_id: int) -> SeatStatus:
-        """Đặt ghế (chuyển từ HOLD sang BOOKED)"""
-        seat_status = SeatRepository.get_seat_status(db, showtime_id, seat_id)
+    def book_seats(db: Session, showtime_id: int, seat_ids: List[int]) -> List[int]:
+        """
+        Chuyển các ghế sang BOOKED trong 1 câu lệnh
+        INSERT ... ON CONFLICT (showtime_id, seat_id) DO UPDATE ... WHERE status <> 'BOOKED' RETURNING seat_id
         
-        if not seat_status:
-            raise ValueError(f"Seat status not found for seat {seat_id} in showtime {showtime_id}")
+        Returns:
+            Danh sách seat_id được chuyển sang BOOKED bởi câu lệnh này
+            Ghế đã BOOKED từ trước (double-booking) không có trong kết quả
+        """
+        if not seat_ids:
+            return []
         
-        seat_status.status = SeatStatusEnum.BOOKED
-        seat_status.hold_expired_at = None
-        seat_status.updated_at = datetime.utcnow()
-        db.add(seat_status)
-        db.commit()
-        db.refresh(seat_status)
-        return seat_status
+        now = datetime.utcnow()
+        statement = insert(SeatStatus).values([
+            {
+                "showtime_id": showtime_id,
+                "seat_id": seat_id,
+                "status": SeatStatusEnum.BOOKED.value,
+                "hold_by_user_id": None,
+                "hold_expired_at": None,
+                "created_at": now,
+                "updated_at": now
+            }
+            for seat_id in dict.fromkeys(seat_ids)
+        ])
+        statement = statement.on_conflict_do_update(
+            constraint="uq_seat_showtime",
+            set_={
+                "status": SeatStatusEnum.BOOKED.value,
+                "hold_by_user_id": None,
+                "hold_expired_at": None,
+                "updated_at": now
+            },
+            where=SeatStatus.status != SeatStatusEnum.BOOKED.value
+        ).returning(SeatStatus.seat_id)
+        return list(db.execute(statement).scalars().all())
+    
+    @staticmethod
+    def release_booking_holds(db: Session, booking_ids: List[int]) -> int:
+        """
+        Trả các ghế HOLD (trong DB) của các booking về AVAILABLE trong 1 câu lệnh
+        Chỉ ghế đang được giữ bởi chính user của booking
+        
+        Returns:
+            Số ghế đã trả
+        """
+        if not booking_ids:
+            return 0
+        statement = (
+            update(SeatStatus)
+            .where(
+                BookingDetail.booking_id.in_(booking_ids),
+                Booking.id == BookingDetail.booking_id,
+                SeatStatus.seat_id == BookingDetail.seat_id,
+                SeatStatus.showtime_id == Booking.showtime_id,
+                SeatStatus.hold_by_user_id == Booking.user_id,
+                SeatStatus.status == SeatStatusEnum.HOLD.value
+            )
+            .values(
+                status=SeatStatusEnum.AVAILABLE.value,
+                hold_by_user_id=None,
+                hold_expired_at=None,
+                updated_at=datetime.utcnow()
+            )
+        )
+        return db.execute(statement).rowcount
     
     @staticmethod
     def get_available_seats_count(db: Session, showtime_id: int) -> int:
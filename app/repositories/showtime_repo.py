@@ -1,7 +1,10 @@
-from sqlmodel import Session, select, and_
-from datetime import date
+from typing import List, Optional
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.models.showtime import Showtime
 from app.models.cinema_room import CinemaRoom
+from app.models.film import Film
+from app.models.theater import Theater
 
 
 class ShowtimeRepository:
@@ -12,28 +15,50 @@ class ShowtimeRepository:
         return db.get(Showtime, showtime_id)
 
     @staticmethod
-    def get_showtimes_by_film_theater_date(
-            db: Session,
-            film_id: int,
-            theater_id: int,
-            show_date: date,
-    ):
-        stmt = (
-            select(Showtime)
-            .join(CinemaRoom, CinemaRoom.id == Showtime.room_id)
-            .where(
-                and_(
-                    Showtime.film_id == film_id,
-                    CinemaRoom.theater_id == theater_id,
-                    Showtime.show_date == show_date,
-                    Showtime.status == "ACTIVE",
-                )
-            )
-            .order_by(Showtime.start_time)
-        )
+    def get_by_ids(db: Session, showtime_ids: List[int]):
+        """Lấy nhiều showtime theo danh sách ID trong 1 query"""
+        if not showtime_ids:
+            return []
+        stmt = select(Showtime).where(Showtime.id.in_(showtime_ids))
         return db.exec(stmt).all()
-    
+
     @staticmethod
     def get_showtime_by_id(db: Session, showtime_id: int):
         """Lấy chi tiết showtime theo ID"""
         return db.get(Showtime, showtime_id)
+
+    @staticmethod
+    async def get_showtime_by_id_async(db: AsyncSession, showtime_id: int):
+        """get_showtime_by_id trên session async"""
+        return await db.get(Showtime, showtime_id)
+
+    @staticmethod
+    def get_showtime_detail(db: Session, showtime_id: int) -> Optional[dict]:
+        """Chi tiết suất chiếu kèm phim, phòng, rạp trong 1 query (chỉ lấy các cột cần trả về)"""
+        stmt = (
+            select(
+                Showtime.id,
+                Showtime.show_date,
+                Showtime.start_time,
+                Showtime.end_time,
+                Showtime.format,
+                Showtime.status,
+                Film.id.label("film_id"),
+                Film.title.label("film_title"),
+                Film.image,
+                Film.duration,
+                Film.language,
+                Film.subtitle,
+                CinemaRoom.id.label("room_id"),
+                CinemaRoom.name.label("room_name"),
+                Theater.id.label("theater_id"),
+                Theater.name.label("theater_name"),
+                Theater.address.label("theater_address"),
+            )
+            .join(Film, Film.id == Showtime.film_id)
+            .join(CinemaRoom, CinemaRoom.id == Showtime.room_id)
+            .join(Theater, Theater.id == CinemaRoom.theater_id)
+            .where(Showtime.id == showtime_id)
+        )
+        row = db.exec(stmt).first()
+        return dict(row._mapping) if row else None
@@ -1,5 +1,5 @@
 from app.models import Theater, CinemaRoom, Showtime
-from sqlmodel import Session, select, and_
+from sqlmodel import Session, select
 
 
 class TheaterRepo:
@@ -22,20 +22,3 @@ class TheaterRepo:
             .distinct()
         )
         return db.exec(stmt).all()
-
-    @staticmethod
-    def get_by_film(db: Session, film_id: int):
-        stmt = (
-            select(Theater)
-            .join(CinemaRoom, CinemaRoom.theater_id == Theater.id)
-            .join(Showtime, Showtime.room_id == CinemaRoom.id)
-            .where(
-                and_(
-                    Showtime.film_id == film_id,
-                    Showtime.status == "ACTIVE"
-                )
-            )
-            .distinct()
-            .order_by(Theater.name)
-        )
-        return db.exec(stmt).all()
\ No newline at end of file
@@ -1,29 +1,43 @@
 from fastapi import APIRouter, Depends
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.core.database import get_session
+from app.core.config import settings
+from app.core.database import get_async_session, get_session
 from app.models import User
 from app.schemas.auth import (
     RegisterRequest,
     UserRead, AccessTokenResponse, RefreshTokenRequest
 )
 from app.services.auth_service import AuthService
-from app.utils.dependencies import get_current_user, oauth2_scheme
+from app.utils.dependencies import get_current_user, get_current_user_async, oauth2_scheme, require_staff
+from app.utils.password_pool import PasswordPool
+from app.utils.rate_limit import AsyncRateLimiter, RateLimiter
 
 router = APIRouter(prefix="/auth",tags=["Auth"])
 
+# Route async (ASYNC_REQUEST_PATH): đăng ký trước router sync nên thay thế route sync cùng path
+async_router = APIRouter(prefix="/auth",tags=["Auth"])
+
 @router.post("/register",response_model=UserRead)
-def register(data: RegisterRequest,session: Session = Depends(get_session)):
-    user = AuthService.register(session=session,data=data)
+async def register(data: RegisterRequest,session: Session = Depends(get_session)):
+    user = await AuthService.register(session=session,data=data)
     return user
 
-@router.post("/login")
-def login(
+@router.post(
+    "/login",
+    dependencies=[Depends(RateLimiter(
+        "login",
+        settings.RATE_LIMIT_LOGIN,
+        settings.RATE_LIMIT_LOGIN_WINDOW_SECONDS
+    ))]
+)
+async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
     session: Session = Depends(get_session),
 ):
-    access_token , refresh_token= AuthService.login(
+    access_token , refresh_token= await AuthService.login(
         session=session,
         username=form_data.username,
         password=form_data.password
@@ -50,3 +64,35 @@ def logout(
 ):
     AuthService.logout(user_id=current_user.id, access_token=access_token)
     return {"success": True, "message": "Logged out successfully"}
+
+@router.get("/password-pool/metrics")
+def password_pool_metrics(current_user: User = Depends(require_staff)):
+    """Độ sâu hàng đợi và thời gian xử lý của pool bcrypt (tiến trình API hiện tại)"""
+    return PasswordPool.metrics()
+
+@async_router.post(
+    "/login",
+    dependencies=[Depends(AsyncRateLimiter(
+        "login",
+        settings.RATE_LIMIT_LOGIN,
+        settings.RATE_LIMIT_LOGIN_WINDOW_SECONDS
+    ))]
+)
+async def login_async(
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    session: AsyncSession = Depends(get_async_session),
+):
+    access_token , refresh_token= await AuthService.login_async(
+        session=session,
+        username=form_data.username,
+        password=form_data.password
+    )
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer"
+    }
+
+@async_router.get("/me")
+async def get_me_async(current_user: User = Depends(get_current_user_async)):
+    return current_user
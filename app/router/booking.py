@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, Response, status
 from sqlmodel import Session
-from typing import List
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import List, Optional
 
-from app.core.database import get_session
+from app.core.database import get_async_session, get_session
 from app.models.user import User
 from app.schemas.booking import (
     BookingCreateRequest,
@@ -10,10 +11,13 @@ from app.schemas.booking import (
     BookingDetailResponse
 )
 from app.services.booking_service import BookingService
-from app.utils.dependencies import get_current_user
+from app.utils.dependencies import get_current_user, get_current_user_async
 
 router = APIRouter(prefix="/bookings", tags=["Bookings"])
 
+# Route async (ASYNC_REQUEST_PATH): đăng ký trước router sync nên thay thế route sync cùng path
+async_router = APIRouter(prefix="/bookings", tags=["Bookings"])
+
 
 @router.post("", response_model=BookingResponse, status_code=status.HTTP_201_CREATED)
 def create_booking(
@@ -43,13 +47,25 @@ def get_booking(
 
 @router.get("", response_model=List[BookingDetailResponse])
 def get_user_bookings(
+    response: Response,
+    limit: Optional[int] = Query(default=None, ge=1, description="Số booking mỗi trang"),
+    cursor: Optional[str] = Query(default=None, description="Cursor trang tiếp theo (header X-Next-Cursor)"),
     db: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
-    return BookingService.get_user_bookings(
+    """
+    Lịch sử booking của user, mới nhất trước
+    Cursor trang tiếp theo trả về qua header X-Next-Cursor (không có nếu đã hết)
+    """
+    bookings, next_cursor = BookingService.get_user_bookings(
         db=db,
-        user_id=current_user.id
+        user_id=current_user.id,
+        limit=limit,
+        cursor=cursor
     )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return bookings
 
 
 @router.patch("/{booking_id}/payment-status", response_model=BookingDetailResponse)
@@ -65,3 +81,36 @@ def update_payment_status(
         payment_status=payment_status,
         user_id=current_user.id
     )
+
+
+@async_router.post("", response_model=BookingResponse, status_code=status.HTTP_201_CREATED)
+async def create_booking_async(
+    booking_request: BookingCreateRequest,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user_async)
+):
+    return await BookingService.create_booking_async(
+        db=db,
+        booking_request=booking_request,
+        current_user_id=current_user.id
+    )
+
+
+@async_router.get("", response_model=List[BookingDetailResponse])
+async def get_user_bookings_async(
+    response: Response,
+    limit: Optional[int] = Query(default=None, ge=1, description="Số booking mỗi trang"),
+    cursor: Optional[str] = Query(default=None, description="Cursor trang tiếp theo (header X-Next-Cursor)"),
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user_async)
+):
+    """Lịch sử booking của user, mới nhất trước (async)"""
+    bookings, next_cursor = await BookingService.get_user_bookings_async(
+        db=db,
+        user_id=current_user.id,
+        limit=limit,
+        cursor=cursor
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return bookings
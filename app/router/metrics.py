@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Depends
+
+from app.models import User
+from app.utils.catalog_cache import CatalogCache
+from app.utils.dependencies import require_staff
+from app.utils.rate_limit import RateLimiter
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["Metrics"]
+)
+
+
+@router.get("/catalog-cache")
+def catalog_cache_metrics(current_user: User = Depends(require_staff)):
+    """Số lần hit / miss của cache danh mục theo từng loại dữ liệu"""
+    return CatalogCache.stats()
+
+
+@router.get("/rate-limit")
+def rate_limit_metrics(current_user: User = Depends(require_staff)):
+    """Số request được phép / bị chặn theo từng giới hạn (tất cả tiến trình)"""
+    return RateLimiter.stats()
@@ -1,7 +1,11 @@
-from typing import List
-from fastapi import APIRouter, Depends, status
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session
-from app.core.database import get_session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.database import get_async_session, get_session
 from app.services.seat_service import SeatService
 from app.schemas.seat import (
     HoldSeatRequest, 
@@ -9,21 +13,77 @@ from app.schemas.seat import (
     SeatStatusResponse, 
     HoldSeatResponse
 )
-from app.utils.dependencies import get_current_user
+from app.utils.dependencies import get_current_user, get_current_user_async
+from app.utils.rate_limit import AsyncUserRateLimiter, UserRateLimiter
+from app.utils.seat_events import SeatEventHub
 from app.models.user import User
 
 router = APIRouter(prefix="/seats", tags=["Seats"])
 
+# Route async (ASYNC_REQUEST_PATH): đăng ký trước router sync nên thay thế route sync cùng path
+async_router = APIRouter(prefix="/seats", tags=["Seats"])
+
 
 @router.get("/showtime/{showtime_id}", response_model=List[SeatStatusResponse])
 def get_seats_by_showtime(
     showtime_id: int,
+    response: Response,
+    since: Optional[int] = Query(default=None, description="Version sơ đồ ghế client đang có"),
+    if_none_match: Optional[str] = Header(default=None),
     db: Session = Depends(get_session)
 ):
-    return SeatService.get_seats_by_showtime(db=db, showtime_id=showtime_id)
+    """
+    Sơ đồ ghế của suất chiếu
+    - If-None-Match trùng ETag hiện tại → 304 (không đổi)
+    - since=<version> → chỉ trả về các ghế thay đổi sau version đó
+    Version hiện tại trả về qua header ETag và X-Seat-Map-Version
+    """
+    version, etag = SeatService.get_seat_map_etag(showtime_id)
+    headers = {"ETag": etag, "X-Seat-Map-Version": str(version)}
+    
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    response.headers.update(headers)
+    return SeatService.get_seats_by_showtime(db=db, showtime_id=showtime_id, since=since)
+
+
+@router.get("/showtime/{showtime_id}/stream")
+async def stream_seats_by_showtime(showtime_id: int, request: Request):
+    """
+    Theo dõi sơ đồ ghế theo thời gian thực (Server-Sent Events)
+    Gửi toàn bộ sơ đồ ghế khi kết nối, sau đó chỉ gửi các ghế đổi trạng thái
+    """
+    # Đăng ký trước khi lấy snapshot để không bỏ lỡ event xảy ra trong lúc đọc
+    subscription = SeatEventHub.subscribe(showtime_id)
+    try:
+        snapshot = await run_in_threadpool(SeatService.load_seat_map_snapshot, showtime_id)
+    except Exception:
+        SeatEventHub.unsubscribe(subscription)
+        raise
+    
+    return StreamingResponse(
+        SeatService.stream_seat_map(
+            showtime_id=showtime_id,
+            subscription=subscription,
+            snapshot=snapshot,
+            is_disconnected=request.is_disconnected
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
-@router.post("/hold", response_model=List[HoldSeatResponse], status_code=status.HTTP_200_OK)
+@router.post(
+    "/hold",
+    response_model=List[HoldSeatResponse],
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(UserRateLimiter(
+        "seat_hold",
+        settings.RATE_LIMIT_SEAT_HOLD,
+        settings.RATE_LIMIT_SEAT_HOLD_WINDOW_SECONDS
+    ))]
+)
 def hold_seats(
     request: HoldSeatRequest,
     current_user: User = Depends(get_current_user),
@@ -76,6 +136,21 @@ def get_available_seats_count(
     }
 
 
+@router.get("/available-counts")
+def get_available_seats_counts(
+    showtime_ids: List[int] = Query(..., description="Danh sách ID suất chiếu"),
+    db: Session = Depends(get_session)
+):
+    """
+    Đếm số ghế còn trống cho nhiều suất chiếu cùng lúc (vd: cả ngày chiếu)
+    """
+    counts = SeatService.get_available_seats_counts(db=db, showtime_ids=showtime_ids)
+    return [
+        {"showtime_id": showtime_id, "available_seats": count}
+        for showtime_id, count in counts.items()
+    ]
+
+
 @router.delete("/showtime/{showtime_id}/cancel-hold")
 def cancel_hold_for_user(
     showtime_id: int,
@@ -92,3 +167,59 @@ def cancel_hold_for_user(
         "message": f"Đã hủy {count} ghế"
     }
 
+
+@async_router.get("/showtime/{showtime_id}", response_model=List[SeatStatusResponse])
+async def get_seats_by_showtime_async(
+    showtime_id: int,
+    response: Response,
+    since: Optional[int] = Query(default=None, description="Version sơ đồ ghế client đang có"),
+    if_none_match: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_async_session)
+):
+    """Sơ đồ ghế của suất chiếu (async, cùng ETag / since như route sync)"""
+    version, etag = await SeatService.get_seat_map_etag_async(showtime_id)
+    headers = {"ETag": etag, "X-Seat-Map-Version": str(version)}
+    
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    response.headers.update(headers)
+    return await SeatService.get_seats_by_showtime_async(db=db, showtime_id=showtime_id, since=since)
+
+
+@async_router.post(
+    "/hold",
+    response_model=List[HoldSeatResponse],
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(AsyncUserRateLimiter(
+        "seat_hold",
+        settings.RATE_LIMIT_SEAT_HOLD,
+        settings.RATE_LIMIT_SEAT_HOLD_WINDOW_SECONDS
+    ))]
+)
+async def hold_seats_async(
+    request: HoldSeatRequest,
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_session)
+):
+    """Giữ ghế trong Redis với TTL 10 phút (async)"""
+    return await SeatService.hold_seats_async(
+        db=db,
+        showtime_id=request.showtime_id,
+        seat_ids=request.seat_ids,
+        user_id=current_user.id,
+        hold_minutes=10
+    )
+
+
+@async_router.post("/release", status_code=status.HTTP_200_OK)
+async def release_seats_async(
+    request: ReleaseSeatRequest,
+    current_user: User = Depends(get_current_user_async)
+):
+    """Hủy giữ ghế (async)"""
+    return await SeatService.release_seats_async(
+        showtime_id=request.showtime_id,
+        seat_ids=request.seat_ids,
+        user_id=current_user.id
+    )
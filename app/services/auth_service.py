@@ -3,22 +3,29 @@ from jose import jwt, JWTError
 from app.core.config import settings
 
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from fastapi import HTTPException, status
+from starlette.concurrency import run_in_threadpool
 from app.utils.enum import UserRole
 from app.models.user import User
 from app.repositories.auth_repo import AuthRepository
 from app.utils.security import (
-    hash_password,
-    verify_password,
     create_access_token,
     create_refresh_token
 )
-from app.core.redis import redis_client
+from app.utils.password_pool import PasswordPool
+from app.core.redis import async_redis_client, redis_client
+from app.utils.redis_lock import SeatLockManager
+from app.utils.token_cache import TokenCache
+from app.utils.token_revocation import RevokedTokens
+import logging
+
+logger = logging.getLogger(__name__)
 
 class AuthService:
 
     @staticmethod
-    def register(session: Session,data) -> User:
+    def _check_unique(session: Session, data) -> None:
         if AuthRepository.get_user_by_username(session, data.username):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -29,33 +36,90 @@ class AuthService:
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already exists"
             )
+
+    @staticmethod
+    async def register(session: Session,data) -> User:
+        # Query DB trong threadpool, bcrypt trong pool tiến trình → không chặn event loop
+        await run_in_threadpool(AuthService._check_unique, session, data)
         new_user = User(
             username=data.username,
-            password=hash_password(data.password),
+            password=await PasswordPool.hash(data.password),
             email=data.email,
             phone =data.phone,
             full_name=data.full_name,
             role=UserRole.USER,
             created_at=datetime.now(),
         )
-        return AuthRepository.create_user(session, new_user)
+        return await run_in_threadpool(AuthRepository.create_user, session, new_user)
 
     @staticmethod
-    def login(session: Session, username: str, password: str):
-        user = AuthRepository.get_user_by_username(session, username)
-        if not user or not verify_password(password, user.password):
+    async def login(session: Session, username: str, password: str):
+        user = await run_in_threadpool(AuthRepository.get_user_by_username, session, username)
+        if user:
+            valid, new_hash = await PasswordPool.verify_and_update(password, user.password)
+        else:
+            valid, new_hash = False, None
+        if not valid:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid username or password"
             )
+
         payload = {
             "sub": str(user.id),
             "role": user.role,
         }
+
+        # Hash cũ dùng cost khác BCRYPT_ROUNDS → lưu hash mới (mật khẩu đúng nên băm lại được)
+        if new_hash:
+            try:
+                await run_in_threadpool(AuthRepository.update_password, session, user, new_hash)
+                logger.info(f"Rehashed password for user {payload['sub']}")
+            except Exception as e:
+                await run_in_threadpool(session.rollback)
+                logger.warning(f"Failed to rehash password for user {payload['sub']}: {e}")
+
         access_token = create_access_token(payload)
         refresh_token = create_refresh_token(payload)
-        redis_client.setex(
-            f"refresh_token:{user.id}",
+        await run_in_threadpool(
+            redis_client.setex,
+            f"refresh_token:{payload['sub']}",
+            60 * 60 * 24 * 30,
+            refresh_token
+        )
+        return access_token, refresh_token
+
+    @staticmethod
+    async def login_async(session: AsyncSession, username: str, password: str):
+        """login trên session + client Redis async (không dùng threadpool)"""
+        user = await AuthRepository.get_user_by_username_async(session, username)
+        if user:
+            valid, new_hash = await PasswordPool.verify_and_update(password, user.password)
+        else:
+            valid, new_hash = False, None
+        if not valid:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid username or password"
+            )
+
+        payload = {
+            "sub": str(user.id),
+            "role": user.role,
+        }
+
+        if new_hash:
+            try:
+                await AuthRepository.update_password_async(session, user, new_hash)
+                logger.info(f"Rehashed password for user {payload['sub']}")
+            except Exception as e:
+                await session.rollback()
+                logger.warning(f"Failed to rehash password for user {payload['sub']}: {e}")
+
+        access_token = create_access_token(payload)
+        refresh_token = create_refresh_token(payload)
+        await async_redis_client.setex(
+            f"refresh_token:{payload['sub']}",
             60 * 60 * 24 * 30,
             refresh_token
         )
@@ -100,13 +164,24 @@ class AuthService:
     def logout(user_id: int,access_token: str):
         redis_client.delete(f"refresh_token:{user_id}")
 
+        # Trả lại các ghế user đang giữ (không cần quét toàn bộ locks)
+        SeatLockManager.unlock_all_seats_for_user_everywhere(user_id)
+
         payload = jwt.decode(
             access_token,
             settings.SECRET_KEY,
             algorithms=[settings.ALGORITHM]
         )
         exp = payload.get("exp")
-        ttl = exp - int(datetime.utcnow().timestamp())
+        jti = payload.get("jti")
+
+        if jti:
+            RevokedTokens.revoke(jti, exp)
+        else:
+            # Token cấp trước khi có jti
+            ttl = exp - int(datetime.utcnow().timestamp())
+            if ttl > 0:
+                redis_client.setex(f"blacklist:{access_token}",ttl,"1")
 
-        if ttl > 0:
-            redis_client.setex(f"blacklist:{access_token}",ttl,"1")
+        # Sau khi thu hồi: tiến trình nào xác thực lại token cũng thấy token đã bị thu hồi
+        TokenCache.invalidate_token(access_token)
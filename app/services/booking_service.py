@@ -1,15 +1,18 @@
-from typing import List
+import base64
+from typing import Dict, List, Optional, Tuple
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from fastapi import HTTPException, status
-from datetime import datetime
+from datetime import datetime, timedelta
+
+from app.core.config import settings
 
 from app.models.booking import Booking
 from app.repositories.booking_repo import BookingRepository
 from app.repositories.seat_repo import SeatRepository
-from app.repositories.showtime_repo import ShowtimeRepository
 from app.schemas.booking import BookingCreateRequest, BookingResponse, BookingDetailResponse
+from app.utils.booking_expiry import BookingExpiryScheduler
 from app.utils.redis_lock import SeatLockManager
-from app.utils.enum import SeatStatusEnum
 import logging
 
 logger = logging.getLogger(__name__)
@@ -32,62 +35,26 @@ class BookingService:
                     detail="Không thể đặt vé cho người dùng khác"
                 )
             
-            # 2. Kiểm tra showtime
-            showtime = ShowtimeRepository.get_showtime_by_id(
-                db=db, 
-                showtime_id=booking_request.showtimeId
+            # 2-3. Kiểm tra suất chiếu + tất cả ghế trong 1 query
+            # (ghế thuộc phòng chiếu của suất chiếu + đã BOOKED chưa)
+            # Redis đã xử lý HOLD rồi, DB chỉ cần check BOOKED thật sự (đã thanh toán)
+            seat_ids = list(dict.fromkeys(seat.seat_id for seat in booking_request.seats))
+            rows = SeatRepository.get_seat_map_rows(
+                db=db,
+                showtime_id=booking_request.showtimeId,
+                seat_ids=seat_ids
             )
-            if not showtime:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Suất chiếu không tồn tại"
-                )
-            
-            # 3. Kiểm tra tất cả ghế
-            seat_ids = [seat.seat_id for seat in booking_request.seats]
-            
-            for seat_id in seat_ids:
-                # Kiểm tra ghế tồn tại
-                seat = SeatRepository.get_seat_by_id(db=db, seat_id=seat_id)
-                if not seat:
-                    raise HTTPException(
-                        status_code=status.HTTP_404_NOT_FOUND,
-                        detail=f"Ghế {seat_id} không tồn tại"
-                    )
-                
-                # Kiểm tra ghế đã được BOOKED chưa (chỉ kiểm tra seat_status)
-                # Redis đã xử lý HOLD rồi, chỉ cần check BOOKED thật sự
-                seat_status = SeatRepository.get_seat_status(
-                    db=db,
-                    showtime_id=booking_request.showtimeId,
-                    seat_id=seat_id
-                )
-                # Chỉ reject nếu ghế đã BOOKED thật sự (đã thanh toán)
-                if seat_status and seat_status.status == SeatStatusEnum.BOOKED:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail=f"Ghế {seat.seat_name} đã được đặt"
-                    )
+            seats_by_id = BookingService._validate_seat_rows(seat_ids, rows)
             
             # 4. Tạo booking
-            booking_data = {
-                "user_id": booking_request.userId,
-                "showtime_id": booking_request.showtimeId,
-                "booking_date": datetime.utcnow(),
-                "total_amount": booking_request.totalAmount,
-                "payment_method": booking_request.paymentMethod,
-                "payment_status": "PENDING",
-                "booking_status": "PENDING"
-            }
-            
-            booking = BookingRepository.create_booking(db=db, booking_data=booking_data)
+            booking = BookingRepository.create_booking(
+                db=db,
+                booking_data=BookingService._booking_data(booking_request)
+            )
             logger.info(f"Created booking {booking.id} for user {current_user_id}")
             
             # 5. Tạo booking_details
-            seats_data = [
-                {"seat_id": seat.seat_id, "price": seat.price}
-                for seat in booking_request.seats
-            ]
+            seats_data = BookingService._seats_data(booking_request)
             booking_details = BookingRepository.create_booking_details(
                 db=db,
                 booking_id=booking.id,
@@ -99,33 +66,32 @@ class BookingService:
             # Chỉ cập nhật khi thanh toán thành công
             # Ghế vẫn giữ trạng thái HOLD hoặc sẽ được lock bởi booking này
             
-            # 7. Xóa lock Redis (nếu có)
-            for seat_id in seat_ids:
-                try:
-                    SeatLockManager.unlock_seat(
-                        showtime_id=booking_request.showtimeId,
-                        seat_id=seat_id,
-                        user_id=current_user_id
-                    )
-                except Exception as e:
-                    logger.warning(f"Failed to unlock seat {seat_id}: {e}")
+            # 7. Kiểm tra + xóa lock Redis của tất cả ghế trong 1 script
+            # Ghế đang được user khác giữ → không bỏ lock ghế nào, hủy booking
+            _, conflicts = SeatLockManager.unlock_seats(
+                showtime_id=booking_request.showtimeId,
+                seat_ids=seat_ids,
+                user_id=current_user_id,
+                strict=True
+            )
+            BookingService._check_hold_conflicts(seats_by_id, conflicts)
             
             # 8. Commit transaction
             db.commit()
             logger.info(f"Booking {booking.id} committed successfully")
             
+            # 9. Đăng ký hạn thanh toán, booking bị hủy đúng hạn nếu chưa thanh toán
+            # (lỗi Redis không làm hỏng booking, sweeper định kỳ sẽ hủy sau)
+            try:
+                BookingExpiryScheduler.schedule(
+                    booking_id=booking.id,
+                    deadline=booking.booking_date + timedelta(minutes=settings.BOOKING_EXPIRE_MINUTES)
+                )
+            except Exception as e:
+                logger.warning(f"Failed to schedule expiry for booking {booking.id}: {e}")
+            
             # Trả về response
-            return BookingResponse(
-                bookingId=booking.id,
-                userId=booking.user_id,
-                showtimeId=booking.showtime_id,
-                bookingDate=booking.booking_date,
-                totalAmount=booking.total_amount,
-                paymentMethod=booking.payment_method,
-                paymentStatus=booking.payment_status,
-                bookingStatus=booking.booking_status,
-                seats=seats_data
-            )
+            return BookingService._booking_response(booking, seats_data)
             
         except HTTPException:
             db.rollback()
@@ -138,6 +104,146 @@ class BookingService:
                 detail=f"Lỗi khi tạo booking: {str(e)}"
             )
     
+    @staticmethod
+    async def create_booking_async(
+        db: AsyncSession,
+        booking_request: BookingCreateRequest,
+        current_user_id: int
+    ) -> BookingResponse:
+        """create_booking trên session + client Redis async (cùng các bước kiểm tra)"""
+        try:
+            if booking_request.userId != current_user_id:
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="Không thể đặt vé cho người dùng khác"
+                )
+            
+            seat_ids = list(dict.fromkeys(seat.seat_id for seat in booking_request.seats))
+            rows = await SeatRepository.get_seat_map_rows_async(
+                db=db,
+                showtime_id=booking_request.showtimeId,
+                seat_ids=seat_ids
+            )
+            seats_by_id = BookingService._validate_seat_rows(seat_ids, rows)
+            
+            booking = await BookingRepository.create_booking_async(
+                db=db,
+                booking_data=BookingService._booking_data(booking_request)
+            )
+            logger.info(f"Created booking {booking.id} for user {current_user_id}")
+            
+            seats_data = BookingService._seats_data(booking_request)
+            booking_details = await BookingRepository.create_booking_details_async(
+                db=db,
+                booking_id=booking.id,
+                seats=seats_data
+            )
+            logger.info(f"Created {len(booking_details)} booking details")
+            
+            _, conflicts = await SeatLockManager.unlock_seats_async(
+                showtime_id=booking_request.showtimeId,
+                seat_ids=seat_ids,
+                user_id=current_user_id,
+                strict=True
+            )
+            BookingService._check_hold_conflicts(seats_by_id, conflicts)
+            
+            await db.commit()
+            logger.info(f"Booking {booking.id} committed successfully")
+            
+            try:
+                await BookingExpiryScheduler.schedule_async(
+                    booking_id=booking.id,
+                    deadline=booking.booking_date + timedelta(minutes=settings.BOOKING_EXPIRE_MINUTES)
+                )
+            except Exception as e:
+                logger.warning(f"Failed to schedule expiry for booking {booking.id}: {e}")
+            
+            return BookingService._booking_response(booking, seats_data)
+            
+        except HTTPException:
+            await db.rollback()
+            raise
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"Error creating booking: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Lỗi khi tạo booking: {str(e)}"
+            )
+    
+    @staticmethod
+    def _validate_seat_rows(seat_ids: List[int], rows: List[tuple]) -> Dict[int, tuple]:
+        """
+        Kiểm tra suất chiếu + ghế (thuộc phòng chiếu, chưa BOOKED) từ kết quả get_seat_map_rows
+        
+        Returns:
+            seat_id -> dòng sơ đồ ghế
+        """
+        if not rows:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Suất chiếu không tồn tại"
+            )
+        
+        seats_by_id = {row[1]: row for row in rows if row[1] is not None}
+        missing = [seat_id for seat_id in seat_ids if seat_id not in seats_by_id]
+        booked = [seats_by_id[seat_id][2] for seat_id in seat_ids if seat_id in seats_by_id and seats_by_id[seat_id][5]]
+        
+        # Báo tất cả ghế không hợp lệ trong 1 response
+        errors = []
+        if missing:
+            errors.append(f"Ghế {', '.join(map(str, missing))} không tồn tại")
+        if booked:
+            errors.append(f"Ghế {', '.join(booked)} đã được đặt")
+        if errors:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST if booked else status.HTTP_404_NOT_FOUND,
+                detail="; ".join(errors)
+            )
+        return seats_by_id
+    
+    @staticmethod
+    def _booking_data(booking_request: BookingCreateRequest) -> dict:
+        return {
+            "user_id": booking_request.userId,
+            "showtime_id": booking_request.showtimeId,
+            "booking_date": datetime.utcnow(),
+            "total_amount": booking_request.totalAmount,
+            "payment_method": booking_request.paymentMethod,
+            "payment_status": "PENDING",
+            "booking_status": "PENDING"
+        }
+    
+    @staticmethod
+    def _seats_data(booking_request: BookingCreateRequest) -> List[dict]:
+        return [
+            {"seat_id": seat.seat_id, "price": seat.price}
+            for seat in booking_request.seats
+        ]
+    
+    @staticmethod
+    def _check_hold_conflicts(seats_by_id: Dict[int, tuple], conflicts: List[Dict]) -> None:
+        if conflicts:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Ghế {', '.join(seats_by_id[c['seat_id']][2] for c in conflicts)} đang được giữ bởi người khác"
+            )
+    
+    @staticmethod
+    def _booking_response(booking: Booking, seats_data: List[dict]) -> BookingResponse:
+        return BookingResponse(
+            bookingId=booking.id,
+            userId=booking.user_id,
+            showtimeId=booking.showtime_id,
+            bookingDate=booking.booking_date,
+            totalAmount=booking.total_amount,
+            paymentMethod=booking.payment_method,
+            paymentStatus=booking.payment_status,
+            bookingStatus=booking.booking_status,
+            seats=seats_data
+        )
+    
     @staticmethod
     def get_booking_by_id(db: Session, booking_id: int, user_id: int) -> BookingDetailResponse:
         """Lấy thông tin chi tiết booking"""
@@ -159,17 +265,77 @@ class BookingService:
         return BookingDetailResponse(**booking_detail)
     
     @staticmethod
-    def get_user_bookings(db: Session, user_id: int) -> List[BookingDetailResponse]:
-        """Lấy tất cả bookings của user"""
-        bookings = BookingRepository.get_bookings_by_user(db=db, user_id=user_id)
+    def _encode_cursor(booking_date: datetime, booking_id: int) -> str:
+        raw = f"{booking_date.isoformat()}|{booking_id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+    
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+            booking_date, booking_id = raw.split("|")
+            return datetime.fromisoformat(booking_date), int(booking_id)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cursor không hợp lệ"
+            )
+    
+    @staticmethod
+    def get_user_bookings(
+        db: Session,
+        user_id: int,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[BookingDetailResponse], Optional[str]]:
+        """
+        Lấy bookings của user theo trang, mới nhất trước (keyset theo booking_date, id)
+        
+        Returns:
+            (bookings của trang, cursor trang tiếp theo hoặc None nếu hết)
+        """
+        limit = min(limit or settings.BOOKING_PAGE_SIZE, settings.BOOKING_PAGE_SIZE_MAX)
+        before = BookingService._decode_cursor(cursor) if cursor else None
         
-        result = []
-        for booking in bookings:
-            booking_detail = BookingRepository.get_booking_with_details(db=db, booking_id=booking.id)
-            if booking_detail:
-                result.append(BookingDetailResponse(**booking_detail))
+        # Lấy dư 1 booking để biết còn trang tiếp theo không
+        bookings = BookingRepository.get_user_bookings_with_details(
+            db=db,
+            user_id=user_id,
+            limit=limit + 1,
+            before=before
+        )
+        return BookingService._booking_page(bookings, limit)
+    
+    @staticmethod
+    async def get_user_bookings_async(
+        db: AsyncSession,
+        user_id: int,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[BookingDetailResponse], Optional[str]]:
+        """get_user_bookings trên session async"""
+        limit = min(limit or settings.BOOKING_PAGE_SIZE, settings.BOOKING_PAGE_SIZE_MAX)
+        before = BookingService._decode_cursor(cursor) if cursor else None
+        bookings = await BookingRepository.get_user_bookings_with_details_async(
+            db=db,
+            user_id=user_id,
+            limit=limit + 1,
+            before=before
+        )
+        return BookingService._booking_page(bookings, limit)
+    
+    @staticmethod
+    def _booking_page(
+        bookings: List[dict],
+        limit: int
+    ) -> Tuple[List[BookingDetailResponse], Optional[str]]:
+        next_cursor = None
+        if len(bookings) > limit:
+            bookings = bookings[:limit]
+            last = bookings[-1]
+            next_cursor = BookingService._encode_cursor(last["bookingDate"], last["id"])
         
-        return result
+        return [BookingDetailResponse(**booking_detail) for booking_detail in bookings], next_cursor
     
     @staticmethod
     def update_payment_status(
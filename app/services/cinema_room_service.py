@@ -1,7 +1,15 @@
 from sqlmodel import Session
+from app.core.config import settings
 from app.repositories.cinema_room_repo import CinemaRoomRepository
+from app.utils.catalog_cache import CatalogCache
 
 class CinemaRoomService:
     @staticmethod
     def get_rooms_by_theater(db: Session, theater_id: int):
-        return CinemaRoomRepository.get_by_theater(db, theater_id)
+        return CatalogCache.get_or_load(
+            namespace="cinema_rooms",
+            key=f"theater:{theater_id}",
+            tags=["cinema_rooms"],
+            ttl=settings.CATALOG_CACHE_ROOM_TTL,
+            loader=lambda: CinemaRoomRepository.get_by_theater(db, theater_id)
+        )
@@ -0,0 +1,141 @@
+from datetime import date
+from typing import Iterable, Set, Tuple
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session
+from app.core.redis import redis_client
+from app.models.cinema_room import CinemaRoom
+from app.models.showtime import Showtime
+from app.repositories.film_schedule_repo import FilmScheduleRepository
+from app.utils.catalog_cache import CatalogCache
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Lua script xóa các nhóm đã tính lại nếu không bị đánh dấu thêm (số lần đánh dấu không đổi)
+# KEYS[1]: zset nhóm đang chờ, ARGV: từng cặp nhóm, số lần đánh dấu lúc đọc
+_CLEAR_DIRTY_SCRIPT = """
+local removed = 0
+for i = 1, #ARGV, 2 do
+    if tonumber(redis.call('ZSCORE', KEYS[1], ARGV[i])) == tonumber(ARGV[i + 1]) then
+        removed = removed + redis.call('ZREM', KEYS[1], ARGV[i])
+    end
+end
+return removed
+"""
+
+_clear_dirty_script = redis_client.register_script(_CLEAR_DIRTY_SCRIPT)
+
+
+class FilmScheduleService:
+    """
+    Cập nhật read model lịch chiếu (film_schedules)
+
+    Suất chiếu thay đổi (hoặc phòng chiếu đổi rạp) → (film_id, show_date) bị ảnh hưởng được ghi vào
+    Redis (film_schedule:pending) sau khi commit, task định kỳ tính lại đúng các nhóm đó.
+    Task hằng ngày tính lại toàn bộ (lưới an toàn cho thay đổi ngoài ORM).
+
+    film_schedule:pending là zset nhóm -> số lần bị đánh dấu: nhóm chỉ bị xóa sau khi commit
+    và khi không bị đánh dấu thêm trong lúc tính lại (worker chết giữa chừng → lần chạy sau tính lại).
+    """
+
+    DIRTY_KEY = "film_schedule:pending"
+    CACHE_TAG = "film_schedules"
+
+    @staticmethod
+    def mark_dirty(keys: Iterable[Tuple[int, date]]) -> None:
+        members = {f"{film_id}:{show_date.isoformat()}" for film_id, show_date in keys}
+        if members:
+            pipe = redis_client.pipeline()
+            for member in members:
+                pipe.zincrby(FilmScheduleService.DIRTY_KEY, 1, member)
+            pipe.execute()
+
+    @staticmethod
+    def refresh_dirty(db: Session, batch_size: int) -> int:
+        """Tính lại lịch chiếu của các nhóm đang chờ, trả về số nhóm đã tính lại"""
+        count = 0
+        while True:
+            entries = redis_client.zrange(FilmScheduleService.DIRTY_KEY, 0, batch_size - 1, withscores=True)
+            if not entries:
+                break
+            keys = []
+            for member, _ in entries:
+                film_id, _, show_date = member.partition(":")
+                keys.append((int(film_id), date.fromisoformat(show_date)))
+            try:
+                FilmScheduleRepository.refresh(db=db, keys=keys)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            count += len(keys)
+
+            # Nhóm bị đánh dấu thêm trong lúc tính lại vẫn được giữ lại cho vòng sau
+            args = []
+            for member, score in entries:
+                args += [member, int(score)]
+            _clear_dirty_script(keys=[FilmScheduleService.DIRTY_KEY], args=args)
+
+        if count:
+            CatalogCache.invalidate({FilmScheduleService.CACHE_TAG})
+            logger.info(f"Refreshed {count} film schedules")
+        return count
+
+    @staticmethod
+    def rebuild(db: Session) -> None:
+        FilmScheduleRepository.rebuild(db=db)
+        db.commit()
+        CatalogCache.invalidate({FilmScheduleService.CACHE_TAG})
+        logger.info("Rebuilt film schedules")
+
+
+@event.listens_for(Showtime, "after_insert")
+@event.listens_for(Showtime, "after_update")
+@event.listens_for(Showtime, "after_delete")
+def _collect_schedule_keys(mapper, connection, target: Showtime) -> None:
+    """Ghi nhận (film_id, show_date) bị ảnh hưởng, kể cả giá trị cũ khi đổi phim/ngày chiếu"""
+    session = inspect(target).session
+    if session is None:
+        return
+    keys: Set[Tuple[int, date]] = session.info.setdefault("film_schedule_keys", set())
+    attrs = inspect(target).attrs
+    film_ids = {target.film_id, *attrs.film_id.history.deleted}
+    show_dates = {target.show_date, *attrs.show_date.history.deleted}
+    for film_id in film_ids:
+        for show_date in show_dates:
+            if film_id is not None and show_date is not None:
+                keys.add((film_id, show_date))
+
+
+@event.listens_for(CinemaRoom, "after_update")
+def _collect_room_schedule_keys(mapper, connection, target: CinemaRoom) -> None:
+    """Phòng chiếu đổi rạp → mọi (film_id, show_date) có suất chiếu trong phòng"""
+    if not inspect(target).attrs.theater_id.history.has_changes():
+        return
+    session = inspect(target).session
+    if session is None:
+        return
+    keys: Set[Tuple[int, date]] = session.info.setdefault("film_schedule_keys", set())
+    rows = connection.execute(
+        select(Showtime.film_id, Showtime.show_date)
+        .where(Showtime.room_id == target.id)
+        .distinct()
+    ).all()
+    keys.update((film_id, show_date) for film_id, show_date in rows)
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _mark_schedules_dirty(session: OrmSession) -> None:
+    keys = session.info.pop("film_schedule_keys", None)
+    if keys:
+        try:
+            FilmScheduleService.mark_dirty(keys)
+        except Exception as e:
+            logger.error(f"Failed to mark film schedules dirty: {e}")
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _discard_schedule_keys(session: OrmSession) -> None:
+    session.info.pop("film_schedule_keys", None)
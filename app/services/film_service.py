@@ -1,6 +1,9 @@
+from datetime import date
 from fastapi import HTTPException, status
 from sqlmodel import Session
+from app.core.config import settings
 from app.repositories.film_repo import FilmRepository
+from app.utils.catalog_cache import CatalogCache
 
 
 class FilmService:
@@ -8,12 +11,31 @@ class FilmService:
     @staticmethod
     def list_films(db: Session, now_showing: bool = False):
         if now_showing:
-            return FilmRepository.get_now_showing(db)
-        return FilmRepository.get_all(db)
+            # Danh sách phim đang chiếu đổi theo ngày
+            return CatalogCache.get_or_load(
+                namespace="films",
+                key=f"now_showing:{date.today().isoformat()}",
+                tags=["films"],
+                ttl=settings.CATALOG_CACHE_FILM_TTL,
+                loader=lambda: FilmRepository.get_now_showing(db)
+            )
+        return CatalogCache.get_or_load(
+            namespace="films",
+            key="all",
+            tags=["films"],
+            ttl=settings.CATALOG_CACHE_FILM_TTL,
+            loader=lambda: FilmRepository.get_all(db)
+        )
 
     @staticmethod
     def get_film_detail(db: Session, film_id: int):
-        film = FilmRepository.get_by_id(db, film_id)
+        film = CatalogCache.get_or_load(
+            namespace="film",
+            key=str(film_id),
+            tags=[f"films:{film_id}"],
+            ttl=settings.CATALOG_CACHE_FILM_TTL,
+            loader=lambda: FilmRepository.get_by_id(db, film_id)
+        )
         if not film:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -0,0 +1,241 @@
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Set, Tuple
+from sqlmodel import Session
+from app.core.redis import redis_client
+from app.models.booking import Booking
+from app.models.outbox_event import OutboxEvent
+from app.repositories.outbox_repo import OutboxRepository
+from app.services.seat_service import SeatService
+from app.utils.booking_expiry import BookingExpiryScheduler
+from app.worker.tasks import enqueue_payment_success_emails
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Lua script cộng thống kê của 1 event đúng 1 lần (event đã cộng được ghi trong set của ngày)
+# KEYS[1]: hash thống kê của ngày, KEYS[2]: set event đã cộng
+# ARGV: event_id, số vé, doanh thu, TTL của set
+_RECORD_ANALYTICS_SCRIPT = """
+if redis.call('SADD', KEYS[2], ARGV[1]) == 0 then
+    return 0
+end
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+redis.call('HINCRBY', KEYS[1], 'bookings', 1)
+redis.call('HINCRBY', KEYS[1], 'tickets', ARGV[2])
+redis.call('HINCRBYFLOAT', KEYS[1], 'revenue', ARGV[3])
+return 1
+"""
+
+_record_analytics_script = redis_client.register_script(_RECORD_ANALYTICS_SCRIPT)
+
+
+class OutboxService:
+    """
+    Transactional outbox cho side effect của thanh toán
+
+    Event được ghi cùng transaction với cập nhật thanh toán, relay (app/worker/outbox_relay.py)
+    đọc theo lô và chạy các handler: sơ đồ ghế, lịch hủy booking, email, thống kê.
+    Handler đã chạy xong được đánh dấu trong Redis (outbox_done:{event_id}) nên khi event
+    phải chạy lại (handler khác lỗi) thì các handler đã xong không chạy lại lần nữa.
+    Event lỗi được thử lại sau RETRY_BASE_SECONDS * 2^(attempts - 1) giây (tối đa RETRY_MAX_SECONDS):
+    Redis chậm / mất kết nối trong thời gian ngắn không làm hết MAX_ATTEMPTS ngay lập tức.
+    """
+
+    PAYMENT_SUCCEEDED = "payment.succeeded"
+    MAX_ATTEMPTS = 10
+    RETRY_BASE_SECONDS = 2
+    RETRY_MAX_SECONDS = 300
+    DONE_PREFIX = "outbox_done"
+    DONE_TTL = 7 * 24 * 60 * 60
+    ANALYTICS_PREFIX = "analytics:payments"
+
+
+    @staticmethod
+    def add_payment_succeeded(db: Session, booking: Booking, seat_ids: List[int]) -> OutboxEvent:
+        """Ghi event thanh toán thành công (trong transaction cập nhật thanh toán)"""
+        return OutboxRepository.add_event(
+            db=db,
+            event_type=OutboxService.PAYMENT_SUCCEEDED,
+            aggregate_id=booking.id,
+            payload={
+                "booking_id": booking.id,
+                "user_id": booking.user_id,
+                "showtime_id": booking.showtime_id,
+                "seat_ids": seat_ids,
+                "total_amount": booking.total_amount
+            }
+        )
+
+    @staticmethod
+    def relay_batch(db: Session, limit: int, exclude_ids: Iterable[int] = ()) -> Tuple[int, List[int]]:
+        """
+        Xử lý 1 lô event chưa xử lý, commit cùng transaction đã khóa các event
+
+        Args:
+            exclude_ids: event đã lỗi trong lượt relay hiện tại
+
+        Returns:
+            (số event đã lấy ra - bằng limit nghĩa là có thể còn event đang chờ, ID các event lỗi)
+        """
+        events = OutboxRepository.claim_pending(db=db, limit=limit, exclude_ids=exclude_ids)
+        if not events:
+            return 0, []
+
+        event_ids = [event.id for event in events]
+        pipe = redis_client.pipeline(transaction=False)
+        for event_id in event_ids:
+            pipe.hgetall(f"{OutboxService.DONE_PREFIX}:{event_id}")
+        done = dict(zip(event_ids, pipe.execute()))
+
+        errors: Dict[int, str] = {}
+        handlers = {
+            OutboxService.PAYMENT_SUCCEEDED: [
+                ("seat_map", OutboxService._publish_booked_seats),
+                ("booking_expiry", OutboxService._cancel_booking_expiry),
+                ("email", OutboxService._queue_confirmation_emails),
+                ("analytics", OutboxService._record_payment_analytics),
+            ],
+        }
+
+        for event_type in {event.event_type for event in events}:
+            typed_events = [event for event in events if event.event_type == event_type]
+            if event_type not in handlers:
+                logger.error(f"No outbox handler for event type {event_type}")
+                for event in typed_events:
+                    errors[event.id] = f"Unknown event type {event_type}"
+                continue
+
+            for name, handler in handlers[event_type]:
+                pending = [event for event in typed_events if name not in done[event.id]]
+                OutboxService._run_handler(db, name, handler, pending, errors)
+
+        processed_ids = []
+        now = datetime.utcnow()
+        for event in events:
+            if event.id not in errors:
+                processed_ids.append(event.id)
+                continue
+
+            event.attempts += 1
+            event.last_error = errors[event.id]
+            if event.attempts >= OutboxService.MAX_ATTEMPTS:
+                # Bỏ qua event lỗi quá nhiều lần (vẫn giữ lại trong bảng để tra cứu)
+                logger.error(f"Giving up outbox event {event.id} after {event.attempts} attempts: {event.last_error}")
+                event.processed_at = now
+            else:
+                event.available_at = now + OutboxService._retry_delay(event.attempts)
+            db.add(event)
+
+        OutboxRepository.mark_processed(db=db, event_ids=processed_ids)
+        db.commit()
+
+        logger.info(f"Relayed {len(processed_ids)}/{len(events)} outbox events")
+        return len(events), list(errors)
+
+    @staticmethod
+    def relay_pending(db_factory: Callable[[], Session], limit: int) -> int:
+        """
+        Xử lý hết event đang đến lượt, mỗi lô 1 session / transaction
+        Event lỗi không được lấy lại trong cùng lượt (chờ đến available_at)
+
+        Returns:
+            Số event đã lấy ra
+        """
+        count = 0
+        failed_ids: Set[int] = set()
+        while True:
+            with db_factory() as session:
+                relayed, failed = OutboxService.relay_batch(db=session, limit=limit, exclude_ids=failed_ids)
+            count += relayed
+            failed_ids.update(failed)
+            if relayed < limit:
+                return count
+
+    @staticmethod
+    def _retry_delay(attempts: int) -> timedelta:
+        """Backoff lũy thừa theo số lần đã thử"""
+        seconds = OutboxService.RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+        return timedelta(seconds=min(seconds, OutboxService.RETRY_MAX_SECONDS))
+
+    @staticmethod
+    def _run_handler(
+        db: Session,
+        name: str,
+        handler: Callable[[Session, List[OutboxEvent]], Set[int]],
+        events: List[OutboxEvent],
+        errors: Dict[int, str]
+    ) -> None:
+        """
+        Chạy handler cho cả lô, đánh dấu các event đã xử lý xong bởi handler
+        Handler trả về ID các event lỗi (các event còn lại vẫn được đánh dấu xong),
+        exception → cả lô lỗi
+        """
+        if not events:
+            return
+        try:
+            failed = handler(db, events)
+        except Exception as e:
+            logger.error(f"Outbox handler {name} failed: {e}")
+            for event in events:
+                errors[event.id] = f"{name}: {e}"
+            return
+
+        pipe = redis_client.pipeline(transaction=False)
+        for event in events:
+            if event.id in failed:
+                errors[event.id] = f"{name} failed"
+                continue
+            key = f"{OutboxService.DONE_PREFIX}:{event.id}"
+            pipe.hset(key, name, 1)
+            pipe.expire(key, OutboxService.DONE_TTL)
+        pipe.execute()
+
+    @staticmethod
+    def _publish_booked_seats(db: Session, events: List[OutboxEvent]) -> Set[int]:
+        """Bitmap ghế BOOKED + event BOOKED cho client đang xem sơ đồ ghế (mỗi event riêng)"""
+        failed = set()
+        for event in events:
+            try:
+                SeatService.mark_seats_booked(
+                    db=db,
+                    showtime_id=event.payload["showtime_id"],
+                    seat_ids=event.payload["seat_ids"]
+                )
+            except Exception as e:
+                logger.error(f"Failed to publish booked seats of outbox event {event.id}: {e}")
+                failed.add(event.id)
+        return failed
+
+    @staticmethod
+    def _cancel_booking_expiry(db: Session, events: List[OutboxEvent]) -> Set[int]:
+        BookingExpiryScheduler.cancel(*[event.payload["booking_id"] for event in events])
+        return set()
+
+    @staticmethod
+    def _queue_confirmation_emails(db: Session, events: List[OutboxEvent]) -> Set[int]:
+        """
+        Chuyển email xác nhận sang hàng đợi email (Redis list) - từ đây hàng đợi chịu trách nhiệm gửi:
+        task gửi lô giữ payload trong list processing tới khi gửi xong, worker chết thì payload được
+        trả lại hàng đợi, gửi lỗi quá EMAIL_MAX_ATTEMPTS lần thì chuyển sang dead letter
+        (xem send_payment_success_emails_batch_task). RPUSH lỗi → event được relay thử lại.
+        """
+        enqueue_payment_success_emails([event.payload["booking_id"] for event in events])
+        return set()
+
+    @staticmethod
+    def _record_payment_analytics(db: Session, events: List[OutboxEvent]) -> Set[int]:
+        """
+        Thống kê doanh thu theo ngày (số đơn, số vé, doanh thu)
+        Mỗi event chỉ được cộng 1 lần: chạy lại (vd: ghi outbox_done lỗi) không cộng trùng
+        """
+        pipe = redis_client.pipeline(transaction=False)
+        for event in events:
+            key = f"{OutboxService.ANALYTICS_PREFIX}:{event.created_at:%Y-%m-%d}"
+            _record_analytics_script(
+                keys=[key, f"{key}:events"],
+                args=[event.id, len(event.payload["seat_ids"]), event.payload["total_amount"], OutboxService.DONE_TTL],
+                client=pipe
+            )
+        pipe.execute()
+        return set()
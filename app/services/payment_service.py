@@ -4,10 +4,9 @@ from fastapi import HTTPException, status
 import logging
 
 from app.repositories.booking_repo import BookingRepository
-from app.repositories.seat_repo import SeatRepository
+from app.services.outbox_service import OutboxService
 from app.models.booking_detail import BookingDetail
 from sqlmodel import select
-from app.worker.tasks import send_payment_success_email_task
 
 logger = logging.getLogger(__name__)
 
@@ -20,8 +19,8 @@ class PaymentService:
         vnp_response_code: str
     ) -> dict:
         try:
-            # Lấy thông tin booking
-            booking = BookingRepository.get_booking_by_id(db=db, booking_id=booking_id)
+            # Lấy thông tin booking (khóa dòng booking: các callback đồng thời xử lý lần lượt)
+            booking = BookingRepository.get_booking_by_id(db=db, booking_id=booking_id, for_update=True)
             
             if not booking:
                 raise HTTPException(
@@ -60,26 +59,32 @@ class PaymentService:
                 
                 seat_ids = [detail.seat_id for detail in booking_details]
                 
-                # Cập nhật seat_status thành BOOKED
-                BookingRepository.update_seat_status_to_booked(
+                # Cập nhật seat_status thành BOOKED (1 câu lệnh UPSERT cho tất cả ghế)
+                booked_seat_ids = BookingRepository.update_seat_status_to_booked(
                     db=db,
                     showtime_id=booking.showtime_id,
                     seat_ids=seat_ids
                 )
-                logger.info(f"Updated {len(seat_ids)} seats to BOOKED for booking {booking_id}")
+                
+                # Thiếu ghế → ghế đã được BOOKED bởi booking khác (double-booking)
+                taken_seat_ids = set(seat_ids) - set(booked_seat_ids)
+                if taken_seat_ids:
+                    logger.error(f"Seats {sorted(taken_seat_ids)} already booked, cannot confirm booking {booking_id}")
+                    raise HTTPException(
+                        status_code=status.HTTP_409_CONFLICT,
+                        detail=f"Ghế {', '.join(map(str, sorted(taken_seat_ids)))} đã được đặt bởi booking khác"
+                    )
+                logger.info(f"Updated {len(booked_seat_ids)} seats to BOOKED for booking {booking_id}")
+                
+                # Side effect (sơ đồ ghế, lịch hủy, email, thống kê) ghi vào outbox cùng transaction,
+                # relay xử lý sau commit → không mất side effect khi tiến trình dừng giữa chừng
+                OutboxService.add_payment_succeeded(db=db, booking=booking, seat_ids=seat_ids)
                 
                 db.commit()
                 logger.info(f"Updated booking {booking_id} payment status to PAID")
                 
                 # Lấy thông tin chi tiết booking
                 booking_detail = BookingRepository.get_booking_with_details(db=db, booking_id=booking_id)
-
-                # Gửi email xác nhận (chạy nền qua Celery)
-                if booking_detail and booking_detail.get("email"):
-                    send_payment_success_email_task.delay(
-                        to_email=booking_detail.get("email"),
-                        booking_detail=booking_detail
-                    )
                 
                 return {
                     "status": "success",
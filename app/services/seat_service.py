@@ -1,11 +1,19 @@
-from typing import List, Dict
+import json
+from typing import AsyncIterator, Awaitable, Callable, List, Dict, Optional, Tuple
 from datetime import datetime, timedelta
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from starlette.concurrency import run_in_threadpool
+from app.core.database import engine
 from app.repositories.seat_repo import SeatRepository
 from app.repositories.showtime_repo import ShowtimeRepository
 from app.utils.enum import SeatStatusEnum
 from app.utils.redis_lock import SeatLockManager
+from app.utils.seat_occupancy import SeatOccupancy
+from app.utils.room_layout import RoomLayoutCache
+from app.utils.seat_events import RESYNC, SeatEventHub, SeatEventSubscription
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,85 +22,187 @@ logger = logging.getLogger(__name__)
 class SeatService:
     
     @staticmethod
-    def get_seats_by_showtime(db: Session, showtime_id: int) -> List[Dict]:
+    def get_seat_map_etag(showtime_id: int) -> Tuple[int, str]:
+        """
+        Version + ETag hiện tại của sơ đồ ghế (1 lần gọi Redis)
+        Version tăng mỗi khi ghế được giữ, hủy giữ, hết hạn giữ hoặc được đặt
+        """
+        version = SeatLockManager.get_map_version(showtime_id)
+        return version, f'W/"seats-{showtime_id}-{version}"'
+    
+    @staticmethod
+    async def get_seat_map_etag_async(showtime_id: int) -> Tuple[int, str]:
+        """get_seat_map_etag trên client Redis async"""
+        version = await SeatLockManager.get_map_version_async(showtime_id)
+        return version, f'W/"seats-{showtime_id}-{version}"'
+    
+    @staticmethod
+    def get_seats_by_showtime(db: Session, showtime_id: int, since: Optional[int] = None) -> List[Dict]:
         """
         Lấy danh sách ghế và trạng thái theo suất chiếu
         Kết hợp: DB (ghế đã BOOKED) + Redis (ghế đang HOLD)
+        
+        Nếu có since (version client đang có) → chỉ trả về các ghế thay đổi sau version đó
         """
-        # Kiểm tra showtime có tồn tại không
-        showtime = ShowtimeRepository.get_showtime_by_id(db=db, showtime_id=showtime_id)
+        if since is not None:
+            _, changed_seat_ids = SeatLockManager.get_changed_seats(showtime_id, since)
+            if changed_seat_ids is not None:
+                if not changed_seat_ids:
+                    return []
+                rows = SeatRepository.get_seat_map_rows(
+                    db=db,
+                    showtime_id=showtime_id,
+                    seat_ids=changed_seat_ids
+                )
+                return SeatService._merge_seat_map(showtime_id, rows)
         
-        if not showtime:
+        # Lấy ghế + trạng thái BOOKED trong 1 query
+        rows = SeatRepository.get_seat_map_rows(db=db, showtime_id=showtime_id)
+        SeatService._check_seat_map_rows(rows)
+        return SeatService._merge_seat_map(showtime_id, rows)
+    
+    @staticmethod
+    async def get_seats_by_showtime_async(
+        db: AsyncSession,
+        showtime_id: int,
+        since: Optional[int] = None
+    ) -> List[Dict]:
+        """get_seats_by_showtime trên session + client Redis async"""
+        if since is not None:
+            _, changed_seat_ids = await SeatLockManager.get_changed_seats_async(showtime_id, since)
+            if changed_seat_ids is not None:
+                if not changed_seat_ids:
+                    return []
+                rows = await SeatRepository.get_seat_map_rows_async(
+                    db=db,
+                    showtime_id=showtime_id,
+                    seat_ids=changed_seat_ids
+                )
+                locks = await SeatLockManager.get_all_locks_for_showtime_async(showtime_id)
+                return SeatService._build_seat_map(rows, locks)
+        
+        rows = await SeatRepository.get_seat_map_rows_async(db=db, showtime_id=showtime_id)
+        SeatService._check_seat_map_rows(rows)
+        locks = await SeatLockManager.get_all_locks_for_showtime_async(showtime_id)
+        return SeatService._build_seat_map(rows, locks)
+    
+    @staticmethod
+    def _check_seat_map_rows(rows: List[tuple]) -> None:
+        """Báo 404 nếu suất chiếu / ghế không tồn tại, nạp sẵn cache sơ đồ ghế của phòng"""
+        if not rows:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Suất chiếu không tồn tại"
             )
         
-        # Lấy tất cả ghế trong phòng
-        seats = SeatRepository.get_seats_by_room(db=db, room_id=showtime.room_id)
-        
-        if not seats:
+        room_id = rows[0][0]
+        if rows[0][1] is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Không tìm thấy ghế trong phòng chiếu"
             )
         
-        # Lấy ghế đã BOOKED từ DB
-        booked_seats = SeatRepository.get_seats_status_by_showtime(db=db, showtime_id=showtime_id)
-        booked_map = {ss.seat_id: ss for ss in booked_seats if ss.status == SeatStatusEnum.BOOKED}
-        
+        # Nạp sẵn cache sơ đồ ghế cho các bước giữ ghế / đặt vé tiếp theo
+        if not RoomLayoutCache.contains(room_id):
+            RoomLayoutCache.put(room_id, [row[1:5] for row in rows])
+    
+    @staticmethod
+    def _merge_seat_map(showtime_id: int, rows: List[tuple]) -> List[Dict]:
+        """Ghép ghế (DB) với ghế đang HOLD (Redis)"""
         # Lấy ghế đang HOLD từ Redis
         redis_locks = SeatLockManager.get_all_locks_for_showtime(showtime_id)
+        return SeatService._build_seat_map(rows, redis_locks)
+    
+    @staticmethod
+    def _build_seat_map(rows: List[tuple], redis_locks: List[Dict]) -> List[Dict]:
         redis_lock_map = {lock["seat_id"]: lock for lock in redis_locks}
         
+        # Priority: BOOKED (DB) > HOLD (Redis) > AVAILABLE
+        now = datetime.utcnow()
         result = []
-        for seat in seats:
-            # Priority: BOOKED (DB) > HOLD (Redis) > AVAILABLE
-            
-            # Kiểm tra ghế đã BOOKED trong DB
-            if seat.id in booked_map:
-                result.append({
-                    "seat_id": seat.id,
-                    "seat_name": seat.seat_name,
-                    "seat_type": seat.seat_type,
-                    "price": float(seat.price),
-                    "status": SeatStatusEnum.BOOKED,
-                    "hold_by_user_id": None,
-                    "hold_expired_at": None
-                })
+        append = result.append
+        for _, seat_id, seat_name, seat_type, price, booked in rows:
+            if seat_id is None:
                 continue
             
-            # Kiểm tra ghế đang HOLD trong Redis
-            if seat.id in redis_lock_map:
-                lock_info = redis_lock_map[seat.id]
-                # Tính thời gian hết hạn
-                locked_at = datetime.fromisoformat(lock_info["locked_at"])
-                hold_expired_at = locked_at + timedelta(seconds=lock_info["ttl_remaining"])
-                
-                result.append({
-                    "seat_id": seat.id,
-                    "seat_name": seat.seat_name,
-                    "seat_type": seat.seat_type,
-                    "price": float(seat.price),
-                    "status": SeatStatusEnum.HOLD,
-                    "hold_by_user_id": lock_info["user_id"],
-                    "hold_expired_at": hold_expired_at
-                })
-                continue
+            seat_status = SeatStatusEnum.AVAILABLE
+            hold_by_user_id = None
+            hold_expired_at = None
             
-            # Ghế trống
-            result.append({
-                "seat_id": seat.id,
-                "seat_name": seat.seat_name,
-                "seat_type": seat.seat_type,
-                "price": float(seat.price),
-                "status": SeatStatusEnum.AVAILABLE,
-                "hold_by_user_id": None,
-                "hold_expired_at": None
+            if booked:
+                seat_status = SeatStatusEnum.BOOKED
+            else:
+                lock_info = redis_lock_map.get(seat_id)
+                if lock_info:
+                    seat_status = SeatStatusEnum.HOLD
+                    hold_by_user_id = lock_info["user_id"]
+                    hold_expired_at = now + timedelta(seconds=lock_info["ttl_remaining"])
+            
+            append({
+                "seat_id": seat_id,
+                "seat_name": seat_name,
+                "seat_type": seat_type,
+                "price": float(price),
+                "status": seat_status,
+                "hold_by_user_id": hold_by_user_id,
+                "hold_expired_at": hold_expired_at
             })
         
         return result
     
+    @staticmethod
+    def load_seat_map_snapshot(showtime_id: int) -> Dict:
+        """
+        Sơ đồ ghế đầy đủ kèm version (mở session riêng, dùng cho stream sơ đồ ghế)
+        Version được đọc trước sơ đồ ghế nên event có version lớn hơn luôn được áp dụng lại
+        """
+        with Session(engine) as db:
+            version, _ = SeatService.get_seat_map_etag(showtime_id)
+            seats = SeatService.get_seats_by_showtime(db=db, showtime_id=showtime_id)
+        return {"version": version, "seats": jsonable_encoder(seats)}
+    
+    @staticmethod
+    def _format_sse(event: str, version: int, data: Dict) -> str:
+        return f"id: {version}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    
+    @staticmethod
+    async def stream_seat_map(
+        showtime_id: int,
+        subscription: SeatEventSubscription,
+        snapshot: Dict,
+        is_disconnected: Callable[[], Awaitable[bool]]
+    ) -> AsyncIterator[str]:
+        """
+        Server-Sent Events cho sơ đồ ghế:
+        - event "snapshot": toàn bộ sơ đồ ghế (lúc kết nối và khi phải đồng bộ lại)
+        - event "seats": {version, status, seat_ids, user_id, ttl} khi ghế đổi trạng thái
+        Version tăng liên tục từng bước, thấy version bị nhảy cóc nghĩa là đã mất event → gửi lại snapshot
+        """
+        try:
+            version = snapshot["version"]
+            yield SeatService._format_sse("snapshot", version, snapshot)
+            
+            while not await is_disconnected():
+                event = await subscription.get(timeout=SeatEventHub.HEARTBEAT_SECONDS)
+                if event is None:
+                    yield ": ping\n\n"
+                    continue
+                
+                if event is RESYNC or event["version"] > version + 1:
+                    snapshot = await run_in_threadpool(SeatService.load_seat_map_snapshot, showtime_id)
+                    version = snapshot["version"]
+                    yield SeatService._format_sse("snapshot", version, snapshot)
+                    continue
+                
+                # Event đã có trong snapshot
+                if event["version"] <= version:
+                    continue
+                
+                version = event["version"]
+                yield SeatService._format_sse("seats", version, event)
+        finally:
+            SeatEventHub.unsubscribe(subscription)
+    
     @staticmethod
     def hold_seats(
         db: Session,
@@ -114,63 +224,108 @@ class SeatService:
             )
         
         ttl_seconds = hold_minutes * 60
-        results = []
+        seat_ids = list(dict.fromkeys(seat_ids))
         
-        for seat_id in seat_ids:
-            # Kiểm tra ghế có tồn tại không
-            seat = SeatRepository.get_seat_by_id(db=db, seat_id=seat_id)
-            if not seat:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"Ghế {seat_id} không tồn tại"
-                )
-            
-            # Kiểm tra ghế đã BOOKED trong DB chưa
-            seat_status = SeatRepository.get_seat_status(db=db, showtime_id=showtime_id, seat_id=seat_id)
-            if seat_status and seat_status.status == SeatStatusEnum.BOOKED:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Ghế {seat.seat_name} đã được đặt"
-                )
-            
-            # Kiểm tra ghế có đang bị HOLD trong Redis không
-            lock_info = SeatLockManager.get_seat_lock_info(showtime_id, seat_id)
-            if lock_info:
-                # Nếu người khác đang hold
-                if lock_info["user_id"] != user_id:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail=f"Ghế {seat.seat_name} đang được giữ bởi người khác"
-                    )
-                # Nếu cùng user → gia hạn lock
-            
-            # Lock ghế trong Redis với TTL
-            lock_success = SeatLockManager.lock_seat(
-                showtime_id=showtime_id,
-                seat_id=seat_id,
-                user_id=user_id,
-                ttl=ttl_seconds
+        # Kiểm tra ghế có tồn tại trong phòng chiếu không (từ cache sơ đồ ghế)
+        layout = RoomLayoutCache.get(db=db, room_id=showtime.room_id)
+        SeatService._check_seats_in_layout(layout, seat_ids)
+        
+        # Kiểm tra ghế đã BOOKED trong DB chưa (1 query)
+        booked_ids = SeatRepository.get_booked_seat_ids(db=db, showtime_id=showtime_id, seat_ids=seat_ids)
+        SeatService._check_not_booked(layout, booked_ids)
+        
+        # Lock tất cả ghế trong Redis với TTL (1 round trip, all-or-nothing)
+        # Nếu cùng user đang giữ → gia hạn lock
+        conflicts = SeatLockManager.lock_seats(
+            showtime_id=showtime_id,
+            seat_ids=seat_ids,
+            user_id=user_id,
+            ttl=ttl_seconds,
+            ordinals=layout.ordinals(seat_ids)
+        )
+        return SeatService._hold_result(layout, seat_ids, user_id, hold_minutes, conflicts)
+    
+    @staticmethod
+    async def hold_seats_async(
+        db: AsyncSession,
+        showtime_id: int,
+        seat_ids: List[int],
+        user_id: int,
+        hold_minutes: int = 10
+    ) -> List[Dict]:
+        """hold_seats trên session + client Redis async"""
+        showtime = await ShowtimeRepository.get_showtime_by_id_async(db=db, showtime_id=showtime_id)
+        if not showtime:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Suất chiếu không tồn tại"
             )
-            
-            if not lock_success:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Không thể giữ ghế {seat.seat_name}"
-                )
-            
-            # Tính thời gian hết hạn
-            hold_expired_at = datetime.utcnow() + timedelta(seconds=ttl_seconds)
-            
-            logger.info(f"User {user_id} locked seat {seat_id} in Redis for {hold_minutes} minutes")
-            
-            results.append({
+        
+        seat_ids = list(dict.fromkeys(seat_ids))
+        layout = await RoomLayoutCache.get_async(db=db, room_id=showtime.room_id)
+        SeatService._check_seats_in_layout(layout, seat_ids)
+        
+        booked_ids = await SeatRepository.get_booked_seat_ids_async(
+            db=db,
+            showtime_id=showtime_id,
+            seat_ids=seat_ids
+        )
+        SeatService._check_not_booked(layout, booked_ids)
+        
+        conflicts = await SeatLockManager.lock_seats_async(
+            showtime_id=showtime_id,
+            seat_ids=seat_ids,
+            user_id=user_id,
+            ttl=hold_minutes * 60,
+            ordinals=layout.ordinals(seat_ids)
+        )
+        return SeatService._hold_result(layout, seat_ids, user_id, hold_minutes, conflicts)
+    
+    @staticmethod
+    def _check_seats_in_layout(layout, seat_ids: List[int]) -> None:
+        missing = [seat_id for seat_id in seat_ids if seat_id not in layout]
+        if missing:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Ghế {', '.join(map(str, missing))} không tồn tại"
+            )
+    
+    @staticmethod
+    def _check_not_booked(layout, booked_ids: List[int]) -> None:
+        if booked_ids:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Ghế {', '.join(layout.seat_name(seat_id) for seat_id in booked_ids)} đã được đặt"
+            )
+    
+    @staticmethod
+    def _hold_result(
+        layout,
+        seat_ids: List[int],
+        user_id: int,
+        hold_minutes: int,
+        conflicts: List[Dict]
+    ) -> List[Dict]:
+        """Kết quả giữ ghế, báo lỗi nếu có ghế đang được người khác giữ"""
+        if conflicts:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Ghế {', '.join(layout.seat_name(c['seat_id']) for c in conflicts)} đang được giữ bởi người khác"
+            )
+        
+        # Tính thời gian hết hạn
+        hold_expired_at = datetime.utcnow() + timedelta(minutes=hold_minutes)
+        logger.info(f"User {user_id} locked seats {seat_ids} in Redis for {hold_minutes} minutes")
+        
+        return [
+            {
                 "seat_id": seat_id,
-                "seat_name": seat.seat_name,
+                "seat_name": layout.seat_name(seat_id),
                 "status": SeatStatusEnum.HOLD,
                 "hold_expired_at": hold_expired_at
-            })
-        
-        return results
+            }
+            for seat_id in seat_ids
+        ]
     
     @staticmethod
     def release_seats(
@@ -183,23 +338,32 @@ class SeatService:
         Hủy giữ ghế khỏi Redis
         User tự hủy hoặc khi chuyển sang trang khác
         """
-        released_count = 0
-        failed_seats = []
+        # Bỏ lock các ghế user đang giữ trong 1 lần gọi Redis
+        released, _ = SeatLockManager.unlock_seats(
+            showtime_id=showtime_id,
+            seat_ids=seat_ids,
+            user_id=user_id  # Check ownership
+        )
+        return SeatService._release_result(seat_ids, user_id, released)
+    
+    @staticmethod
+    async def release_seats_async(showtime_id: int, seat_ids: List[int], user_id: int) -> Dict:
+        """release_seats trên client Redis async"""
+        released, _ = await SeatLockManager.unlock_seats_async(
+            showtime_id=showtime_id,
+            seat_ids=seat_ids,
+            user_id=user_id
+        )
+        return SeatService._release_result(seat_ids, user_id, released)
+    
+    @staticmethod
+    def _release_result(seat_ids: List[int], user_id: int, released: List[int]) -> Dict:
+        released_count = len(released)
+        released_ids = set(released)
+        failed_seats = [seat_id for seat_id in seat_ids if seat_id not in released_ids]
         
-        for seat_id in seat_ids:
-            # Unlock ghế khỏi Redis
-            unlock_success = SeatLockManager.unlock_seat(
-                showtime_id=showtime_id,
-                seat_id=seat_id,
-                user_id=user_id  # Check ownership
-            )
-            
-            if unlock_success:
-                released_count += 1
-                logger.info(f"User {user_id} released seat {seat_id} from Redis")
-            else:
-                failed_seats.append(seat_id)
-                logger.warning(f"Failed to release seat {seat_id} for user {user_id}")
+        if failed_seats:
+            logger.warning(f"Failed to release seats {failed_seats} for user {user_id}")
         
         return {
             "released_count": released_count,
@@ -211,8 +375,12 @@ class SeatService:
     def get_available_seats_count(db: Session, showtime_id: int) -> int:
         """
         Đếm số ghế còn trống
-        = Tổng ghế - Ghế BOOKED (DB) - Ghế HOLD (Redis)
+        = Tổng ghế - Ghế BOOKED - Ghế HOLD (BITCOUNT trên bitmap Redis)
         """
+        count = SeatOccupancy.count_available([showtime_id])[showtime_id]
+        if count is not None:
+            return count
+        
         showtime = ShowtimeRepository.get_showtime_by_id(db=db, showtime_id=showtime_id)
         if not showtime:
             raise HTTPException(
@@ -220,19 +388,64 @@ class SeatService:
                 detail="Suất chiếu không tồn tại"
             )
         
-        # Tổng số ghế trong phòng
-        total_seats = len(SeatRepository.get_seats_by_room(db=db, room_id=showtime.room_id))
+        # Bitmap chưa có → nạp từ DB rồi đếm lại
+        SeatService.warm_occupancy(db=db, showtime=showtime)
+        return SeatOccupancy.count_available([showtime_id])[showtime_id] or 0
+    
+    @staticmethod
+    def get_available_seats_counts(db: Session, showtime_ids: List[int]) -> Dict[int, int]:
+        """
+        Đếm số ghế còn trống cho nhiều suất chiếu (vd: cả ngày chiếu) trong 1 pipeline Redis
+        Suất chiếu không tồn tại sẽ bị bỏ qua
+        """
+        showtime_ids = list(dict.fromkeys(showtime_ids))
+        counts = SeatOccupancy.count_available(showtime_ids)
         
-        # Số ghế đã BOOKED trong DB
-        booked_seats = SeatRepository.get_seats_status_by_showtime(db=db, showtime_id=showtime_id)
-        booked_count = len([s for s in booked_seats if s.status == SeatStatusEnum.BOOKED])
+        missing = [showtime_id for showtime_id, count in counts.items() if count is None]
+        if missing:
+            for showtime in ShowtimeRepository.get_by_ids(db=db, showtime_ids=missing):
+                SeatService.warm_occupancy(db=db, showtime=showtime)
+            counts.update(SeatOccupancy.count_available(missing))
         
-        # Số ghế đang HOLD trong Redis
-        redis_locks = SeatLockManager.get_all_locks_for_showtime(showtime_id)
-        hold_count = len(redis_locks)
+        return {showtime_id: count for showtime_id, count in counts.items() if count is not None}
+    
+    @staticmethod
+    def warm_occupancy(db: Session, showtime) -> None:
+        """
+        Nạp bitmap ghế BOOKED của suất chiếu từ DB
+        và đánh lại bitmap ghế đang giữ theo sơ đồ ghế hiện tại (capacity, ordinal luôn khớp nhau)
+        """
+        layout = RoomLayoutCache.get(db=db, room_id=showtime.room_id)
+        booked_ids = SeatRepository.get_booked_seat_ids(db=db, showtime_id=showtime.id)
+        SeatLockManager.reindex_held_bits(showtime.id, layout.ordinals())
+        SeatOccupancy.warm(
+            showtime_id=showtime.id,
+            capacity=len(layout),
+            booked_ordinals=layout.ordinals(booked_ids).values()
+        )
+    
+    @staticmethod
+    def mark_seats_booked(db: Session, showtime_id: int, seat_ids: List[int]) -> None:
+        """
+        Cập nhật bitmap ghế BOOKED, version sơ đồ ghế và báo ghế BOOKED sau khi thanh toán thành công
+        Lỗi Redis được ném ra để người gọi (outbox relay) thử lại, chạy lại nhiều lần không sao
+        """
+        showtime = ShowtimeRepository.get_showtime_by_id(db=db, showtime_id=showtime_id)
+        if not showtime:
+            return
+        try:
+            layout = RoomLayoutCache.get(db=db, room_id=showtime.room_id)
+            SeatOccupancy.mark_booked(
+                showtime_id=showtime_id,
+                ordinals=layout.ordinals(seat_ids).values()
+            )
+        except Exception as e:
+            # Bitmap sẽ được nạp lại từ DB (xóa không được thì lỗi được ném ra)
+            logger.error(f"Failed to update occupancy bitmap for showtime {showtime_id}: {e}")
+            SeatOccupancy.invalidate(showtime_id)
         
-        available = total_seats - booked_count - hold_count
-        return max(0, available)  # Không cho số âm
+        # Tăng version sơ đồ ghế + publish event BOOKED cho client đang theo dõi
+        SeatLockManager.bump_map_version(showtime_id, seat_ids, status=SeatStatusEnum.BOOKED.value)
     
     @staticmethod
     def book_seats_after_payment(
@@ -254,41 +467,51 @@ class SeatService:
         Returns:
             True nếu thành công
         """
+        seat_ids = list(dict.fromkeys(seat_ids))
+        
+        # Kiểm tra ghế có đang bị hold bởi user này không + xóa lock khỏi Redis (1 script)
+        released, conflicts = SeatLockManager.unlock_seats(
+            showtime_id=showtime_id,
+            seat_ids=seat_ids,
+            user_id=user_id,
+            strict=True
+        )
+        if conflicts:
+            logger.error(f"Seats {[c['seat_id'] for c in conflicts]} locked by different user")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Ghế {', '.join(str(c['seat_id']) for c in conflicts)} đang được giữ bởi người khác"
+            )
+        
+        not_held = [seat_id for seat_id in seat_ids if seat_id not in set(released)]
+        if not_held:
+            logger.error(f"Seats {not_held} not locked by user {user_id}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Ghế {', '.join(map(str, not_held))} không được giữ bởi bạn"
+            )
+        
         try:
-            for seat_id in seat_ids:
-                # Kiểm tra ghế có đang bị hold bởi user này không
-                lock_info = SeatLockManager.get_seat_lock_info(showtime_id, seat_id)
-                
-                if not lock_info:
-                    logger.error(f"Seat {seat_id} not locked by user {user_id}")
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail=f"Ghế {seat_id} không được giữ bởi bạn"
-                    )
-                
-                if lock_info["user_id"] != user_id:
-                    logger.error(f"Seat {seat_id} locked by different user")
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail=f"Ghế {seat_id} đang được giữ bởi người khác"
-                    )
-                
-                # Lưu vào DB với status BOOKED
-                SeatRepository.book_seat(db=db, showtime_id=showtime_id, seat_id=seat_id)
-                
-                # Xóa lock khỏi Redis
-                SeatLockManager.unlock_seat(showtime_id, seat_id, user_id)
-                
-                logger.info(f"Booked seat {seat_id} and removed Redis lock")
-            
-            return True
-            
+            # Lưu vào DB với status BOOKED (1 câu lệnh UPSERT)
+            booked = SeatRepository.book_seats(db=db, showtime_id=showtime_id, seat_ids=seat_ids)
+            if len(booked) != len(seat_ids):
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Ghế đã được đặt bởi booking khác"
+                )
+            db.commit()
         except Exception as e:
+            db.rollback()
             logger.error(f"Error booking seats: {str(e)}")
-            # Rollback: Unlock tất cả ghế nếu có lỗi
-            for seat_id in seat_ids:
-                SeatLockManager.unlock_seat(showtime_id, seat_id, user_id)
             raise
+        
+        logger.info(f"Booked seats {seat_ids} for booking {booking_id} and removed Redis locks")
+        # Ghế đã BOOKED trong DB: lỗi Redis không làm hỏng thanh toán
+        try:
+            SeatService.mark_seats_booked(db=db, showtime_id=showtime_id, seat_ids=seat_ids)
+        except Exception as e:
+            logger.error(f"Failed to publish booked seats for showtime {showtime_id}: {e}")
+        return True
     
     @staticmethod
     def cancel_hold_for_user(db: Session, showtime_id: int, user_id: int) -> int:
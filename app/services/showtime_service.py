@@ -1,10 +1,13 @@
 from sqlmodel import Session
 from datetime import date
+from typing import List
 from fastapi import HTTPException, status
 from app.repositories.showtime_repo import ShowtimeRepository
-from app.repositories.film_repo import FilmRepository
-from app.repositories.cinema_room_repo import CinemaRoomRepository
-from app.repositories.theater_repo import TheaterRepo
+from app.repositories.film_schedule_repo import FilmScheduleRepository
+from app.services.film_schedule_service import FilmScheduleService
+from app.core.config import settings
+from app.utils.catalog_cache import CatalogCache
+from app.utils.showtime_detail_cache import ShowtimeDetailCache
 
 class ShowtimeService:
 
@@ -15,66 +18,59 @@ class ShowtimeService:
         theater_id: int,
         show_date: date,
     ):
-        return ShowtimeRepository.get_showtimes_by_film_theater_date(
+        return CatalogCache.get_or_load(
+            namespace="showtimes",
+            key=f"{film_id}:{theater_id}:{show_date.isoformat()}",
+            tags=[FilmScheduleService.CACHE_TAG],
+            ttl=settings.CATALOG_CACHE_SHOWTIME_TTL,
+            loader=lambda: ShowtimeService._load_schedule(db, film_id, theater_id, show_date)
+        )
+
+    @staticmethod
+    def _load_schedule(db: Session, film_id: int, theater_id: int, show_date: date) -> List[dict]:
+        """Suất chiếu ACTIVE của phim tại rạp trong ngày từ read model lịch chiếu (1 lần tra PK)"""
+        schedule = FilmScheduleRepository.get_schedule(
             db=db,
             film_id=film_id,
             theater_id=theater_id,
-            show_date=show_date,)
+            show_date=show_date
+        )
+        if not schedule:
+            return []
+        return [
+            {
+                "id": showtime_id,
+                "room_id": room_id,
+                "film_id": film_id,
+                "show_date": show_date,
+                "start_time": start_time,
+                "end_time": end_time,
+                "format": showtime_format,
+                "status": "ACTIVE",
+            }
+            for showtime_id, room_id, start_time, end_time, showtime_format in zip(
+                schedule.showtime_ids,
+                schedule.room_ids,
+                schedule.start_times,
+                schedule.end_times,
+                schedule.formats,
+            )
+        ]
     
     @staticmethod
     def get_showtime_by_id(db: Session, showtime_id: int):
-        showtime = ShowtimeRepository.get_showtime_by_id(db=db, showtime_id=showtime_id)
-        if not showtime:
+        # Trang thanh toán gọi nhiều lần cho cùng suất chiếu → cache trong tiến trình
+        detail = ShowtimeDetailCache.get(showtime_id)
+        if detail is not None:
+            return detail
+
+        # Suất chiếu + phim + phòng + rạp trong 1 query
+        detail = ShowtimeRepository.get_showtime_detail(db=db, showtime_id=showtime_id)
+        if not detail:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Không tìm thấy suất chiếu"
             )
-        
-        # Lấy thông tin phim
-        film = FilmRepository.get_by_id(db=db, film_id=showtime.film_id)
-        if not film:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Không tìm thấy thông tin phim"
-            )
-        
-        # Lấy thông tin phòng chiếu
-        room = CinemaRoomRepository.get_by_id(db=db, room_id=showtime.room_id)
-        if not room:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Không tìm thấy thông tin phòng chiếu"
-            )
-        
-        # Lấy thông tin rạp
-        theater = TheaterRepo.get_by_id(db=db, theater_id=room.theater_id)
-        if not theater:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Không tìm thấy thông tin rạp"
-            )
-        
-        # Trả về đầy đủ thông tin
-        return {
-            "id": showtime.id,
-            "show_date": showtime.show_date,
-            "start_time": showtime.start_time,
-            "end_time": showtime.end_time,
-            "format": showtime.format,
-            "status": showtime.status,
-            
-            # Thông tin phim
-            "film_id": film.id,
-            "film_title": film.title,
-            "image": film.image,
-            "duration": film.duration,
-            "language": film.language,
-            "subtitle": film.subtitle,
-            
-            # Thông tin phòng và rạp
-            "room_id": room.id,
-            "room_name": room.name,
-            "theater_id": theater.id,
-            "theater_name": theater.name,
-            "theater_address": theater.address,
-        }
\ No newline at end of file
+
+        ShowtimeDetailCache.put(showtime_id, detail)
+        return detail
@@ -1,16 +1,39 @@
 from sqlmodel import Session
+from app.core.config import settings
 from app.repositories.theater_repo import TheaterRepo
+from app.repositories.film_schedule_repo import FilmScheduleRepository
+from app.services.film_schedule_service import FilmScheduleService
+from app.utils.catalog_cache import CatalogCache
 
 class TheaterService:
     @staticmethod
     def get_all_theaters(db: Session):
-        return TheaterRepo.get_all(db)
+        return CatalogCache.get_or_load(
+            namespace="theaters",
+            key="all",
+            tags=["theaters"],
+            ttl=settings.CATALOG_CACHE_THEATER_TTL,
+            loader=lambda: TheaterRepo.get_all(db)
+        )
 
     @staticmethod
     def get_theater_by_id(db: Session, theater_id: int):
-        return TheaterRepo.get_by_id(db, theater_id)
+        return CatalogCache.get_or_load(
+            namespace="theater",
+            key=str(theater_id),
+            tags=[f"theaters:{theater_id}"],
+            ttl=settings.CATALOG_CACHE_THEATER_TTL,
+            loader=lambda: TheaterRepo.get_by_id(db, theater_id)
+        )
 
 
     @staticmethod
     def get_theaters_by_film(db: Session, film_id: int):
-        return TheaterRepo.get_by_film(db, film_id)
\ No newline at end of file
+        # Đọc từ read model lịch chiếu (không DISTINCT join rạp/phòng/suất chiếu)
+        return CatalogCache.get_or_load(
+            namespace="theaters_by_film",
+            key=str(film_id),
+            tags=["theaters", FilmScheduleService.CACHE_TAG],
+            ttl=settings.CATALOG_CACHE_SHOWTIME_TTL,
+            loader=lambda: FilmScheduleRepository.get_theaters_by_film(db, film_id)
+        )
@@ -0,0 +1,45 @@
+"""
+Bloom Filter
+Tập hợp xác suất gọn trong bộ nhớ: không bao giờ báo thiếu phần tử đã thêm,
+có thể báo nhầm phần tử chưa thêm với xác suất ~error_rate (cần kiểm tra lại ở nguồn dữ liệu thật)
+"""
+import hashlib
+import math
+from threading import Lock
+
+
+class BloomFilter:
+    """
+    Bloom filter kích thước cố định cho tối đa capacity phần tử
+    Không xóa được phần tử → tạo filter mới khi cần bỏ phần tử cũ
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+        self._lock = Lock()
+
+    def _positions(self, item: str):
+        # Double hashing: h1 + i * h2 (2 hash 64 bit lấy từ 1 lần sha256)
+        digest = hashlib.sha256(item.encode()).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:16], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, item: str) -> None:
+        positions = self._positions(item)
+        with self._lock:
+            for position in positions:
+                self._bits[position >> 3] |= 1 << (position & 7)
+            self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    @property
+    def is_full(self) -> bool:
+        """Đã thêm quá capacity → tỉ lệ báo nhầm tăng, nên tạo lại filter"""
+        return self.count >= self.capacity
@@ -0,0 +1,89 @@
+"""
+Booking Expiry Scheduler
+Hạn thanh toán của booking lưu trong Redis để hủy đúng thời điểm (thay vì quét bảng bookings mỗi phút)
+
+- booking_expiry        (zset) booking_id -> hạn thanh toán (epoch giây)
+- booking_expiry_wakeup (list) đánh thức dispatcher khi có booking mới
+
+Dispatcher (app/worker/expiry_scheduler.py) ngủ đến hạn gần nhất rồi lấy ra đúng các booking đã đến hạn.
+"""
+from datetime import datetime
+from typing import List, Optional
+from app.core.redis import async_redis_client, redis_client
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Lua script lấy và xóa (atomic) các booking đã đến hạn
+# KEYS[1]: zset, ARGV[1]: số booking tối đa
+# Trả về danh sách booking_id
+_POP_DUE_SCRIPT = """
+local now = redis.call('TIME')
+local now_seconds = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now_seconds, 'LIMIT', 0, tonumber(ARGV[1]))
+if #due > 0 then
+    redis.call('ZREM', KEYS[1], unpack(due))
+end
+return due
+"""
+
+_pop_due_script = redis_client.register_script(_POP_DUE_SCRIPT)
+
+
+class BookingExpiryScheduler:
+    """
+    Lịch hủy booking PENDING quá hạn thanh toán
+    """
+
+    QUEUE_KEY = "booking_expiry"
+    WAKEUP_KEY = "booking_expiry_wakeup"
+
+    @staticmethod
+    def schedule(booking_id: int, deadline: datetime) -> None:
+        """Đăng ký hạn thanh toán của booking (deadline theo UTC)"""
+        score = (deadline - datetime(1970, 1, 1)).total_seconds()
+        pipe = redis_client.pipeline()
+        pipe.zadd(BookingExpiryScheduler.QUEUE_KEY, {booking_id: score})
+        # Chỉ cần 1 tín hiệu đánh thức đang chờ
+        pipe.lpush(BookingExpiryScheduler.WAKEUP_KEY, 1)
+        pipe.ltrim(BookingExpiryScheduler.WAKEUP_KEY, 0, 0)
+        pipe.execute()
+
+    @staticmethod
+    async def schedule_async(booking_id: int, deadline: datetime) -> None:
+        """schedule trên client Redis async"""
+        score = (deadline - datetime(1970, 1, 1)).total_seconds()
+        async with async_redis_client.pipeline() as pipe:
+            pipe.zadd(BookingExpiryScheduler.QUEUE_KEY, {booking_id: score})
+            pipe.lpush(BookingExpiryScheduler.WAKEUP_KEY, 1)
+            pipe.ltrim(BookingExpiryScheduler.WAKEUP_KEY, 0, 0)
+            await pipe.execute()
+
+    @staticmethod
+    def cancel(*booking_ids: int) -> None:
+        """Bỏ lịch hủy (booking đã thanh toán)"""
+        if booking_ids:
+            redis_client.zrem(BookingExpiryScheduler.QUEUE_KEY, *booking_ids)
+
+    @staticmethod
+    def pop_due(limit: int) -> List[int]:
+        """Lấy ra tối đa limit booking đã đến hạn (nhiều dispatcher chạy song song không bị trùng)"""
+        due = _pop_due_script(keys=[BookingExpiryScheduler.QUEUE_KEY], args=[limit])
+        return [int(booking_id) for booking_id in due]
+
+    @staticmethod
+    def seconds_until_next() -> Optional[float]:
+        """Số giây đến hạn gần nhất, None nếu không có booking nào đang chờ"""
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.zrange(BookingExpiryScheduler.QUEUE_KEY, 0, 0, withscores=True)
+        pipe.time()
+        head, (seconds, microseconds) = pipe.execute()
+        if not head:
+            return None
+        return max(0.0, head[0][1] - (seconds + microseconds / 1_000_000))
+
+    @staticmethod
+    def wait(timeout: float) -> None:
+        """Chờ tối đa timeout giây hoặc đến khi có booking mới được đăng ký"""
+        redis_client.blpop(BookingExpiryScheduler.WAKEUP_KEY, timeout=timeout)
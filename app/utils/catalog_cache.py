@@ -0,0 +1,214 @@
+"""
+Catalog Cache
+Cache read-through trong Redis cho dữ liệu danh mục (phim, rạp, phòng chiếu, suất chiếu)
+
+- catalog:v:{namespace}:{key} (string) JSON của kết quả, hết hạn theo TTL của từng loại dữ liệu
+- catalog:tag:{tag} (set)    các key phụ thuộc tag (tên bảng hoặc bảng:id)
+- catalog:gen       (string) tăng mỗi lần xóa cache, kết quả đọc từ DB trước lần xóa thì không được lưu
+- catalog:lock:{namespace}:{key} chỉ 1 request nạp key đang thiếu, các request khác chờ kết quả
+- catalog:stats     (hash)   {namespace}:hit / {namespace}:miss
+
+Dữ liệu thay đổi (ORM insert/update/delete) → xóa các tag liên quan sau khi transaction commit.
+"""
+import json
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Set
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.core.redis import redis_client
+from app.models.cinema_room import CinemaRoom
+from app.models.film import Film
+from app.models.showtime import Showtime
+from app.models.theater import Theater
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Lua script đọc key và đếm hit/miss
+# KEYS[1]: key, KEYS[2]: hash thống kê, KEYS[3]: generation, ARGV[1]: namespace
+# Trả về {giá trị (false nếu thiếu), generation hiện tại}
+_GET_SCRIPT = """
+local value = redis.call('GET', KEYS[1])
+if value then
+    redis.call('HINCRBY', KEYS[2], ARGV[1] .. ':hit', 1)
+else
+    redis.call('HINCRBY', KEYS[2], ARGV[1] .. ':miss', 1)
+end
+return {value, redis.call('GET', KEYS[3])}
+"""
+
+# Lua script lưu kết quả nếu không có lần xóa cache nào từ lúc đọc DB
+# KEYS[1]: key, KEYS[2]: generation, ARGV[1]: generation lúc đọc, ARGV[2]: TTL (giây), ARGV[3]: JSON
+# ARGV[4..]: key của các tag
+# Trả về 1 nếu đã lưu
+_SET_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[3], 'EX', tonumber(ARGV[2]))
+for i = 4, #ARGV do
+    redis.call('SADD', ARGV[i], KEYS[1])
+    -- Tag tồn tại ít nhất bằng key sống lâu nhất của tag
+    if redis.call('TTL', ARGV[i]) < tonumber(ARGV[2]) then
+        redis.call('EXPIRE', ARGV[i], tonumber(ARGV[2]))
+    end
+end
+return 1
+"""
+
+# Lua script xóa các key của tag
+# KEYS[1]: generation, ARGV: key của các tag
+_INVALIDATE_SCRIPT = """
+redis.call('INCR', KEYS[1])
+local count = 0
+for i = 1, #ARGV do
+    local keys = redis.call('SMEMBERS', ARGV[i])
+    for j = 1, #keys do
+        count = count + redis.call('DEL', keys[j])
+    end
+    redis.call('DEL', ARGV[i])
+end
+return count
+"""
+
+_get_script = redis_client.register_script(_GET_SCRIPT)
+_set_script = redis_client.register_script(_SET_SCRIPT)
+_invalidate_script = redis_client.register_script(_INVALIDATE_SCRIPT)
+
+
+class CatalogCache:
+    """
+    Cache read-through dùng chung của các service danh mục
+    Redis lỗi thì đọc thẳng DB (cache không làm hỏng request)
+    """
+
+    PREFIX = "catalog"
+    GEN_KEY = "catalog:gen"
+    STATS_KEY = "catalog:stats"
+    LOCK_SECONDS = 5
+    LOCK_WAIT_SECONDS = 3.0
+    POLL_SECONDS = 0.05
+
+    @staticmethod
+    def get_or_load(
+        namespace: str,
+        key: str,
+        tags: List[str],
+        ttl: int,
+        loader: Callable[[], Any]
+    ) -> Any:
+        """
+        Lấy kết quả trong cache, thiếu thì gọi loader (chỉ 1 request nạp mỗi key)
+        Kết quả được lưu dạng JSON (giống response), loader trả về None thì không lưu
+        """
+        cache_key = f"{CatalogCache.PREFIX}:v:{namespace}:{key}"
+        try:
+            value, generation = _get_script(
+                keys=[cache_key, CatalogCache.STATS_KEY, CatalogCache.GEN_KEY],
+                args=[namespace]
+            )
+        except Exception as e:
+            logger.warning(f"Catalog cache unavailable: {e}")
+            return loader()
+        if value is not None:
+            return json.loads(value)
+
+        lock_key = f"{CatalogCache.PREFIX}:lock:{namespace}:{key}"
+        token = uuid.uuid4().hex
+        try:
+            acquired = redis_client.set(lock_key, token, nx=True, ex=CatalogCache.LOCK_SECONDS)
+        except Exception as e:
+            logger.warning(f"Catalog cache unavailable: {e}")
+            return loader()
+
+        if not acquired:
+            # Request khác đang nạp key → chờ kết quả, quá thời gian chờ thì tự đọc DB
+            cached = CatalogCache._wait_for(cache_key)
+            if cached is not None:
+                return json.loads(cached)
+            return loader()
+
+        try:
+            result = loader()
+            if result is None:
+                return None
+            payload = jsonable_encoder(result)
+            _set_script(
+                keys=[cache_key, CatalogCache.GEN_KEY],
+                args=[
+                    generation or "0",
+                    ttl,
+                    json.dumps(payload),
+                    *[f"{CatalogCache.PREFIX}:tag:{tag}" for tag in tags]
+                ]
+            )
+            return payload
+        finally:
+            try:
+                if redis_client.get(lock_key) == token:
+                    redis_client.delete(lock_key)
+            except Exception:
+                pass
+
+    @staticmethod
+    def _wait_for(cache_key: str) -> Optional[str]:
+        deadline = time.monotonic() + CatalogCache.LOCK_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(CatalogCache.POLL_SECONDS)
+            value = redis_client.get(cache_key)
+            if value is not None:
+                return value
+        return None
+
+    @staticmethod
+    def invalidate(tags: Set[str]) -> None:
+        """Xóa các key phụ thuộc tag"""
+        if not tags:
+            return
+        try:
+            count = _invalidate_script(
+                keys=[CatalogCache.GEN_KEY],
+                args=[f"{CatalogCache.PREFIX}:tag:{tag}" for tag in tags]
+            )
+            logger.info(f"Invalidated {count} catalog cache entries for {sorted(tags)}")
+        except Exception as e:
+            logger.error(f"Failed to invalidate catalog cache for {sorted(tags)}: {e}")
+
+    @staticmethod
+    def stats() -> Dict[str, Dict[str, int]]:
+        """Số lần hit / miss theo từng loại dữ liệu"""
+        result: Dict[str, Dict[str, int]] = {}
+        for field, value in redis_client.hgetall(CatalogCache.STATS_KEY).items():
+            namespace, _, outcome = field.rpartition(":")
+            result.setdefault(namespace, {"hit": 0, "miss": 0})[outcome] = int(value)
+        return result
+
+
+_CATALOG_MODELS = (Film, Theater, CinemaRoom, Showtime)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_catalog_tags(session: Session, flush_context) -> None:
+    """Ghi nhận tag của dữ liệu danh mục bị thay đổi, xóa cache sau khi commit"""
+    tags = session.info.setdefault("catalog_tags", set())
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(instance, _CATALOG_MODELS):
+            table = instance.__tablename__
+            tags.add(table)
+            if instance.id is not None:
+                tags.add(f"{table}:{instance.id}")
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_catalog_cache(session: Session) -> None:
+    tags = session.info.pop("catalog_tags", None)
+    if tags:
+        CatalogCache.invalidate(tags)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_catalog_tags(session: Session) -> None:
+    session.info.pop("catalog_tags", None)
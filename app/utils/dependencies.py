@@ -2,14 +2,17 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core.config import settings
-from app.core.redis import redis_client
-from app.core.database import get_session
+from app.core.redis import async_redis_client, redis_client
+from app.core.database import get_async_session, get_session
 from app.models import User
 from app.services.auth_service import AuthService
 from app.repositories.auth_repo import AuthRepository
 from app.utils.enum import UserRole
+from app.utils.token_cache import TokenCache
+from app.utils.token_revocation import RevokedTokens
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
@@ -17,31 +20,62 @@ def get_current_user(
     token: str = Depends(oauth2_scheme),
     session: Session = Depends(get_session)
 ):
-    if redis_client.get(f"blacklist:{token}"):
+    # Token đã xác thực gần đây → bỏ qua kiểm tra thu hồi, giải mã JWT và query user
+    cached_user = TokenCache.get(token)
+    if cached_user is not None:
+        return cached_user
+    # Lấy trước khi kiểm tra thu hồi: logout xảy ra sau đó thì không lưu token vào cache
+    generation = TokenCache.generation()
+
+    payload = _decode_access_token(token)
+
+    # Token chưa bị thu hồi (trường hợp thường gặp) được xác nhận bằng filter cục bộ, không gọi Redis
+    jti = payload.get("jti")
+    revoked = RevokedTokens.is_revoked(jti) if jti else redis_client.get(f"blacklist:{token}")
+    if revoked:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token revoked"
         )
 
-    try:
-        payload = jwt.decode(
-            token,
-            settings.SECRET_KEY,
-            algorithms=[settings.ALGORITHM]
-        )
-    except JWTError:
+    user = AuthRepository.get_user(
+        session,
+        int(payload.get("sub"))
+    )
+
+    if not user:
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
         )
 
-    if payload.get("type") != "access":
+    TokenCache.put(token, user, payload["exp"], generation)
+    return user
+
+async def get_current_user_async(
+    token: str = Depends(oauth2_scheme),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """get_current_user cho route async (session async + client Redis async)"""
+    cached_user = TokenCache.get(token)
+    if cached_user is not None:
+        return cached_user
+    generation = TokenCache.generation()
+
+    payload = _decode_access_token(token)
+
+    jti = payload.get("jti")
+    if jti:
+        revoked = await RevokedTokens.is_revoked_async(jti)
+    else:
+        revoked = await async_redis_client.get(f"blacklist:{token}")
+    if revoked:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token type"
+            detail="Token revoked"
         )
 
-    user = AuthRepository.get_user(
+    user = await AuthRepository.get_user_async(
         session,
         int(payload.get("sub"))
     )
@@ -52,8 +86,30 @@ def get_current_user(
             detail="User not found"
         )
 
+    TokenCache.put(token, user, payload["exp"], generation)
     return user
 
+def _decode_access_token(token: str) -> dict:
+    try:
+        payload = jwt.decode(
+            token,
+            settings.SECRET_KEY,
+            algorithms=[settings.ALGORITHM]
+        )
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token"
+        )
+
+    if payload.get("type") != "access":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token type"
+        )
+
+    return payload
+
 def require_staff(user: User = Depends(get_current_user)):
     if user.role not in (UserRole.STAFF, UserRole.ADMIN):
         raise HTTPException(status_code=403, detail="Staff only")
@@ -1,22 +1,150 @@
 import logging
+import os
+import queue
 import smtplib
+import threading
+import time
+from contextlib import contextmanager
 from email.message import EmailMessage
-from typing import Dict
+from typing import Dict, Iterator, List, Optional, Tuple
 
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
 
-def send_payment_success_email(to_email: str, booking_detail: Dict) -> bool:
-    """Gửi email xác nhận thanh toán thành công.
+class SMTPConnectionPool:
+    """Pool kết nối SMTP dùng lại giữa các email trong cùng 1 tiến trình worker.
 
-    Trả về True nếu gửi thành công, False nếu thiếu cấu hình SMTP.
+    Kết nối được mở (STARTTLS + login) 1 lần rồi giữ lại, kết nối để lâu không dùng
+    được kiểm tra bằng NOOP trước khi dùng, kết nối lỗi bị bỏ và mở lại.
+    Celery prefork fork tiến trình con sau khi import → pool gắn với pid, tiến trình con tự tạo pool mới.
     """
-    if not settings.SMTP_HOST or not settings.SMTP_USER or not settings.SMTP_PASSWORD:
+
+    def __init__(self, size: int, idle_seconds: float):
+        self._size = size
+        self._idle_seconds = idle_seconds
+        self._pid = os.getpid()
+        self._idle: "queue.LifoQueue[Tuple[smtplib.SMTP, float]]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _reset_after_fork(self) -> None:
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._idle = queue.LifoQueue()
+            self._slots = threading.BoundedSemaphore(self._size)
+
+    @staticmethod
+    def _connect() -> smtplib.SMTP:
+        server = smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=30)
+        if settings.SMTP_TLS:
+            server.starttls()
+        # SMTP local (aiosmtpd, debugging server) không cần đăng nhập
+        if settings.SMTP_USER and settings.SMTP_PASSWORD:
+            server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
+        logger.info("Opened SMTP connection to %s:%s", settings.SMTP_HOST, settings.SMTP_PORT)
+        return server
+
+    @staticmethod
+    def _close(server: smtplib.SMTP) -> None:
+        try:
+            server.quit()
+        except Exception:  # noqa: BLE001
+            try:
+                server.close()
+            except Exception:  # noqa: BLE001
+                pass
+
+    def _checkout(self) -> smtplib.SMTP:
+        while True:
+            try:
+                server, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if time.monotonic() - last_used < self._idle_seconds:
+                return server
+            # Server có thể đã đóng kết nối để lâu → kiểm tra trước khi dùng
+            try:
+                if server.noop()[0] == 250:
+                    return server
+            except smtplib.SMTPException:
+                pass
+            self._close(server)
+
+    @contextmanager
+    def connection(self) -> Iterator[smtplib.SMTP]:
+        """Mượn 1 kết nối, trả lại pool khi xong (bỏ kết nối nếu có lỗi kết nối)"""
+        self._reset_after_fork()
+        self._slots.acquire()
+        server = None
+        try:
+            server = self._checkout()
+            yield server
+        except (smtplib.SMTPServerDisconnected, OSError):
+            if server is not None:
+                self._close(server)
+                server = None
+            raise
+        finally:
+            if server is not None:
+                self._idle.put((server, time.monotonic()))
+            self._slots.release()
+
+    def send(self, messages: List[EmailMessage]) -> List[Optional[Exception]]:
+        """Gửi nhiều email qua cùng 1 session, mất kết nối thì mở lại và gửi tiếp
+
+        Trả về lỗi của từng email (None nếu gửi thành công).
+        """
+        results: List[Optional[Exception]] = [None] * len(messages)
+        position = 0
+        reconnected = False
+        while position < len(messages):
+            try:
+                with self.connection() as server:
+                    while position < len(messages):
+                        try:
+                            server.send_message(messages[position])
+                        except smtplib.SMTPServerDisconnected:
+                            raise
+                        except smtplib.SMTPException as exc:
+                            # Lỗi riêng của email này (vd: người nhận bị từ chối)
+                            results[position] = exc
+                        position += 1
+                        reconnected = False
+            except (smtplib.SMTPException, OSError) as exc:
+                # Mất kết nối hoặc không mở được kết nối (kể cả lỗi đăng nhập)
+                if reconnected:
+                    # Mở lại kết nối vẫn lỗi → bỏ qua email hiện tại
+                    results[position] = exc
+                    position += 1
+                reconnected = True
+                logger.warning("SMTP connection lost, reconnecting: %s", exc)
+        return results
+
+    def close_all(self) -> None:
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(server)
+
+
+smtp_pool = SMTPConnectionPool(
+    size=settings.SMTP_POOL_SIZE,
+    idle_seconds=settings.SMTP_POOL_IDLE_SECONDS,
+)
+
+
+def _smtp_configured() -> bool:
+    if not settings.SMTP_HOST or not (settings.SMTP_FROM or settings.SMTP_USER):
         logger.warning("SMTP chưa được cấu hình đầy đủ, bỏ qua gửi email")
         return False
+    return True
+
 
+def build_payment_success_email(to_email: str, booking_detail: Dict) -> EmailMessage:
+    """Tạo email xác nhận thanh toán thành công."""
     msg = EmailMessage()
     booking_id = booking_detail.get("id") or booking_detail.get("bookingId")
     subject = f"Xac nhan thanh toan dat ve #{booking_id}"
@@ -41,15 +169,40 @@ def send_payment_success_email(to_email: str, booking_detail: Dict) -> bool:
     ]
 
     msg.set_content("\n".join(body_lines))
+    return msg
 
-    try:
-        with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT) as server:
-            if settings.SMTP_TLS:
-                server.starttls()
-            server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
-            server.send_message(msg)
-        logger.info("Sent payment success email to %s", to_email)
-        return True
-    except Exception as exc:  # noqa: BLE001
-        logger.error("Failed to send email to %s: %s", to_email, exc)
+
+def send_payment_success_email(to_email: str, booking_detail: Dict) -> bool:
+    """Gửi email xác nhận thanh toán thành công.
+
+    Trả về True nếu gửi thành công, False nếu thiếu cấu hình SMTP hoặc gửi lỗi.
+    """
+    if not _smtp_configured():
         return False
+
+    error = smtp_pool.send([build_payment_success_email(to_email, booking_detail)])[0]
+    if error is not None:
+        logger.error("Failed to send email to %s: %s", to_email, error)
+        return False
+    logger.info("Sent payment success email to %s", to_email)
+    return True
+
+
+def send_payment_success_emails(items: List[Tuple[str, Dict]]) -> List[bool]:
+    """Gửi nhiều email xác nhận thanh toán qua cùng 1 session SMTP.
+
+    items: danh sách (to_email, booking_detail). Trả về kết quả gửi của từng email.
+    """
+    if not items:
+        return []
+    if not _smtp_configured():
+        return [False] * len(items)
+
+    messages = [build_payment_success_email(to_email, detail) for to_email, detail in items]
+    results = []
+    for (to_email, _), error in zip(items, smtp_pool.send(messages)):
+        if error is not None:
+            logger.error("Failed to send email to %s: %s", to_email, error)
+        results.append(error is None)
+    logger.info("Sent %d/%d payment success emails", sum(results), len(items))
+    return results
@@ -0,0 +1,69 @@
+"""
+LRU Cache
+Cache trong bộ nhớ tiến trình, giới hạn số phần tử, thread-safe
+"""
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class LRUCache:
+    """
+    Cache LRU đơn giản: vượt quá maxsize thì bỏ phần tử ít dùng nhất
+    Phần tử có thể có thời hạn (ttl giây), hết hạn thì coi như không có trong cache
+    """
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._expires: Dict[Hashable, float] = {}
+        self._lock = Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                return None
+            expires_at = self._expires.get(key)
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                del self._expires[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if ttl is None:
+                self._expires.pop(key, None)
+            else:
+                self._expires[key] = time.monotonic() + ttl
+            while len(self._data) > self.maxsize:
+                oldest, _ = self._data.popitem(last=False)
+                self._expires.pop(oldest, None)
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            self._expires.pop(key, None)
+            return self._data.pop(key, None)
+
+    def pop_where(self, predicate: Callable[[Any], bool]) -> int:
+        """Xóa các phần tử có value thỏa predicate, trả về số phần tử đã xóa"""
+        with self._lock:
+            keys = [key for key, value in self._data.items() if predicate(value)]
+            for key in keys:
+                del self._data[key]
+                self._expires.pop(key, None)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._expires.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,109 @@
+"""
+Password Pool
+Băm / kiểm tra mật khẩu (bcrypt) trong pool tiến trình riêng
+
+bcrypt tốn ~200ms CPU mỗi lần, chạy trong threadpool của request sẽ chiếm worker
+và giữ GIL → các endpoint khác (giữ ghế, sơ đồ ghế) bị chậm khi nhiều người đăng nhập cùng lúc.
+Pool giới hạn số tiến trình (PASSWORD_POOL_WORKERS) và số yêu cầu đang chờ (PASSWORD_POOL_MAX_PENDING),
+vượt quá thì trả 503 thay vì xếp hàng vô hạn.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+from fastapi import HTTPException, status
+from app.core.config import settings
+from app.utils.security import hash_password, verify_and_update_password
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordPool:
+    """
+    Pool tiến trình bcrypt dùng chung của tiến trình API (tạo khi dùng lần đầu)
+    """
+
+    _lock = threading.Lock()
+    _executor: Optional[ProcessPoolExecutor] = None
+    _pid: Optional[int] = None
+
+    # Số liệu cho /auth/password-pool/metrics
+    _pending = 0
+    _max_pending_seen = 0
+    _completed = 0
+    _rejected = 0
+    _total_seconds = 0.0
+
+    @staticmethod
+    def _get_executor() -> ProcessPoolExecutor:
+        with PasswordPool._lock:
+            if PasswordPool._executor is None or PasswordPool._pid != os.getpid():
+                # spawn: tiến trình con không kế thừa các thread (pub/sub, pool kết nối) của tiến trình API
+                PasswordPool._executor = ProcessPoolExecutor(
+                    max_workers=settings.PASSWORD_POOL_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                PasswordPool._pid = os.getpid()
+                logger.info(f"Started password pool with {settings.PASSWORD_POOL_WORKERS} workers")
+            return PasswordPool._executor
+
+    @staticmethod
+    async def _run(func: Callable, *args):
+        with PasswordPool._lock:
+            if PasswordPool._pending >= settings.PASSWORD_POOL_MAX_PENDING:
+                PasswordPool._rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Hệ thống đang bận, vui lòng thử lại sau",
+                    headers={"Retry-After": "1"}
+                )
+            PasswordPool._pending += 1
+            PasswordPool._max_pending_seen = max(PasswordPool._max_pending_seen, PasswordPool._pending)
+
+        started = time.monotonic()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(PasswordPool._get_executor(), func, *args)
+        finally:
+            with PasswordPool._lock:
+                PasswordPool._pending -= 1
+                PasswordPool._completed += 1
+                PasswordPool._total_seconds += time.monotonic() - started
+
+    @staticmethod
+    async def hash(password: str) -> str:
+        return await PasswordPool._run(hash_password, password)
+
+    @staticmethod
+    async def verify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        Kiểm tra mật khẩu, trả về (đúng/sai, hash mới)
+        hash mới khác None khi hash cũ dùng cost khác BCRYPT_ROUNDS → cần lưu lại
+        """
+        return await PasswordPool._run(verify_and_update_password, password, hashed_password)
+
+    @staticmethod
+    def metrics() -> Dict:
+        with PasswordPool._lock:
+            completed = PasswordPool._completed
+            return {
+                "workers": settings.PASSWORD_POOL_WORKERS,
+                "bcrypt_rounds": settings.BCRYPT_ROUNDS,
+                "queue_depth": PasswordPool._pending,
+                "max_queue_depth": settings.PASSWORD_POOL_MAX_PENDING,
+                "peak_queue_depth": PasswordPool._max_pending_seen,
+                "completed": completed,
+                "rejected": PasswordPool._rejected,
+                "avg_seconds": PasswordPool._total_seconds / completed if completed else 0.0,
+            }
+
+    @staticmethod
+    def shutdown() -> None:
+        with PasswordPool._lock:
+            if PasswordPool._executor is not None and PasswordPool._pid == os.getpid():
+                PasswordPool._executor.shutdown(wait=False, cancel_futures=True)
+            PasswordPool._executor = None
@@ -0,0 +1,143 @@
+"""
+Rate Limit
+Giới hạn số request theo cửa sổ trượt (sliding window log) trong Redis
+
+- rate_limit:{name}:{key} (zset) thời điểm các request trong cửa sổ (ms)
+- rate_limit:stats        (hash) {name}:allowed / {name}:rejected
+
+Dùng làm dependency của route:
+    @router.post("/login", dependencies=[Depends(RateLimiter("login", 10, 60))])
+Key là IP client (request.client.host, chạy uvicorn --proxy-headers khi đứng sau proxy)
+hoặc user đang đăng nhập (UserRateLimiter). Route async dùng AsyncRateLimiter / AsyncUserRateLimiter.
+"""
+import math
+import uuid
+from typing import Dict
+from fastapi import Depends, HTTPException, Request, status
+from app.core.config import settings
+from app.core.redis import async_redis_client, redis_client
+from app.models.user import User
+from app.utils.dependencies import get_current_user, get_current_user_async
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Lua script kiểm tra và ghi nhận request (atomic)
+# KEYS[1]: zset của key, KEYS[2]: hash thống kê
+# ARGV[1]: giới hạn, ARGV[2]: độ dài cửa sổ (ms), ARGV[3]: tên giới hạn, ARGV[4]: ID request (member duy nhất)
+# Trả về {được phép (1/0), số request còn lại, số ms đến khi được phép}
+_SLIDING_WINDOW_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local now = redis.call('TIME')
+local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now_ms - window)
+local count = redis.call('ZCARD', KEYS[1])
+if count >= limit then
+    redis.call('HINCRBY', KEYS[2], ARGV[3] .. ':rejected', 1)
+    local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+    return {0, 0, tonumber(oldest[2]) + window - now_ms}
+end
+
+redis.call('ZADD', KEYS[1], now_ms, ARGV[4])
+redis.call('PEXPIRE', KEYS[1], window)
+redis.call('HINCRBY', KEYS[2], ARGV[3] .. ':allowed', 1)
+return {1, limit - count - 1, 0}
+"""
+
+_sliding_window_script = redis_client.register_script(_SLIDING_WINDOW_SCRIPT)
+_sliding_window_script_async = async_redis_client.register_script(_SLIDING_WINDOW_SCRIPT)
+
+
+class RateLimiter:
+    """
+    Dependency giới hạn tối đa limit request mỗi window_seconds giây cho mỗi IP client
+    Redis lỗi thì cho qua (không chặn người dùng vì lỗi hạ tầng)
+    """
+
+    PREFIX = "rate_limit"
+    STATS_KEY = "rate_limit:stats"
+
+    def __init__(self, name: str, limit: int, window_seconds: int):
+        self.name = name
+        self.limit = limit
+        self.window_seconds = window_seconds
+
+    def __call__(self, request: Request) -> None:
+        self.check(f"ip:{request.client.host if request.client else 'unknown'}")
+
+    def check(self, key: str) -> None:
+        """Ghi nhận 1 request của key, vượt giới hạn thì trả 429 kèm Retry-After"""
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        try:
+            allowed, _, retry_after_ms = _sliding_window_script(**self._script_params(key))
+        except Exception as e:
+            logger.warning(f"Rate limiter {self.name} unavailable: {e}")
+            return
+        self._reject_if_exceeded(key, allowed, retry_after_ms)
+
+    async def check_async(self, key: str) -> None:
+        """check trên client Redis async"""
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        try:
+            allowed, _, retry_after_ms = await _sliding_window_script_async(**self._script_params(key))
+        except Exception as e:
+            logger.warning(f"Rate limiter {self.name} unavailable: {e}")
+            return
+        self._reject_if_exceeded(key, allowed, retry_after_ms)
+
+    def _script_params(self, key: str) -> Dict:
+        return {
+            "keys": [f"{RateLimiter.PREFIX}:{self.name}:{key}", RateLimiter.STATS_KEY],
+            "args": [self.limit, self.window_seconds * 1000, self.name, uuid.uuid4().hex],
+        }
+
+    def _reject_if_exceeded(self, key: str, allowed: int, retry_after_ms: int) -> None:
+        if not allowed:
+            logger.warning(f"Rate limit {self.name} exceeded by {key}")
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Quá nhiều yêu cầu, vui lòng thử lại sau",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after_ms / 1000)))}
+            )
+
+    @staticmethod
+    def stats() -> Dict[str, Dict[str, int]]:
+        """Số request được phép / bị chặn theo từng giới hạn"""
+        result: Dict[str, Dict[str, int]] = {}
+        for field, value in redis_client.hgetall(RateLimiter.STATS_KEY).items():
+            name, _, outcome = field.rpartition(":")
+            result.setdefault(name, {"allowed": 0, "rejected": 0})[outcome] = int(value)
+        return result
+
+
+class UserRateLimiter(RateLimiter):
+    """
+    Giới hạn theo user đang đăng nhập
+    get_current_user đã có trong route → FastAPI dùng lại kết quả, không xác thực lại
+    """
+
+    def __call__(self, current_user: User = Depends(get_current_user)) -> None:
+        self.check(f"user:{current_user.id}")
+
+
+class AsyncRateLimiter(RateLimiter):
+    """
+    Giới hạn theo IP client cho route async (dùng chung giới hạn với RateLimiter cùng tên)
+    """
+
+    async def __call__(self, request: Request) -> None:
+        await self.check_async(f"ip:{request.client.host if request.client else 'unknown'}")
+
+
+class AsyncUserRateLimiter(RateLimiter):
+    """
+    Giới hạn theo user đang đăng nhập cho route async (dùng chung giới hạn với UserRateLimiter cùng tên)
+    """
+
+    async def __call__(self, current_user: User = Depends(get_current_user_async)) -> None:
+        await self.check_async(f"user:{current_user.id}")
@@ -1,23 +1,391 @@
 """
 Redis Lock Manager for Seat Booking
 Quản lý lock ghế tạm thời trong Redis với TTL tự động expire
+
+Mỗi suất chiếu có thêm index các ghế đang được giữ:
+- seat_lock_index:{showtime_id}  (hash)  seat_id -> lock data (JSON)
+- seat_lock_expiry:{showtime_id} (zset)  seat_id -> thời điểm hết hạn (epoch giây)
+- seat_lock_user:{showtime_id}:{user_id} (set) các seat_id user đang giữ
+- seat_lock_user_showtimes:{user_id}     (set) các suất chiếu user đang giữ ghế
+- seat_held_bits:{showtime_id}   (bitmap) bit theo thứ tự ghế (ordinal) trong phòng, 1 = đang giữ
+- seat_map:{showtime_id}         (hash)  version sơ đồ ghế, tăng mỗi khi ghế đổi trạng thái
+- seat_map_changes:{showtime_id} (zset)  seat_id -> version lần thay đổi gần nhất
+Index được cập nhật cùng lúc với lock key trong các Lua script,
+ghế hết hạn được dọn khỏi index mỗi khi đọc.
+
+Mỗi lần version tăng, script PUBLISH 1 event lên channel seat_events:{showtime_id}:
+{"version", "status", "seat_ids", "user_id", "ttl"} (xem app/utils/seat_events.py)
 """
 import json
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple
 from datetime import datetime, timedelta
-from app.core.redis import redis_client
+from app.core.redis import async_redis_client, redis_client
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+# Các script dùng chung thứ tự KEYS:
+# KEYS[1]: index hash, KEYS[2]: expiry zset, KEYS[3]: held bitmap,
+# KEYS[4]: map version hash, KEYS[5]: map changes zset,
+# KEYS[6]: user set, KEYS[7]: user showtimes set, KEYS[8..]: lock key của từng ghế
+
+# Đoạn Lua quản lý version sơ đồ ghế của suất chiếu
+# version khởi tạo bằng thời gian hiện tại (ms) nên vẫn tăng dần kể cả khi key hết hạn và được tạo lại;
+# base = version lúc khởi tạo, client có since < base phải tải lại toàn bộ sơ đồ ghế
+# bump_version publish event lên channel seat_events:{showtime_id} (showtime_id lấy từ KEYS[4])
+_MAP_VERSION_LUA = """
+local MAP_TTL = 604800
+local EVENTS_CHANNEL = 'seat_events:' .. string.match(KEYS[4], '[^:]+$')
+local function map_version()
+    local version = redis.call('HGET', KEYS[4], 'version')
+    if not version then
+        local t = redis.call('TIME')
+        version = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+        redis.call('HSET', KEYS[4], 'version', version, 'base', version)
+    end
+    redis.call('EXPIRE', KEYS[4], MAP_TTL)
+    return tonumber(version)
+end
+local function bump_version(seat_ids, event)
+    if #seat_ids == 0 then
+        return
+    end
+    map_version()
+    local version = redis.call('HINCRBY', KEYS[4], 'version', 1)
+    local ids = {}
+    for _, seat_id in ipairs(seat_ids) do
+        redis.call('ZADD', KEYS[5], version, seat_id)
+        table.insert(ids, tonumber(seat_id))
+    end
+    redis.call('EXPIRE', KEYS[5], MAP_TTL)
+    event['version'] = version
+    event['seat_ids'] = ids
+    redis.call('PUBLISH', EVENTS_CHANNEL, cjson.encode(event))
+end
+-- Gia hạn key sau khi giữ ghế với TTL ttl
+-- Index, expiry zset và bitmap ghế đang giữ sống lâu hơn hạn giữ muộn nhất (thêm MAP_TTL):
+-- lock key hết hạn thì ghế vẫn còn trong expiry zset để lần dọn tiếp theo bỏ bit, tăng version
+-- và publish AVAILABLE (nếu hết hạn cùng lúc thì không còn gì để dọn, version đứng yên)
+local function extend_hold_keys(ttl)
+    for _, i in ipairs({1, 2, 3}) do
+        if redis.call('TTL', KEYS[i]) < ttl + MAP_TTL then
+            redis.call('EXPIRE', KEYS[i], ttl + MAP_TTL)
+        end
+    end
+    for _, i in ipairs({6, 7}) do
+        if redis.call('TTL', KEYS[i]) < ttl then
+            redis.call('EXPIRE', KEYS[i], ttl)
+        end
+    end
+end
+"""
+
+# Đoạn Lua dọn các ghế đã hết hạn khỏi index (và bitmap ghế đang giữ)
+_PRUNE_EXPIRED_LUA = _MAP_VERSION_LUA + """
+local now = tonumber(redis.call('TIME')[1])
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now)
+if #expired > 0 then
+    for _, seat_id in ipairs(expired) do
+        local entry = redis.call('HGET', KEYS[1], seat_id)
+        if entry then
+            local ok, data = pcall(cjson.decode, entry)
+            if ok and type(data) == 'table' and type(data['ordinal']) == 'number' then
+                redis.call('SETBIT', KEYS[3], data['ordinal'], 0)
+            end
+            redis.call('HDEL', KEYS[1], seat_id)
+        end
+    end
+    redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now)
+    bump_version(expired, {status = 'AVAILABLE', reason = 'EXPIRED'})
+end
+"""
+
+# Lua script giữ nhiều ghế cùng lúc (all-or-nothing)
+# ARGV[1]: user_id, ARGV[2]: ttl (giây), ARGV[3]: showtime_id,
+# ARGV[4..3+n]: seat_id, ARGV[4+n..3+2n]: lock data (JSON), ARGV[4+2n..3+3n]: ordinal (-1 nếu không rõ)
+# Trả về {} nếu lock thành công, ngược lại trả về {seat_index, owner_user_id, ...}
+_LOCK_SEATS_SCRIPT = _MAP_VERSION_LUA + """
+local n = #KEYS - 7
+local ttl = tonumber(ARGV[2])
+local conflicts = {}
+for i = 1, n do
+    local raw = redis.call('GET', KEYS[i + 7])
+    if raw then
+        local ok, data = pcall(cjson.decode, raw)
+        if ok and type(data) == 'table' and tostring(data['user_id']) ~= ARGV[1] then
+            table.insert(conflicts, i)
+            table.insert(conflicts, tostring(data['user_id']))
+        end
+    end
+end
+if #conflicts > 0 then
+    return conflicts
+end
+local expires_at = tonumber(redis.call('TIME')[1]) + ttl
+local seat_ids = {}
+for i = 1, n do
+    local seat_id = ARGV[i + 3]
+    local payload = ARGV[i + 3 + n]
+    local ordinal = tonumber(ARGV[i + 3 + 2 * n])
+    redis.call('SET', KEYS[i + 7], payload, 'EX', ttl)
+    redis.call('HSET', KEYS[1], seat_id, payload)
+    redis.call('ZADD', KEYS[2], expires_at, seat_id)
+    if ordinal >= 0 then
+        redis.call('SETBIT', KEYS[3], ordinal, 1)
+    end
+    redis.call('SADD', KEYS[6], seat_id)
+    table.insert(seat_ids, seat_id)
+end
+redis.call('SADD', KEYS[7], ARGV[3])
+extend_hold_keys(ttl)
+bump_version(seat_ids, {status = 'HOLD', user_id = tonumber(ARGV[1]), ttl = ttl})
+return conflicts
+"""
+
+# Lua script bỏ lock 1 ghế
+# ARGV[1]: seat_id, ARGV[2]: user_id, ARGV[3]: showtime_id
+# Trả về -1 nếu ghế do user khác giữ, ngược lại số key đã xóa
+_UNLOCK_SEAT_SCRIPT = _MAP_VERSION_LUA + """
+local raw = redis.call('GET', KEYS[8])
+if raw then
+    local ok, data = pcall(cjson.decode, raw)
+    if ok and type(data) == 'table' and tostring(data['user_id']) ~= ARGV[2] then
+        return -1
+    end
+end
+local entry = redis.call('HGET', KEYS[1], ARGV[1])
+if entry then
+    local ok, data = pcall(cjson.decode, entry)
+    if ok and type(data) == 'table' and type(data['ordinal']) == 'number' then
+        redis.call('SETBIT', KEYS[3], data['ordinal'], 0)
+    end
+end
+redis.call('HDEL', KEYS[1], ARGV[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+redis.call('SREM', KEYS[6], ARGV[1])
+if redis.call('SCARD', KEYS[6]) == 0 then
+    redis.call('SREM', KEYS[7], ARGV[3])
+end
+local deleted = redis.call('DEL', KEYS[8])
+if entry or deleted > 0 then
+    bump_version({ARGV[1]}, {status = 'AVAILABLE', reason = 'RELEASED'})
+end
+return deleted
+"""
+
+# Lua script bỏ lock nhiều ghế của 1 user (kiểm tra ownership tất cả ghế trong cùng script)
+# ARGV[1]: user_id, ARGV[2]: showtime_id, ARGV[3]: "1" = không bỏ lock ghế nào nếu có ghế do user khác giữ,
+# ARGV[4..3+n]: seat_id
+# Trả về {seat_id đã bỏ lock, {seat_index, owner_user_id, ...} của các ghế do user khác giữ}
+_UNLOCK_SEATS_SCRIPT = _MAP_VERSION_LUA + """
+local n = #KEYS - 7
+local owned = {}
+local ordinals = {}
+local conflicts = {}
+for i = 1, n do
+    local raw = redis.call('GET', KEYS[i + 7])
+    if raw then
+        local ok, data = pcall(cjson.decode, raw)
+        if ok and type(data) == 'table' then
+            if tostring(data['user_id']) == ARGV[1] then
+                table.insert(owned, i)
+                if type(data['ordinal']) == 'number' then
+                    ordinals[i] = data['ordinal']
+                end
+            else
+                table.insert(conflicts, i)
+                table.insert(conflicts, tostring(data['user_id']))
+            end
+        end
+    end
+end
+if #conflicts > 0 and ARGV[3] == '1' then
+    return {{}, conflicts}
+end
+local released = {}
+for _, i in ipairs(owned) do
+    local seat_id = ARGV[i + 3]
+    if ordinals[i] then
+        redis.call('SETBIT', KEYS[3], ordinals[i], 0)
+    end
+    redis.call('DEL', KEYS[i + 7])
+    redis.call('HDEL', KEYS[1], seat_id)
+    redis.call('ZREM', KEYS[2], seat_id)
+    redis.call('SREM', KEYS[6], seat_id)
+    table.insert(released, seat_id)
+end
+if redis.call('SCARD', KEYS[6]) == 0 then
+    redis.call('SREM', KEYS[7], ARGV[2])
+end
+bump_version(released, {status = 'AVAILABLE', reason = 'RELEASED'})
+return {released, conflicts}
+"""
+
+# Lua script gia hạn lock 1 ghế
+# ARGV[1]: seat_id, ARGV[2]: user_id, ARGV[3]: ttl (giây)
+# Trả về 1 nếu gia hạn thành công, 0 nếu không có lock, -1 nếu ghế do user khác giữ
+_EXTEND_LOCK_SCRIPT = _MAP_VERSION_LUA + """
+local raw = redis.call('GET', KEYS[8])
+if not raw then
+    return 0
+end
+local ok, data = pcall(cjson.decode, raw)
+if not ok or type(data) ~= 'table' then
+    return 0
+end
+if tostring(data['user_id']) ~= ARGV[2] then
+    return -1
+end
+local ttl = tonumber(ARGV[3])
+redis.call('EXPIRE', KEYS[8], ttl)
+redis.call('ZADD', KEYS[2], tonumber(redis.call('TIME')[1]) + ttl, ARGV[1])
+extend_hold_keys(ttl)
+bump_version({ARGV[1]}, {status = 'HOLD', user_id = tonumber(ARGV[2]), ttl = ttl})
+return 1
+"""
+
+# Lua script bỏ toàn bộ ghế 1 user đang giữ trong 1 suất chiếu
+# ARGV[1]: user_id, ARGV[2]: showtime_id, ARGV[3]: prefix lock key ("seat_lock:{showtime_id}:")
+# Lock key được ghép từ seat_id trong user set (Redis standalone)
+# Trả về danh sách seat_id đã bỏ lock
+_UNLOCK_USER_SEATS_SCRIPT = _MAP_VERSION_LUA + """
+local released = {}
+for _, seat_id in ipairs(redis.call('SMEMBERS', KEYS[6])) do
+    local lock_key = ARGV[3] .. seat_id
+    local raw = redis.call('GET', lock_key)
+    if raw then
+        local ok, data = pcall(cjson.decode, raw)
+        if ok and type(data) == 'table' and tostring(data['user_id']) == ARGV[1] then
+            if type(data['ordinal']) == 'number' then
+                redis.call('SETBIT', KEYS[3], data['ordinal'], 0)
+            end
+            redis.call('DEL', lock_key)
+            redis.call('HDEL', KEYS[1], seat_id)
+            redis.call('ZREM', KEYS[2], seat_id)
+            table.insert(released, seat_id)
+        end
+    end
+end
+redis.call('DEL', KEYS[6])
+redis.call('SREM', KEYS[7], ARGV[2])
+bump_version(released, {status = 'AVAILABLE', reason = 'RELEASED'})
+return released
+"""
+
+# Các script chỉ dùng KEYS[1..5] của suất chiếu
+
+# Lua script dọn các ghế đã hết hạn của 1 suất chiếu
+# Trả về số ghế đã dọn
+_PRUNE_EXPIRED_SCRIPT = _PRUNE_EXPIRED_LUA + """
+return #expired
+"""
+
+# Lua script lấy toàn bộ ghế đang giữ của 1 suất chiếu, dọn các ghế đã hết hạn
+# Trả về {now, HGETALL index, ZRANGE expiry WITHSCORES}
+_GET_SHOWTIME_LOCKS_SCRIPT = _PRUNE_EXPIRED_LUA + """
+return {now, redis.call('HGETALL', KEYS[1]), redis.call('ZRANGE', KEYS[2], 0, -1, 'WITHSCORES')}
+"""
+
+# Lua script tăng version sơ đồ ghế khi trạng thái ghế đổi ngoài Redis (vd: BOOKED trong DB)
+# ARGV[1]: trạng thái mới, ARGV[2..]: seat_id của các ghế thay đổi
+# Trả về version mới
+_BUMP_MAP_VERSION_SCRIPT = _MAP_VERSION_LUA + """
+local seat_ids = {}
+for i = 2, #ARGV do
+    table.insert(seat_ids, ARGV[i])
+end
+bump_version(seat_ids, {status = ARGV[1]})
+return map_version()
+"""
+
+# Lua script lấy version hiện tại của sơ đồ ghế (sau khi dọn ghế hết hạn)
+_GET_MAP_VERSION_SCRIPT = _PRUNE_EXPIRED_LUA + """
+return map_version()
+"""
+
+# Lua script lấy các ghế thay đổi sau version since
+# ARGV[1]: since
+# Trả về {version, 1, seat_ids} hoặc {version, 0, {}} nếu client phải tải lại toàn bộ
+_GET_MAP_CHANGES_SCRIPT = _PRUNE_EXPIRED_LUA + """
+local version = map_version()
+local base = tonumber(redis.call('HGET', KEYS[4], 'base'))
+local since = tonumber(ARGV[1])
+if since < base or since > version then
+    return {version, 0, {}}
+end
+return {version, 1, redis.call('ZRANGEBYSCORE', KEYS[5], '(' .. since, '+inf')}
+"""
+
+# Lua script đánh lại bitmap ghế đang giữ theo ordinal hiện tại của phòng (thêm/xóa ghế làm ordinal thay đổi)
+# Cập nhật ordinal trong index và lock key, ghế không còn trong phòng không được tính vào bitmap
+# ARGV[1]: tiền tố lock key của suất chiếu, ARGV[2..]: từng cặp seat_id, ordinal
+# Trả về số ghế đang giữ
+_REINDEX_HELD_BITS_SCRIPT = _PRUNE_EXPIRED_LUA + """
+local ordinals = {}
+for i = 2, #ARGV, 2 do
+    ordinals[ARGV[i]] = tonumber(ARGV[i + 1])
+end
+redis.call('DEL', KEYS[3])
+local held = redis.call('HGETALL', KEYS[1])
+for i = 1, #held, 2 do
+    local seat_id, entry = held[i], held[i + 1]
+    local ok, data = pcall(cjson.decode, entry)
+    if ok and type(data) == 'table' then
+        data['ordinal'] = ordinals[seat_id]
+        local payload = cjson.encode(data)
+        redis.call('HSET', KEYS[1], seat_id, payload)
+        local lock_key = ARGV[1] .. seat_id
+        if redis.call('GET', lock_key) == entry then
+            redis.call('SET', lock_key, payload, 'KEEPTTL')
+        end
+        if ordinals[seat_id] then
+            redis.call('SETBIT', KEYS[3], ordinals[seat_id], 1)
+        end
+    end
+end
+local ttl = redis.call('TTL', KEYS[1])
+if ttl > 0 then
+    redis.call('EXPIRE', KEYS[3], ttl)
+end
+return #held / 2
+"""
+
+_lock_seats_script = redis_client.register_script(_LOCK_SEATS_SCRIPT)
+_unlock_seat_script = redis_client.register_script(_UNLOCK_SEAT_SCRIPT)
+_unlock_seats_script = redis_client.register_script(_UNLOCK_SEATS_SCRIPT)
+_extend_lock_script = redis_client.register_script(_EXTEND_LOCK_SCRIPT)
+_unlock_user_seats_script = redis_client.register_script(_UNLOCK_USER_SEATS_SCRIPT)
+_prune_expired_script = redis_client.register_script(_PRUNE_EXPIRED_SCRIPT)
+_get_showtime_locks_script = redis_client.register_script(_GET_SHOWTIME_LOCKS_SCRIPT)
+_bump_map_version_script = redis_client.register_script(_BUMP_MAP_VERSION_SCRIPT)
+_get_map_version_script = redis_client.register_script(_GET_MAP_VERSION_SCRIPT)
+_get_map_changes_script = redis_client.register_script(_GET_MAP_CHANGES_SCRIPT)
+_reindex_held_bits_script = redis_client.register_script(_REINDEX_HELD_BITS_SCRIPT)
+
+# Cùng script trên client async (request path async), SHA giống nhau nên dùng chung script cache của Redis
+_lock_seats_script_async = async_redis_client.register_script(_LOCK_SEATS_SCRIPT)
+_unlock_seats_script_async = async_redis_client.register_script(_UNLOCK_SEATS_SCRIPT)
+_get_showtime_locks_script_async = async_redis_client.register_script(_GET_SHOWTIME_LOCKS_SCRIPT)
+_get_map_version_script_async = async_redis_client.register_script(_GET_MAP_VERSION_SCRIPT)
+_get_map_changes_script_async = async_redis_client.register_script(_GET_MAP_CHANGES_SCRIPT)
+
+
 class SeatLockManager:
     """
     Quản lý lock ghế trong Redis
     """
     
     LOCK_PREFIX = "seat_lock"
-    DEFAULT_TTL = 600 
+    INDEX_PREFIX = "seat_lock_index"
+    EXPIRY_PREFIX = "seat_lock_expiry"
+    USER_PREFIX = "seat_lock_user"
+    USER_SHOWTIMES_PREFIX = "seat_lock_user_showtimes"
+    HELD_BITS_PREFIX = "seat_held_bits"
+    MAP_VERSION_PREFIX = "seat_map"
+    MAP_CHANGES_PREFIX = "seat_map_changes"
+    EVENTS_PREFIX = "seat_events"
+    DEFAULT_TTL = 600
     
     @staticmethod
     def _get_lock_key(showtime_id: int, seat_id: int) -> str:
@@ -25,78 +393,160 @@ class SeatLockManager:
         return f"{SeatLockManager.LOCK_PREFIX}:{showtime_id}:{seat_id}"
     
     @staticmethod
-    def _get_showtime_pattern(showtime_id: int) -> str:
-        """Pattern để lấy tất cả locks của 1 suất chiếu"""
-        return f"{SeatLockManager.LOCK_PREFIX}:{showtime_id}:*"
+    def _get_index_keys(showtime_id: int) -> List[str]:
+        """Redis keys của index ghế đang giữ trong 1 suất chiếu: [hash, zset, held bitmap, version, changes]"""
+        return [
+            f"{SeatLockManager.INDEX_PREFIX}:{showtime_id}",
+            f"{SeatLockManager.EXPIRY_PREFIX}:{showtime_id}",
+            f"{SeatLockManager.HELD_BITS_PREFIX}:{showtime_id}",
+            f"{SeatLockManager.MAP_VERSION_PREFIX}:{showtime_id}",
+            f"{SeatLockManager.MAP_CHANGES_PREFIX}:{showtime_id}",
+        ]
+    
+    @staticmethod
+    def _get_hold_keys(showtime_id: int, user_id: int) -> List[str]:
+        """Redis keys dùng chung cho các script: index keys + [user set, user showtimes set]"""
+        return SeatLockManager._get_index_keys(showtime_id) + [
+            f"{SeatLockManager.USER_PREFIX}:{showtime_id}:{user_id}",
+            f"{SeatLockManager.USER_SHOWTIMES_PREFIX}:{user_id}",
+        ]
     
     @staticmethod
     def lock_seat(
-        showtime_id: int, 
-        seat_id: int, 
-        user_id: int, 
+        showtime_id: int,
+        seat_id: int,
+        user_id: int,
         ttl: int = DEFAULT_TTL
     ) -> bool:
         """
         Lock ghế trong Redis với TTL
+        Nếu cùng user đang giữ → gia hạn lock
         """
-        key = SeatLockManager._get_lock_key(showtime_id, seat_id)
+        conflicts = SeatLockManager.lock_seats(showtime_id, [seat_id], user_id, ttl)
+        return not conflicts
+    
+    @staticmethod
+    def lock_seats(
+        showtime_id: int,
+        seat_ids: List[int],
+        user_id: int,
+        ttl: int = DEFAULT_TTL,
+        ordinals: Optional[Dict[int, int]] = None
+    ) -> List[Dict]:
+        """
+        Lock nhiều ghế trong 1 lần gọi Redis (Lua script, atomic)
+        Hoặc lock được tất cả, hoặc không lock ghế nào
         
-        # Kiểm tra xem ghế đã bị lock chưa
-        existing_lock = redis_client.get(key)
+        Args:
+            ordinals: seat_id -> thứ tự ghế trong phòng, dùng để cập nhật bitmap ghế đang giữ
         
-        if existing_lock:
-            try:
-                lock_data = json.loads(existing_lock)
-                # Nếu đang bị lock bởi user khác
-                if lock_data.get("user_id") != user_id:
-                    logger.warning(
-                        f"Seat {seat_id} already locked by user {lock_data.get('user_id')}"
-                    )
-                    return False
-                # Nếu cùng user → gia hạn lock
-            except json.JSONDecodeError:
-                logger.error(f"Invalid lock data in Redis for key {key}")
-        
-        # Lock ghế (hoặc gia hạn nếu cùng user)
-        lock_data = {
-            "user_id": user_id,
-            "locked_at": datetime.utcnow().isoformat(),
-            "seat_id": seat_id,
-            "showtime_id": showtime_id
-        }
-        
-        redis_client.setex(
-            key,
-            ttl,
-            json.dumps(lock_data)
-        )
+        Returns:
+            Danh sách ghế bị xung đột [{"seat_id", "user_id"}], rỗng nếu lock thành công
+        """
+        if not seat_ids:
+            return []
         
-        logger.info(f"Locked seat {seat_id} for user {user_id} with TTL {ttl}s")
-        return True
+        keys, args = SeatLockManager._lock_seats_params(showtime_id, seat_ids, user_id, ttl, ordinals)
+        result = _lock_seats_script(keys=keys, args=args)
+        return SeatLockManager._lock_seats_result(showtime_id, seat_ids, user_id, ttl, result)
+    
+    @staticmethod
+    async def lock_seats_async(
+        showtime_id: int,
+        seat_ids: List[int],
+        user_id: int,
+        ttl: int = DEFAULT_TTL,
+        ordinals: Optional[Dict[int, int]] = None
+    ) -> List[Dict]:
+        """lock_seats trên client Redis async"""
+        if not seat_ids:
+            return []
+        
+        keys, args = SeatLockManager._lock_seats_params(showtime_id, seat_ids, user_id, ttl, ordinals)
+        result = await _lock_seats_script_async(keys=keys, args=args)
+        return SeatLockManager._lock_seats_result(showtime_id, seat_ids, user_id, ttl, result)
+    
+    @staticmethod
+    def _lock_seats_params(
+        showtime_id: int,
+        seat_ids: List[int],
+        user_id: int,
+        ttl: int,
+        ordinals: Optional[Dict[int, int]]
+    ) -> Tuple[List[str], List]:
+        """KEYS + ARGV của script lock ghế"""
+        ordinals = ordinals or {}
+        locked_at = datetime.utcnow().isoformat()
+        keys = SeatLockManager._get_hold_keys(showtime_id, user_id) + [
+            SeatLockManager._get_lock_key(showtime_id, seat_id) for seat_id in seat_ids
+        ]
+        payloads = [
+            json.dumps({
+                "user_id": user_id,
+                "locked_at": locked_at,
+                "seat_id": seat_id,
+                "showtime_id": showtime_id,
+                "ordinal": ordinals.get(seat_id)
+            })
+            for seat_id in seat_ids
+        ]
+        seat_ordinals = [ordinals.get(seat_id, -1) for seat_id in seat_ids]
+        return keys, [user_id, ttl, showtime_id, *seat_ids, *payloads, *seat_ordinals]
+    
+    @staticmethod
+    def _parse_conflicts(seat_ids: List[int], result: List) -> List[Dict]:
+        """Kết quả script [vị trí ghế, chủ sở hữu, ...] -> [{"seat_id", "user_id"}]"""
+        conflicts = []
+        for i in range(0, len(result), 2):
+            owner = result[i + 1]
+            conflicts.append({
+                "seat_id": seat_ids[int(result[i]) - 1],
+                "user_id": int(owner) if owner.isdigit() else owner
+            })
+        return conflicts
+    
+    @staticmethod
+    def _lock_seats_result(
+        showtime_id: int,
+        seat_ids: List[int],
+        user_id: int,
+        ttl: int,
+        result: List
+    ) -> List[Dict]:
+        conflicts = SeatLockManager._parse_conflicts(seat_ids, result)
+        if conflicts:
+            logger.warning(
+                f"User {user_id} failed to lock seats {[c['seat_id'] for c in conflicts]} "
+                f"in showtime {showtime_id}"
+            )
+        else:
+            logger.info(f"Locked seats {seat_ids} for user {user_id} with TTL {ttl}s")
+        return conflicts
     
     @staticmethod
     def unlock_seat(showtime_id: int, seat_id: int, user_id: Optional[int] = None) -> bool:
         """
         Unlock ghế khỏi Redis
         """
-        key = SeatLockManager._get_lock_key(showtime_id, seat_id)
+        if user_id is None:
+            # Không kiểm tra ownership → bỏ lock thay cho chủ sở hữu hiện tại
+            lock_info = SeatLockManager.get_seat_lock_info(showtime_id, seat_id)
+            if not lock_info:
+                return False
+            owner_id = lock_info["user_id"]
+        else:
+            owner_id = user_id
         
-        # Nếu cần check ownership
-        if user_id is not None:
-            existing_lock = redis_client.get(key)
-            if existing_lock:
-                try:
-                    lock_data = json.loads(existing_lock)
-                    if lock_data.get("user_id") != user_id:
-                        logger.warning(
-                            f"User {user_id} tried to unlock seat {seat_id} locked by user {lock_data.get('user_id')}"
-                        )
-                        return False
-                except json.JSONDecodeError:
-                    pass
-        
-        # Xóa key khỏi Redis
-        deleted = redis_client.delete(key)
+        keys = SeatLockManager._get_hold_keys(showtime_id, owner_id) + [
+            SeatLockManager._get_lock_key(showtime_id, seat_id)
+        ]
+        
+        # Kiểm tra ownership và xóa key + index trong 1 script
+        deleted = _unlock_seat_script(keys=keys, args=[seat_id, owner_id, showtime_id])
+        
+        if deleted == -1:
+            logger.warning(f"User {user_id} tried to unlock seat {seat_id} locked by another user")
+            return False
         
         if deleted:
             logger.info(f"Unlocked seat {seat_id} for showtime {showtime_id}")
@@ -104,6 +554,74 @@ class SeatLockManager:
         
         return False
     
+    @staticmethod
+    def unlock_seats(
+        showtime_id: int,
+        seat_ids: List[int],
+        user_id: int,
+        strict: bool = False
+    ) -> Tuple[List[int], List[Dict]]:
+        """
+        Bỏ lock nhiều ghế của user trong 1 lần gọi Redis (Lua script, atomic)
+        Ghế do user khác giữ không bị bỏ lock
+        
+        Args:
+            strict: True → nếu có ghế do user khác giữ thì không bỏ lock ghế nào
+        
+        Returns:
+            (danh sách seat_id đã bỏ lock, danh sách ghế do user khác giữ [{"seat_id", "user_id"}])
+        """
+        if not seat_ids:
+            return [], []
+        
+        seat_ids = list(dict.fromkeys(seat_ids))
+        keys, args = SeatLockManager._unlock_seats_params(showtime_id, seat_ids, user_id, strict)
+        released, result = _unlock_seats_script(keys=keys, args=args)
+        return SeatLockManager._unlock_seats_result(showtime_id, seat_ids, user_id, released, result)
+    
+    @staticmethod
+    async def unlock_seats_async(
+        showtime_id: int,
+        seat_ids: List[int],
+        user_id: int,
+        strict: bool = False
+    ) -> Tuple[List[int], List[Dict]]:
+        """unlock_seats trên client Redis async"""
+        if not seat_ids:
+            return [], []
+        
+        seat_ids = list(dict.fromkeys(seat_ids))
+        keys, args = SeatLockManager._unlock_seats_params(showtime_id, seat_ids, user_id, strict)
+        released, result = await _unlock_seats_script_async(keys=keys, args=args)
+        return SeatLockManager._unlock_seats_result(showtime_id, seat_ids, user_id, released, result)
+    
+    @staticmethod
+    def _unlock_seats_params(
+        showtime_id: int,
+        seat_ids: List[int],
+        user_id: int,
+        strict: bool
+    ) -> Tuple[List[str], List]:
+        """KEYS + ARGV của script bỏ lock ghế"""
+        keys = SeatLockManager._get_hold_keys(showtime_id, user_id) + [
+            SeatLockManager._get_lock_key(showtime_id, seat_id) for seat_id in seat_ids
+        ]
+        return keys, [user_id, showtime_id, 1 if strict else 0, *seat_ids]
+    
+    @staticmethod
+    def _unlock_seats_result(
+        showtime_id: int,
+        seat_ids: List[int],
+        user_id: int,
+        released: List,
+        result: List
+    ) -> Tuple[List[int], List[Dict]]:
+        conflicts = SeatLockManager._parse_conflicts(seat_ids, result)
+        released = [int(seat_id) for seat_id in released]
+        if released:
+            logger.info(f"Unlocked {len(released)} seats for user {user_id} in showtime {showtime_id}")
+        return released, conflicts
+    
     @staticmethod
     def is_seat_locked(showtime_id: int, seat_id: int) -> bool:
         """Kiểm tra ghế có đang bị lock không"""
@@ -136,27 +654,124 @@ class SeatLockManager:
             logger.error(f"Invalid lock data for key {key}")
             return None
     
+    @staticmethod
+    def prune_expired(showtime_id: int, client=None):
+        """
+        Dọn các ghế đã hết hạn khỏi index và bitmap ghế đang giữ
+        Truyền client là pipeline để gộp vào cùng round trip
+        """
+        return _prune_expired_script(
+            keys=SeatLockManager._get_index_keys(showtime_id),
+            client=client
+        )
+    
+    @staticmethod
+    def reindex_held_bits(showtime_id: int, ordinals: Dict[int, int]) -> int:
+        """
+        Đánh lại bitmap ghế đang giữ theo ordinal hiện tại của phòng
+        (ordinal = thứ hạng theo ID, thay đổi khi phòng được thêm/xóa ghế)
+
+        Args:
+            ordinals: seat_id -> ordinal của toàn bộ ghế trong phòng
+
+        Returns:
+            Số ghế đang giữ
+        """
+        args = [f"{SeatLockManager.LOCK_PREFIX}:{showtime_id}:"]
+        for seat_id, ordinal in ordinals.items():
+            args += [seat_id, ordinal]
+        return int(_reindex_held_bits_script(
+            keys=SeatLockManager._get_index_keys(showtime_id),
+            args=args
+        ))
+    
+    @staticmethod
+    def get_map_version(showtime_id: int) -> int:
+        """Version hiện tại của sơ đồ ghế suất chiếu (1 lần gọi Redis)"""
+        return int(_get_map_version_script(keys=SeatLockManager._get_index_keys(showtime_id)))
+    
+    @staticmethod
+    async def get_map_version_async(showtime_id: int) -> int:
+        """get_map_version trên client Redis async"""
+        return int(await _get_map_version_script_async(keys=SeatLockManager._get_index_keys(showtime_id)))
+    
+    @staticmethod
+    def get_changed_seats(showtime_id: int, since: int) -> Tuple[int, Optional[List[int]]]:
+        """
+        Lấy các ghế đã thay đổi trạng thái sau version since
+        
+        Returns:
+            (version hiện tại, danh sách seat_id) - danh sách là None nếu phải tải lại toàn bộ sơ đồ
+        """
+        version, complete, seat_ids = _get_map_changes_script(
+            keys=SeatLockManager._get_index_keys(showtime_id),
+            args=[since]
+        )
+        if not complete:
+            return int(version), None
+        return int(version), [int(seat_id) for seat_id in seat_ids]
+    
+    @staticmethod
+    async def get_changed_seats_async(showtime_id: int, since: int) -> Tuple[int, Optional[List[int]]]:
+        """get_changed_seats trên client Redis async"""
+        version, complete, seat_ids = await _get_map_changes_script_async(
+            keys=SeatLockManager._get_index_keys(showtime_id),
+            args=[since]
+        )
+        if not complete:
+            return int(version), None
+        return int(version), [int(seat_id) for seat_id in seat_ids]
+    
+    @staticmethod
+    def bump_map_version(showtime_id: int, seat_ids: List[int], status: str = "BOOKED") -> int:
+        """
+        Tăng version sơ đồ ghế khi ghế đổi trạng thái ngoài Redis (vd: BOOKED sau thanh toán)
+        và publish event trạng thái mới cho các client đang theo dõi
+        """
+        return int(_bump_map_version_script(
+            keys=SeatLockManager._get_index_keys(showtime_id),
+            args=[status, *seat_ids]
+        ))
+    
     @staticmethod
     def get_all_locks_for_showtime(showtime_id: int) -> List[Dict]:
         """
         Lấy tất cả locks của 1 suất chiếu
         Dùng để hiển thị sơ đồ ghế
+        Đọc từ index của suất chiếu: 1 lần gọi Redis, O(số ghế đang giữ)
         """
-        pattern = SeatLockManager._get_showtime_pattern(showtime_id)
-        keys = redis_client.keys(pattern)
+        now, index, expiry = _get_showtime_locks_script(
+            keys=SeatLockManager._get_index_keys(showtime_id)
+        )
+        return SeatLockManager._parse_showtime_locks(showtime_id, now, index, expiry)
+    
+    @staticmethod
+    async def get_all_locks_for_showtime_async(showtime_id: int) -> List[Dict]:
+        """get_all_locks_for_showtime trên client Redis async"""
+        now, index, expiry = await _get_showtime_locks_script_async(
+            keys=SeatLockManager._get_index_keys(showtime_id)
+        )
+        return SeatLockManager._parse_showtime_locks(showtime_id, now, index, expiry)
+    
+    @staticmethod
+    def _parse_showtime_locks(showtime_id: int, now: int, index: List, expiry: List) -> List[Dict]:
+        """Kết quả script (thời điểm hiện tại, index hash, expiry zset) -> danh sách lock"""
+        expires_at = {expiry[i]: int(float(expiry[i + 1])) for i in range(0, len(expiry), 2)}
         
         locks = []
-        for key in keys:
-            # Parse seat_id từ key: seat_lock:showtime_id:seat_id
+        for i in range(0, len(index), 2):
+            seat_key, lock_data_str = index[i], index[i + 1]
             try:
-                parts = key.split(":")
-                seat_id = int(parts[2])
-                
-                lock_info = SeatLockManager.get_seat_lock_info(showtime_id, seat_id)
-                if lock_info:
-                    locks.append(lock_info)
-            except (IndexError, ValueError) as e:
-                logger.error(f"Error parsing key {key}: {e}")
+                lock_data = json.loads(lock_data_str)
+                locks.append({
+                    "user_id": lock_data.get("user_id"),
+                    "locked_at": lock_data.get("locked_at"),
+                    "ttl_remaining": max(0, expires_at.get(seat_key, now) - now),
+                    "seat_id": int(seat_key),
+                    "showtime_id": showtime_id
+                })
+            except (ValueError, json.JSONDecodeError) as e:
+                logger.error(f"Invalid lock index entry {seat_key} for showtime {showtime_id}: {e}")
                 continue
         
         return locks
@@ -165,16 +780,36 @@ class SeatLockManager:
     def unlock_all_seats_for_user(showtime_id: int, user_id: int) -> int:
         """
         Unlock tất cả ghế của 1 user trong suất chiếu
+        Đọc từ set ghế của user: 1 lần gọi Redis, O(số ghế user đang giữ)
+        """
+        released = _unlock_user_seats_script(
+            keys=SeatLockManager._get_hold_keys(showtime_id, user_id),
+            args=[user_id, showtime_id, f"{SeatLockManager.LOCK_PREFIX}:{showtime_id}:"]
+        )
+        
+        logger.info(f"Unlocked {len(released)} seats for user {user_id} in showtime {showtime_id}")
+        return len(released)
+    
+    @staticmethod
+    def unlock_all_seats_for_user_everywhere(user_id: int) -> int:
         """
-        locks = SeatLockManager.get_all_locks_for_showtime(showtime_id)
+        Unlock tất cả ghế của 1 user trên mọi suất chiếu (dùng khi logout)
+        1 lần đọc set suất chiếu của user + 1 pipeline script
+        """
+        showtime_ids = redis_client.smembers(f"{SeatLockManager.USER_SHOWTIMES_PREFIX}:{user_id}")
+        if not showtime_ids:
+            return 0
         
-        count = 0
-        for lock in locks:
-            if lock.get("user_id") == user_id:
-                if SeatLockManager.unlock_seat(showtime_id, lock["seat_id"], user_id):
-                    count += 1
+        pipe = redis_client.pipeline(transaction=False)
+        for showtime_id in showtime_ids:
+            _unlock_user_seats_script(
+                keys=SeatLockManager._get_hold_keys(showtime_id, user_id),
+                args=[user_id, showtime_id, f"{SeatLockManager.LOCK_PREFIX}:{showtime_id}:"],
+                client=pipe
+            )
+        count = sum(len(released) for released in pipe.execute())
         
-        logger.info(f"Unlocked {count} seats for user {user_id} in showtime {showtime_id}")
+        logger.info(f"Unlocked {count} seats for user {user_id} in {len(showtime_ids)} showtimes")
         return count
     
     @staticmethod
@@ -182,26 +817,22 @@ class SeatLockManager:
         """
         Gia hạn lock cho ghế (renew TTL)
         """
-        key = SeatLockManager._get_lock_key(showtime_id, seat_id)
+        keys = SeatLockManager._get_hold_keys(showtime_id, user_id) + [
+            SeatLockManager._get_lock_key(showtime_id, seat_id)
+        ]
         
-        # Kiểm tra ownership
-        existing_lock = redis_client.get(key)
-        if not existing_lock:
+        # Kiểm tra ownership và gia hạn TTL (lock key + index) trong 1 script
+        result = _extend_lock_script(keys=keys, args=[seat_id, user_id, ttl])
+        
+        if result == -1:
+            logger.warning(f"User {user_id} cannot extend lock on seat {seat_id} owned by another user")
             return False
         
-        try:
-            lock_data = json.loads(existing_lock)
-            if lock_data.get("user_id") != user_id:
-                logger.warning(f"User {user_id} cannot extend lock owned by {lock_data.get('user_id')}")
-                return False
-            
-            # Gia hạn TTL
-            redis_client.expire(key, ttl)
+        if result:
             logger.info(f"Extended lock for seat {seat_id} by {ttl}s")
             return True
-            
-        except json.JSONDecodeError:
-            return False
+        
+        return False
 
 
 # Singleton instance
@@ -0,0 +1,254 @@
+"""
+Room Layout Cache
+Cache sơ đồ ghế (bất biến) của phòng chiếu trong bộ nhớ tiến trình
+
+Ghế của phòng gần như không đổi nên được nạp 1 lần và giữ ở dạng mảng gọn:
+id, tên, loại, giá của từng ghế + index seat_id -> vị trí để tra cứu O(1).
+Cache giới hạn số phòng (LRU), phần tử hết hạn sau ROOM_LAYOUT_CACHE_TTL giây.
+Ghế của phòng được thêm/sửa/xóa → sau khi commit báo qua Redis pub/sub
+(kênh room_layout_invalidation) để mọi tiến trình xóa cache ngay,
+đồng thời xóa bitmap chiếm chỗ (SeatOccupancy) của các suất chiếu sắp tới trong phòng.
+Khi chưa nghe được kênh pub/sub (đang kết nối lại) thì không dùng cache.
+"""
+import threading
+import time
+from array import array
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session as OrmSession, object_session
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.config import settings
+from app.core.redis import redis_client
+from app.models.seat import Seat
+from app.models.showtime import Showtime
+from app.repositories.seat_repo import SeatRepository
+from app.utils.lru_cache import LRUCache
+from app.utils.seat_occupancy import SeatOccupancy
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RoomLayout:
+    """
+    Sơ đồ ghế của 1 phòng, sắp theo tên ghế (thứ tự hiển thị)
+
+    ordinal của ghế = vị trí khi sắp theo ID, dùng làm vị trí bit trong bitmap chiếm chỗ
+    """
+
+    __slots__ = ("room_id", "seat_ids", "seat_names", "seat_types", "prices", "_positions", "_ordinals")
+
+    def __init__(self, room_id: int, rows: List[Tuple[int, str, str, float]]):
+        """rows: (seat_id, seat_name, seat_type, price) theo thứ tự hiển thị"""
+        self.room_id = room_id
+        self.seat_ids = array("q", (row[0] for row in rows))
+        self.seat_names = tuple(row[1] for row in rows)
+        self.seat_types = tuple(row[2] for row in rows)
+        self.prices = array("d", (float(row[3]) for row in rows))
+        self._positions = {seat_id: position for position, seat_id in enumerate(self.seat_ids)}
+
+        ordinal_by_id = {seat_id: ordinal for ordinal, seat_id in enumerate(sorted(self.seat_ids))}
+        self._ordinals = array("l", (ordinal_by_id[seat_id] for seat_id in self.seat_ids))
+
+    def __len__(self) -> int:
+        return len(self.seat_ids)
+
+    def __contains__(self, seat_id: int) -> bool:
+        return seat_id in self._positions
+
+    def __iter__(self) -> Iterator[Tuple[int, str, str, float]]:
+        return zip(self.seat_ids, self.seat_names, self.seat_types, self.prices)
+
+    def get(self, seat_id: int) -> Optional[Dict]:
+        """Thông tin ghế theo ID, None nếu ghế không thuộc phòng"""
+        position = self._positions.get(seat_id)
+        if position is None:
+            return None
+        return {
+            "seat_id": seat_id,
+            "seat_name": self.seat_names[position],
+            "seat_type": self.seat_types[position],
+            "price": self.prices[position],
+        }
+
+    def seat_name(self, seat_id: int) -> Optional[str]:
+        position = self._positions.get(seat_id)
+        return None if position is None else self.seat_names[position]
+
+    def ordinal(self, seat_id: int) -> Optional[int]:
+        position = self._positions.get(seat_id)
+        return None if position is None else self._ordinals[position]
+
+    def ordinals(self, seat_ids: Optional[List[int]] = None) -> Dict[int, int]:
+        """seat_id -> ordinal (của các ghế được chỉ định, hoặc toàn bộ phòng)"""
+        if seat_ids is None:
+            seat_ids = self.seat_ids
+        return {
+            seat_id: self._ordinals[self._positions[seat_id]]
+            for seat_id in seat_ids
+            if seat_id in self._positions
+        }
+
+
+class RoomLayoutCache:
+    """
+    Cache RoomLayout theo room_id (LRU + TTL)
+    """
+
+    CHANNEL = "room_layout_invalidation"
+    RECONNECT_DELAY = 1.0
+
+    _cache = LRUCache(maxsize=settings.ROOM_LAYOUT_CACHE_SIZE)
+    _lock = threading.Lock()
+    _thread: Optional[threading.Thread] = None
+    _listening = threading.Event()
+
+    @staticmethod
+    def _cached(room_id: int) -> Optional[RoomLayout]:
+        RoomLayoutCache._ensure_listener()
+        if not RoomLayoutCache._listening.is_set():
+            return None
+        return RoomLayoutCache._cache.get(room_id)
+
+    @staticmethod
+    def get(db: Session, room_id: int) -> RoomLayout:
+        """Lấy sơ đồ ghế của phòng, nạp từ DB nếu chưa có trong cache"""
+        layout = RoomLayoutCache._cached(room_id)
+        if layout is None:
+            seats = SeatRepository.get_seats_by_room(db=db, room_id=room_id)
+            layout = RoomLayoutCache.put(
+                room_id,
+                [(seat.id, seat.seat_name, seat.seat_type, seat.price) for seat in seats]
+            )
+        return layout
+
+    @staticmethod
+    async def get_async(db: AsyncSession, room_id: int) -> RoomLayout:
+        """get trên session async"""
+        layout = RoomLayoutCache._cached(room_id)
+        if layout is None:
+            seats = await SeatRepository.get_seats_by_room_async(db=db, room_id=room_id)
+            layout = RoomLayoutCache.put(
+                room_id,
+                [(seat.id, seat.seat_name, seat.seat_type, seat.price) for seat in seats]
+            )
+        return layout
+
+    @staticmethod
+    def contains(room_id: int) -> bool:
+        return RoomLayoutCache._cached(room_id) is not None
+
+    @staticmethod
+    def put(room_id: int, rows: List[Tuple[int, str, str, float]]) -> RoomLayout:
+        """Lưu sơ đồ ghế đã có sẵn dữ liệu (vd: từ query sơ đồ ghế suất chiếu)"""
+        layout = RoomLayout(room_id, rows)
+        if RoomLayoutCache._listening.is_set():
+            RoomLayoutCache._cache.set(room_id, layout, ttl=settings.ROOM_LAYOUT_CACHE_TTL)
+        return layout
+
+    @staticmethod
+    def invalidate(room_id: int) -> None:
+        """Xóa sơ đồ ghế của phòng khỏi cache của mọi tiến trình (khi ghế của phòng thay đổi)"""
+        if RoomLayoutCache._cache.pop(room_id) is not None:
+            logger.info(f"Invalidated seat layout cache for room {room_id}")
+        try:
+            redis_client.publish(RoomLayoutCache.CHANNEL, room_id)
+        except Exception as e:
+            logger.warning(f"Failed to broadcast seat layout invalidation for room {room_id}: {e}")
+
+    @staticmethod
+    def clear() -> None:
+        RoomLayoutCache._cache.clear()
+
+    @staticmethod
+    def _ensure_listener() -> None:
+        """Khởi động thread pub/sub (1 lần cho mỗi tiến trình)"""
+        if RoomLayoutCache._thread is not None and RoomLayoutCache._thread.is_alive():
+            return
+        with RoomLayoutCache._lock:
+            if RoomLayoutCache._thread is not None and RoomLayoutCache._thread.is_alive():
+                return
+            RoomLayoutCache._thread = threading.Thread(
+                target=RoomLayoutCache._listen_forever,
+                name="room-layout-invalidation",
+                daemon=True
+            )
+            RoomLayoutCache._thread.start()
+
+    @staticmethod
+    def _listen_forever() -> None:
+        while True:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(RoomLayoutCache.CHANNEL)
+                RoomLayoutCache._listening.set()
+                logger.info("Seat layout cache subscribed to invalidation channel")
+
+                for message in pubsub.listen():
+                    if message["type"] == "message":
+                        try:
+                            RoomLayoutCache._cache.pop(int(message["data"]))
+                        except ValueError:
+                            logger.error(f"Invalid seat layout invalidation message: {message['data']}")
+            except Exception as e:
+                logger.error(f"Seat layout cache lost Redis connection: {e}")
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+            # Có thể đã mất message trong lúc mất kết nối → bỏ toàn bộ cache
+            RoomLayoutCache._listening.clear()
+            RoomLayoutCache._cache.clear()
+            time.sleep(RoomLayoutCache.RECONNECT_DELAY)
+
+
+@event.listens_for(Seat, "after_insert")
+@event.listens_for(Seat, "after_update")
+@event.listens_for(Seat, "after_delete")
+def _collect_changed_room_layout(mapper, connection, target: Seat) -> None:
+    """
+    Ghế được thêm/sửa/xóa → ghi nhận phòng của ghế (cả phòng cũ nếu đổi phòng) và các suất chiếu
+    từ hôm qua trở đi của phòng (bitmap chiếm chỗ theo ordinal cũ),
+    xóa cache sau khi commit (tránh nạp lại dữ liệu cũ trước commit)
+    """
+    session = object_session(target)
+    if session is None:
+        return
+    room_ids = {
+        room_id
+        for room_id in {target.room_id, *inspect(target).attrs.room_id.history.deleted}
+        if room_id is not None
+    }
+    changed = room_ids - session.info.setdefault("changed_room_layout_ids", set())
+    if not changed:
+        return
+    session.info["changed_room_layout_ids"].update(changed)
+    showtime_ids = connection.execute(
+        select(Showtime.id).where(
+            Showtime.room_id.in_(changed),
+            Showtime.show_date >= date.today() - timedelta(days=1)
+        )
+    ).scalars().all()
+    session.info.setdefault("changed_room_showtime_ids", set()).update(showtime_ids)
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _invalidate_changed_room_layouts(session: OrmSession) -> None:
+    for room_id in session.info.pop("changed_room_layout_ids", ()):
+        RoomLayoutCache.invalidate(room_id)
+    showtime_ids = session.info.pop("changed_room_showtime_ids", ())
+    if showtime_ids:
+        try:
+            SeatOccupancy.invalidate(*showtime_ids)
+        except Exception as e:
+            logger.warning(f"Failed to invalidate occupancy bitmaps for {len(showtime_ids)} showtimes: {e}")
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _discard_changed_room_layouts(session: OrmSession) -> None:
+    session.info.pop("changed_room_layout_ids", None)
+    session.info.pop("changed_room_showtime_ids", None)
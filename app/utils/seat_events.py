@@ -0,0 +1,183 @@
+"""
+Seat Events
+Đẩy thay đổi trạng thái ghế tới client đang xem sơ đồ ghế (SSE) qua Redis pub/sub
+
+- Các Lua script của SeatLockManager PUBLISH event lên seat_events:{showtime_id}
+  mỗi khi ghế được giữ, hủy giữ, hết hạn giữ hoặc được đặt (cùng lúc với tăng version sơ đồ ghế)
+- Mỗi tiến trình API chỉ mở 1 kết nối pub/sub (PSUBSCRIBE seat_events:*) rồi chia event
+  cho các client đang kết nối vào tiến trình đó → thêm replica không tăng tải cho Redis theo số client
+- Lock key hết hạn (keyspace notification "expired") → 1 tiến trình dọn index của suất chiếu,
+  script dọn index sẽ publish event ghế trống trở lại cho client của mọi tiến trình
+
+Redis server cần bật notify-keyspace-events Ex (xem docker-compose.yml), ứng dụng không tự đổi cấu hình server.
+Không bật thì ghế hết hạn vẫn được dọn khi đọc sơ đồ ghế, chỉ không được đẩy ngay tới client.
+"""
+import asyncio
+import json
+import threading
+import time
+from typing import Dict, Optional, Set
+from app.core.config import settings
+from app.core.redis import redis_client
+from app.utils.redis_lock import SeatLockManager
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Event nội bộ báo client cần tải lại toàn bộ sơ đồ ghế (mất kết nối pub/sub, tràn hàng đợi)
+RESYNC = {"resync": True}
+
+
+class SeatEventSubscription:
+    """
+    1 client đang theo dõi sơ đồ ghế của 1 suất chiếu
+    Event được đẩy từ thread pub/sub vào asyncio.Queue của event loop phục vụ client
+    """
+
+    def __init__(self, showtime_id: int, loop: asyncio.AbstractEventLoop, maxsize: int):
+        self.showtime_id = showtime_id
+        self._loop = loop
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+
+    def push(self, event: Dict) -> None:
+        """Gọi từ thread pub/sub"""
+        self._loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event: Dict) -> None:
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Client đọc không kịp: bỏ các event đang chờ, yêu cầu tải lại sơ đồ ghế
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._queue.put_nowait(RESYNC)
+
+    async def get(self, timeout: float) -> Optional[Dict]:
+        """Event tiếp theo, None nếu hết thời gian chờ (dùng để gửi heartbeat)"""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class SeatEventHub:
+    """
+    Quản lý kết nối pub/sub dùng chung của tiến trình và các client đang theo dõi
+    """
+
+    QUEUE_SIZE = 256
+    EXPIRED_CLAIM_PREFIX = "seat_lock_expired"
+    EXPIRED_CLAIM_TTL = 5
+    HEARTBEAT_SECONDS = 15
+    RECONNECT_DELAY = 1.0
+
+    _lock = threading.Lock()
+    _subscribers: Dict[int, Set[SeatEventSubscription]] = {}
+    _thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def subscribe(showtime_id: int) -> SeatEventSubscription:
+        """Đăng ký nhận event của suất chiếu (gọi trong event loop đang phục vụ request)"""
+        subscription = SeatEventSubscription(
+            showtime_id=showtime_id,
+            loop=asyncio.get_running_loop(),
+            maxsize=SeatEventHub.QUEUE_SIZE
+        )
+        with SeatEventHub._lock:
+            SeatEventHub._subscribers.setdefault(showtime_id, set()).add(subscription)
+            SeatEventHub._ensure_listener()
+        return subscription
+
+    @staticmethod
+    def unsubscribe(subscription: SeatEventSubscription) -> None:
+        with SeatEventHub._lock:
+            subscribers = SeatEventHub._subscribers.get(subscription.showtime_id)
+            if subscribers is None:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del SeatEventHub._subscribers[subscription.showtime_id]
+
+    @staticmethod
+    def _get_subscribers(showtime_id: int) -> Set[SeatEventSubscription]:
+        with SeatEventHub._lock:
+            return set(SeatEventHub._subscribers.get(showtime_id, ()))
+
+    @staticmethod
+    def _ensure_listener() -> None:
+        """Khởi động thread pub/sub (1 lần cho mỗi tiến trình)"""
+        if SeatEventHub._thread is not None and SeatEventHub._thread.is_alive():
+            return
+        SeatEventHub._thread = threading.Thread(
+            target=SeatEventHub._listen_forever,
+            name="seat-event-hub",
+            daemon=True
+        )
+        SeatEventHub._thread.start()
+
+    @staticmethod
+    def _listen_forever() -> None:
+        expired_channel = f"__keyevent@{settings.REDIS_DB}__:expired"
+        events_pattern = f"{SeatLockManager.EVENTS_PREFIX}:*"
+
+        while True:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.psubscribe(events_pattern)
+                pubsub.subscribe(expired_channel)
+                logger.info("Seat event hub subscribed to Redis pub/sub")
+
+                for message in pubsub.listen():
+                    if message["type"] == "message" and message["channel"] == expired_channel:
+                        SeatEventHub._on_key_expired(message["data"])
+                    elif message["type"] == "pmessage":
+                        SeatEventHub._on_seat_event(message["channel"], message["data"])
+            except Exception as e:
+                logger.error(f"Seat event hub lost Redis connection: {e}")
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+            # Có thể đã mất event trong lúc mất kết nối → các client tải lại sơ đồ ghế
+            with SeatEventHub._lock:
+                subscriptions = [s for subs in SeatEventHub._subscribers.values() for s in subs]
+            for subscription in subscriptions:
+                subscription.push(RESYNC)
+            time.sleep(SeatEventHub.RECONNECT_DELAY)
+
+    @staticmethod
+    def _on_seat_event(channel: str, data: str) -> None:
+        try:
+            showtime_id = int(channel.rsplit(":", 1)[1])
+            event = json.loads(data)
+        except (ValueError, IndexError) as e:
+            logger.error(f"Invalid seat event on {channel}: {e}")
+            return
+
+        for subscription in SeatEventHub._get_subscribers(showtime_id):
+            subscription.push(event)
+
+    @staticmethod
+    def _on_key_expired(key: str) -> None:
+        """Lock ghế hết hạn → dọn index, script dọn index publish event ghế trống"""
+        parts = key.split(":")
+        if len(parts) != 3 or parts[0] != SeatLockManager.LOCK_PREFIX:
+            return
+        try:
+            showtime_id = int(parts[1])
+        except ValueError:
+            return
+
+        # Chỉ tiến trình có client theo dõi mới cần dọn ngay, các trường hợp khác dọn khi đọc
+        if not SeatEventHub._get_subscribers(showtime_id):
+            return
+        try:
+            # Mọi tiến trình đều nhận notification: chỉ tiến trình nhận key trước chạy script dọn
+            claim_key = f"{SeatEventHub.EXPIRED_CLAIM_PREFIX}:{parts[1]}:{parts[2]}"
+            if not redis_client.set(claim_key, 1, nx=True, ex=SeatEventHub.EXPIRED_CLAIM_TTL):
+                return
+            SeatLockManager.prune_expired(showtime_id)
+        except Exception as e:
+            logger.error(f"Failed to prune expired seats for showtime {showtime_id}: {e}")
@@ -0,0 +1,113 @@
+"""
+Seat Occupancy Bitmaps
+Sơ đồ chiếm chỗ của suất chiếu dạng bitmap trong Redis
+
+- seat_booked_bits:{showtime_id} (bitmap) 1 = ghế đã BOOKED
+- seat_held_bits:{showtime_id}   (bitmap) 1 = ghế đang được giữ (do SeatLockManager cập nhật)
+- seat_occupancy:{showtime_id}   (hash)   capacity = tổng số ghế của phòng
+
+Bit được đánh theo thứ tự ghế (ordinal) trong phòng, xem RoomLayout.ordinal.
+Key seat_occupancy tồn tại nghĩa là bitmap ghế BOOKED đã được nạp đầy đủ từ DB.
+Ordinal và capacity phụ thuộc sơ đồ ghế: ghế của phòng thay đổi → invalidate các suất chiếu của phòng,
+lần đếm sau nạp lại bitmap ghế BOOKED và đánh lại bitmap ghế đang giữ theo sơ đồ mới (SeatService.warm_occupancy).
+"""
+from typing import Dict, Iterable, List, Optional
+from app.core.redis import redis_client
+from app.utils.redis_lock import SeatLockManager
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SeatOccupancy:
+    """
+    Đếm ghế trống bằng BITCOUNT thay vì tải toàn bộ ghế từ DB
+    """
+
+    BOOKED_BITS_PREFIX = "seat_booked_bits"
+    META_PREFIX = "seat_occupancy"
+    DEFAULT_TTL = 2 * 24 * 60 * 60
+
+    @staticmethod
+    def _get_booked_key(showtime_id: int) -> str:
+        return f"{SeatOccupancy.BOOKED_BITS_PREFIX}:{showtime_id}"
+
+    @staticmethod
+    def _get_held_key(showtime_id: int) -> str:
+        return f"{SeatLockManager.HELD_BITS_PREFIX}:{showtime_id}"
+
+    @staticmethod
+    def _get_meta_key(showtime_id: int) -> str:
+        return f"{SeatOccupancy.META_PREFIX}:{showtime_id}"
+
+    @staticmethod
+    def warm(showtime_id: int, capacity: int, booked_ordinals: Iterable[int]) -> None:
+        """
+        Nạp bitmap ghế BOOKED từ dữ liệu DB
+        Chỉ bật bit (không xóa) nên an toàn khi chạy song song với mark_booked
+        """
+        booked_key = SeatOccupancy._get_booked_key(showtime_id)
+        meta_key = SeatOccupancy._get_meta_key(showtime_id)
+
+        pipe = redis_client.pipeline()
+        for ordinal in booked_ordinals:
+            pipe.setbit(booked_key, ordinal, 1)
+        pipe.hset(meta_key, "capacity", capacity)
+        pipe.expire(booked_key, SeatOccupancy.DEFAULT_TTL)
+        pipe.expire(meta_key, SeatOccupancy.DEFAULT_TTL)
+        pipe.execute()
+
+        logger.info(f"Warmed occupancy bitmap for showtime {showtime_id} (capacity {capacity})")
+
+    @staticmethod
+    def mark_booked(showtime_id: int, ordinals: Iterable[int]) -> None:
+        """Bật bit ghế BOOKED sau khi thanh toán thành công"""
+        booked_key = SeatOccupancy._get_booked_key(showtime_id)
+
+        pipe = redis_client.pipeline()
+        for ordinal in ordinals:
+            pipe.setbit(booked_key, ordinal, 1)
+        pipe.expire(booked_key, SeatOccupancy.DEFAULT_TTL)
+        pipe.expire(SeatOccupancy._get_meta_key(showtime_id), SeatOccupancy.DEFAULT_TTL)
+        pipe.execute()
+
+    @staticmethod
+    def invalidate(*showtime_ids: int) -> None:
+        """Xóa bitmap ghế BOOKED để lần đếm sau nạp lại từ DB"""
+        if not showtime_ids:
+            return
+        keys = []
+        for showtime_id in showtime_ids:
+            keys.append(SeatOccupancy._get_meta_key(showtime_id))
+            keys.append(SeatOccupancy._get_booked_key(showtime_id))
+        redis_client.delete(*keys)
+
+    @staticmethod
+    def count_available(showtime_ids: List[int]) -> Dict[int, Optional[int]]:
+        """
+        Đếm ghế trống cho nhiều suất chiếu trong 1 pipeline
+        = capacity - BITCOUNT(booked) - BITCOUNT(held)
+
+        Returns:
+            showtime_id -> số ghế trống, None nếu bitmap chưa được nạp
+        """
+        if not showtime_ids:
+            return {}
+
+        pipe = redis_client.pipeline(transaction=False)
+        for showtime_id in showtime_ids:
+            # Dọn ghế giữ đã hết hạn trước khi đếm
+            SeatLockManager.prune_expired(showtime_id, client=pipe)
+            pipe.hget(SeatOccupancy._get_meta_key(showtime_id), "capacity")
+            pipe.bitcount(SeatOccupancy._get_booked_key(showtime_id))
+            pipe.bitcount(SeatOccupancy._get_held_key(showtime_id))
+        results = pipe.execute()
+
+        counts = {}
+        for i, showtime_id in enumerate(showtime_ids):
+            _, capacity, booked_count, held_count = results[i * 4:(i + 1) * 4]
+            if capacity is None:
+                counts[showtime_id] = None
+                continue
+            counts[showtime_id] = max(0, int(capacity) - booked_count - held_count)
+        return counts
@@ -1,11 +1,17 @@
+import uuid
 from datetime import datetime, timedelta
+from typing import Optional, Tuple
 from jose import jwt
 from passlib.context import CryptContext
 from app.core.config import settings
 
+# min = max = default → hash dùng cost khác BCRYPT_ROUNDS được băm lại khi đăng nhập
 pwd_context = CryptContext(
     schemes=["bcrypt"],
-    deprecated="auto"
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS
 )
 
 def hash_password(password: str) -> str:
@@ -14,6 +20,10 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Kiểm tra mật khẩu, trả về thêm hash mới nếu hash cũ cần băm lại (đổi cost)"""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
 
@@ -22,7 +32,9 @@ def create_access_token(data: dict) -> str:
     )
     to_encode.update({
         "exp": expire,
-        "type": "access"
+        "type": "access",
+        # ID của token, dùng để thu hồi token (logout)
+        "jti": uuid.uuid4().hex
     })
 
     return jwt.encode(
@@ -0,0 +1,121 @@
+"""
+Showtime Detail Cache
+Cache chi tiết suất chiếu (phim, phòng, rạp) trong bộ nhớ tiến trình cho trang thanh toán
+
+Phần tử hết hạn sau SHOWTIME_DETAIL_CACHE_TTL giây (thông tin phim/rạp đổi sẽ cập nhật sau tối đa TTL).
+Suất chiếu bị sửa/xóa (đổi trạng thái...) → sau khi commit báo qua Redis pub/sub
+(kênh showtime_detail_invalidation) để mọi tiến trình xóa cache ngay.
+Khi chưa nghe được kênh pub/sub (đang kết nối lại) thì không dùng cache.
+"""
+import threading
+import time
+from typing import Dict, Optional
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from app.core.config import settings
+from app.core.redis import redis_client
+from app.models.showtime import Showtime
+from app.utils.lru_cache import LRUCache
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ShowtimeDetailCache:
+    """
+    Cache showtime_id -> chi tiết suất chiếu (LRU + TTL)
+    """
+
+    CHANNEL = "showtime_detail_invalidation"
+    RECONNECT_DELAY = 1.0
+
+    _cache = LRUCache(maxsize=settings.SHOWTIME_DETAIL_CACHE_SIZE)
+    _lock = threading.Lock()
+    _thread: Optional[threading.Thread] = None
+    _listening = threading.Event()
+
+    @staticmethod
+    def get(showtime_id: int) -> Optional[Dict]:
+        ShowtimeDetailCache._ensure_listener()
+        if not ShowtimeDetailCache._listening.is_set():
+            return None
+        detail = ShowtimeDetailCache._cache.get(showtime_id)
+        return dict(detail) if detail is not None else None
+
+    @staticmethod
+    def put(showtime_id: int, detail: Dict) -> None:
+        if not ShowtimeDetailCache._listening.is_set():
+            return
+        ShowtimeDetailCache._cache.set(showtime_id, dict(detail), ttl=settings.SHOWTIME_DETAIL_CACHE_TTL)
+
+    @staticmethod
+    def invalidate(showtime_id: int) -> None:
+        """Xóa chi tiết suất chiếu khỏi cache của mọi tiến trình"""
+        ShowtimeDetailCache._cache.pop(showtime_id)
+        try:
+            redis_client.publish(ShowtimeDetailCache.CHANNEL, showtime_id)
+        except Exception as e:
+            logger.warning(f"Failed to broadcast showtime detail invalidation for {showtime_id}: {e}")
+
+    @staticmethod
+    def _ensure_listener() -> None:
+        """Khởi động thread pub/sub (1 lần cho mỗi tiến trình)"""
+        if ShowtimeDetailCache._thread is not None and ShowtimeDetailCache._thread.is_alive():
+            return
+        with ShowtimeDetailCache._lock:
+            if ShowtimeDetailCache._thread is not None and ShowtimeDetailCache._thread.is_alive():
+                return
+            ShowtimeDetailCache._thread = threading.Thread(
+                target=ShowtimeDetailCache._listen_forever,
+                name="showtime-detail-invalidation",
+                daemon=True
+            )
+            ShowtimeDetailCache._thread.start()
+
+    @staticmethod
+    def _listen_forever() -> None:
+        while True:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(ShowtimeDetailCache.CHANNEL)
+                ShowtimeDetailCache._listening.set()
+                logger.info("Showtime detail cache subscribed to invalidation channel")
+
+                for message in pubsub.listen():
+                    if message["type"] == "message":
+                        try:
+                            ShowtimeDetailCache._cache.pop(int(message["data"]))
+                        except ValueError:
+                            logger.error(f"Invalid showtime detail invalidation message: {message['data']}")
+            except Exception as e:
+                logger.error(f"Showtime detail cache lost Redis connection: {e}")
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+            # Có thể đã mất message trong lúc mất kết nối → bỏ toàn bộ cache
+            ShowtimeDetailCache._listening.clear()
+            ShowtimeDetailCache._cache.clear()
+            time.sleep(ShowtimeDetailCache.RECONNECT_DELAY)
+
+
+@event.listens_for(Showtime, "after_update")
+@event.listens_for(Showtime, "after_delete")
+def _collect_changed_showtime(mapper, connection, target: Showtime) -> None:
+    """Ghi nhận suất chiếu bị sửa/xóa, xóa cache sau khi commit (tránh nạp lại dữ liệu cũ trước commit)"""
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_showtime_ids", set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_showtimes(session: Session) -> None:
+    for showtime_id in session.info.pop("changed_showtime_ids", ()):
+        ShowtimeDetailCache.invalidate(showtime_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_showtimes(session: Session) -> None:
+    session.info.pop("changed_showtime_ids", None)
@@ -0,0 +1,187 @@
+"""
+Token Cache
+Cache token đã xác thực -> thông tin user trong bộ nhớ tiến trình
+
+Request lặp lại với cùng token không cần kiểm tra blacklist, giải mã JWT và query user.
+Phần tử hết hạn sau TOKEN_CACHE_TTL_SECONDS giây (không quá exp của token).
+Logout / user thay đổi được báo qua Redis pub/sub (kênh token_invalidation) để mọi tiến trình xóa cache.
+Khi chưa nghe được kênh pub/sub (đang kết nối lại) thì không dùng cache.
+Mỗi lần xóa cache tăng generation của tiến trình: request lấy generation trước khi kiểm tra thu hồi,
+put bỏ qua nếu generation đã đổi (logout xảy ra giữa lúc kiểm tra và lúc lưu cache).
+"""
+import hashlib
+import threading
+import time
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from app.core.config import settings
+from app.core.redis import redis_client
+from app.models.user import User
+from app.utils.lru_cache import LRUCache
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TokenCache:
+    """
+    Cache token (sha256) -> snapshot user, key không chứa token gốc
+    """
+
+    CHANNEL = "token_invalidation"
+    RECONNECT_DELAY = 1.0
+
+    _cache = LRUCache(maxsize=settings.TOKEN_CACHE_SIZE)
+    _lock = threading.Lock()
+    # generation + khóa giữ cho (kiểm tra generation, lưu) và (tăng generation, xóa) không xen nhau
+    _generation = 0
+    _generation_lock = threading.Lock()
+    _thread: Optional[threading.Thread] = None
+    _listening = threading.Event()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    @staticmethod
+    def get(token: str) -> Optional[User]:
+        """User của token đã xác thực trước đó, None nếu không có trong cache"""
+        TokenCache._ensure_listener()
+        if not TokenCache._listening.is_set():
+            return None
+        snapshot = TokenCache._cache.get(TokenCache._key(token))
+        if snapshot is None:
+            return None
+        # Mỗi request 1 instance riêng (không dùng chung object giữa các request)
+        return User(**snapshot)
+
+    @staticmethod
+    def generation() -> int:
+        """Generation hiện tại, lấy trước khi kiểm tra token bị thu hồi và truyền lại cho put"""
+        return TokenCache._generation
+
+    @staticmethod
+    def put(token: str, user: User, exp: int, generation: int) -> None:
+        """
+        Lưu user của token vừa xác thực, hết hạn cùng lúc hoặc trước exp của token
+        Bỏ qua nếu cache đã bị xóa (logout / user thay đổi) sau khi lấy generation
+        """
+        if not TokenCache._listening.is_set():
+            return
+        ttl = min(settings.TOKEN_CACHE_TTL_SECONDS, exp - time.time())
+        if ttl <= 0:
+            return
+        snapshot = user.model_dump()
+        with TokenCache._generation_lock:
+            if TokenCache._generation != generation:
+                return
+            TokenCache._cache.set(TokenCache._key(token), snapshot, ttl=ttl)
+
+    @staticmethod
+    def invalidate_token(token: str) -> None:
+        """Xóa token khỏi cache của mọi tiến trình (logout)"""
+        key = TokenCache._key(token)
+        TokenCache._drop_token(key)
+        redis_client.publish(TokenCache.CHANNEL, f"token:{key}")
+
+    @staticmethod
+    def invalidate_user(user_id: int) -> None:
+        """Xóa mọi token của user khỏi cache của mọi tiến trình (user bị sửa/xóa)"""
+        TokenCache._drop_user(user_id)
+        redis_client.publish(TokenCache.CHANNEL, f"user:{user_id}")
+
+    @staticmethod
+    def _drop_token(key: str) -> None:
+        with TokenCache._generation_lock:
+            TokenCache._generation += 1
+            TokenCache._cache.pop(key)
+
+    @staticmethod
+    def _drop_user(user_id: int) -> None:
+        with TokenCache._generation_lock:
+            TokenCache._generation += 1
+            TokenCache._cache.pop_where(lambda snapshot: snapshot["id"] == user_id)
+
+    @staticmethod
+    def _drop_all() -> None:
+        with TokenCache._generation_lock:
+            TokenCache._generation += 1
+            TokenCache._cache.clear()
+
+    @staticmethod
+    def _ensure_listener() -> None:
+        """Khởi động thread pub/sub (1 lần cho mỗi tiến trình)"""
+        if TokenCache._thread is not None and TokenCache._thread.is_alive():
+            return
+        with TokenCache._lock:
+            if TokenCache._thread is not None and TokenCache._thread.is_alive():
+                return
+            TokenCache._thread = threading.Thread(
+                target=TokenCache._listen_forever,
+                name="token-cache-invalidation",
+                daemon=True
+            )
+            TokenCache._thread.start()
+
+    @staticmethod
+    def _listen_forever() -> None:
+        while True:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(TokenCache.CHANNEL)
+                TokenCache._listening.set()
+                logger.info("Token cache subscribed to invalidation channel")
+
+                for message in pubsub.listen():
+                    if message["type"] == "message":
+                        TokenCache._on_invalidation(message["data"])
+            except Exception as e:
+                logger.error(f"Token cache lost Redis connection: {e}")
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+            # Có thể đã mất message trong lúc mất kết nối → bỏ toàn bộ cache
+            TokenCache._listening.clear()
+            TokenCache._drop_all()
+            time.sleep(TokenCache.RECONNECT_DELAY)
+
+    @staticmethod
+    def _on_invalidation(data: str) -> None:
+        kind, _, value = data.partition(":")
+        if kind == "token":
+            TokenCache._drop_token(value)
+        elif kind == "user":
+            try:
+                TokenCache._drop_user(int(value))
+            except ValueError:
+                logger.error(f"Invalid token invalidation message: {data}")
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _collect_changed_user(mapper, connection, target: User) -> None:
+    """
+    User bị sửa/xóa (đổi role, đổi mật khẩu...) → ghi nhận user, xóa các token của user khỏi cache
+    sau khi commit (xóa trước commit thì request khác có thể nạp lại user cũ vào cache)
+    """
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_user_ids", set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_user_tokens(session: Session) -> None:
+    for user_id in session.info.pop("changed_user_ids", ()):
+        try:
+            TokenCache.invalidate_user(user_id)
+        except Exception as e:
+            logger.warning(f"Failed to invalidate token cache for user {user_id}: {e}")
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_users(session: Session) -> None:
+    session.info.pop("changed_user_ids", None)
@@ -0,0 +1,140 @@
+"""
+Token Revocation
+Thu hồi access token theo jti (logout)
+
+- revoked_jti (zset) jti -> exp của token (epoch giây), phần tử quá exp bị xóa khi có jti mới
+- kênh pub/sub token_revocation: jti vừa bị thu hồi
+
+Mỗi tiến trình giữ 1 Bloom filter các jti đã thu hồi (nạp từ zset, cập nhật qua pub/sub):
+jti không có trong filter → chắc chắn chưa bị thu hồi, không cần gọi Redis.
+Filter báo có (thu hồi thật hoặc báo nhầm) hoặc filter chưa đồng bộ → kiểm tra zset.
+"""
+import threading
+import time
+from typing import Optional
+from app.core.config import settings
+from app.core.redis import async_redis_client, redis_client
+from app.utils.bloom_filter import BloomFilter
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RevokedTokens:
+    """
+    Danh sách jti đã thu hồi (Redis) + Bloom filter cục bộ
+    """
+
+    KEY = "revoked_jti"
+    CHANNEL = "token_revocation"
+    RECONNECT_DELAY = 1.0
+    # Tạo lại filter định kỳ để bỏ các jti đã hết hạn
+    REBUILD_SECONDS = 60 * 60
+
+    _lock = threading.Lock()
+    _thread: Optional[threading.Thread] = None
+    _filter: Optional[BloomFilter] = None
+
+    @staticmethod
+    def revoke(jti: str, exp: int) -> None:
+        """Thu hồi token đến hết exp của token"""
+        now = time.time()
+        if exp <= now:
+            return
+        pipe = redis_client.pipeline()
+        pipe.zadd(RevokedTokens.KEY, {jti: exp})
+        pipe.zremrangebyscore(RevokedTokens.KEY, "-inf", now)
+        pipe.publish(RevokedTokens.CHANNEL, jti)
+        pipe.execute()
+        # Tiến trình hiện tại thấy ngay, không chờ message pub/sub
+        bloom = RevokedTokens._filter
+        if bloom is not None:
+            bloom.add(jti)
+
+    @staticmethod
+    def is_revoked(jti: str) -> bool:
+        RevokedTokens._ensure_listener()
+        bloom = RevokedTokens._filter
+        if bloom is not None and jti not in bloom:
+            return False
+        exp = redis_client.zscore(RevokedTokens.KEY, jti)
+        return exp is not None and exp > time.time()
+
+    @staticmethod
+    async def is_revoked_async(jti: str) -> bool:
+        """is_revoked trên client Redis async (filter vẫn cập nhật bởi thread pub/sub)"""
+        RevokedTokens._ensure_listener()
+        bloom = RevokedTokens._filter
+        if bloom is not None and jti not in bloom:
+            return False
+        exp = await async_redis_client.zscore(RevokedTokens.KEY, jti)
+        return exp is not None and exp > time.time()
+
+    @staticmethod
+    def _load_filter() -> BloomFilter:
+        """Tạo filter từ các jti chưa hết hạn trong Redis"""
+        jtis = redis_client.zrangebyscore(RevokedTokens.KEY, time.time(), "+inf")
+        bloom = BloomFilter(
+            capacity=max(settings.REVOKED_TOKEN_FILTER_CAPACITY, 2 * len(jtis)),
+            error_rate=settings.REVOKED_TOKEN_FILTER_ERROR_RATE
+        )
+        for jti in jtis:
+            bloom.add(jti)
+        logger.info(f"Loaded {len(jtis)} revoked token ids into filter")
+        return bloom
+
+    @staticmethod
+    def _ensure_listener() -> None:
+        """Khởi động thread pub/sub (1 lần cho mỗi tiến trình)"""
+        if RevokedTokens._thread is not None and RevokedTokens._thread.is_alive():
+            return
+        with RevokedTokens._lock:
+            if RevokedTokens._thread is not None and RevokedTokens._thread.is_alive():
+                return
+            RevokedTokens._thread = threading.Thread(
+                target=RevokedTokens._listen_forever,
+                name="token-revocation",
+                daemon=True
+            )
+            RevokedTokens._thread.start()
+
+    @staticmethod
+    def _listen_forever() -> None:
+        while True:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                # Subscribe trước khi nạp filter → không bỏ sót jti thu hồi trong lúc nạp
+                pubsub.subscribe(RevokedTokens.CHANNEL)
+                RevokedTokens._filter = RevokedTokens._load_filter()
+                rebuild_at = time.monotonic() + RevokedTokens.REBUILD_SECONDS
+
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is not None and message["type"] == "message":
+                        RevokedTokens._filter.add(message["data"])
+                    if RevokedTokens._filter.is_full or time.monotonic() >= rebuild_at:
+                        RevokedTokens._rebuild(pubsub)
+                        rebuild_at = time.monotonic() + RevokedTokens.REBUILD_SECONDS
+            except Exception as e:
+                logger.error(f"Token revocation listener lost Redis connection: {e}")
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+            # Có thể đã mất jti trong lúc mất kết nối → kiểm tra Redis đến khi nạp lại filter
+            RevokedTokens._filter = None
+            time.sleep(RevokedTokens.RECONNECT_DELAY)
+
+    @staticmethod
+    def _rebuild(pubsub) -> None:
+        """Nạp lại filter, thêm cả các jti đến trong lúc nạp"""
+        bloom = RevokedTokens._load_filter()
+        while True:
+            message = pubsub.get_message(timeout=0)
+            if message is None:
+                break
+            if message["type"] == "message":
+                bloom.add(message["data"])
+        RevokedTokens._filter = bloom
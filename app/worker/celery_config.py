@@ -23,8 +23,29 @@ celery_app.conf.update(
 
 # Schedule periodic tasks
 celery_app.conf.beat_schedule = {
-    'cleanup-expired-bookings-every-minute': {
+    # Booking được hủy đúng hạn bởi app.worker.expiry_scheduler, task này là lưới an toàn
+    'cleanup-expired-bookings-every-5-minutes': {
         'task': 'app.worker.tasks.cleanup_expired_bookings',
-        'schedule': 60.0,  # Chạy mỗi 60 giây (1 phút)
+        'schedule': 300.0,  # Chạy mỗi 300 giây (5 phút)
+    },
+    # Relay outbox còn sót (tiến trình outbox_relay xử lý ngay khi có event)
+    'relay-outbox-events-every-30-seconds': {
+        'task': 'app.worker.tasks.relay_outbox_events',
+        'schedule': 30.0,
+    },
+    # Cập nhật lịch chiếu (film_schedules) của các suất chiếu vừa thay đổi
+    'refresh-film-schedules-every-30-seconds': {
+        'task': 'app.worker.tasks.refresh_film_schedules',
+        'schedule': 30.0,
+    },
+    # Tính lại toàn bộ lịch chiếu mỗi đêm
+    'rebuild-film-schedules-daily': {
+        'task': 'app.worker.tasks.rebuild_film_schedules',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    # Gửi email còn sót trong hàng đợi (task gửi lô được lên lịch khi có email mới)
+    'drain-payment-emails-every-minute': {
+        'task': 'app.worker.tasks.send_payment_success_emails_batch_task',
+        'schedule': 60.0,
     },
 }
@@ -0,0 +1,85 @@
+"""
+Booking expiry dispatcher
+Hủy booking đúng lúc hết hạn thanh toán dựa trên lịch trong Redis (BookingExpiryScheduler)
+
+Chạy: python -m app.worker.expiry_scheduler
+Có thể chạy nhiều instance, mỗi booking đến hạn chỉ được 1 instance lấy ra.
+"""
+import time
+from datetime import datetime, timedelta
+from app.utils.booking_expiry import BookingExpiryScheduler
+from app.repositories.booking_repo import BookingRepository
+from app.worker.tasks import expire_bookings
+import logging
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 200
+# Thời gian chờ tối đa khi không có booking nào, booking mới sẽ đánh thức dispatcher sớm hơn
+IDLE_TIMEOUT = 60.0
+RETRY_DELAY = 1.0
+# Booking bị bỏ qua do đang bị khóa (vd: đang xác nhận thanh toán) được thử lại sau khoảng này
+LOCKED_RETRY_DELAY = 5.0
+# BLPOP với timeout 0 là chờ vô hạn → hạn gần hơn mức này thì xử lý ngay
+MIN_WAIT = 0.01
+
+
+def dispatch_due() -> int:
+    """Hủy tất cả booking đã đến hạn, trả về số booking đã hủy"""
+    count = 0
+    while True:
+        booking_ids = BookingExpiryScheduler.pop_due(BATCH_SIZE)
+        if not booking_ids:
+            return count
+        skipped = []
+
+        def expire(session):
+            expired = BookingRepository.expire_bookings_by_ids(db=session, booking_ids=booking_ids)
+            # Booking vẫn PENDING nhưng không bị hủy → đang bị khóa (SKIP LOCKED)
+            expired_ids = {booking_id for booking_id, _, _ in expired}
+            skipped.extend(BookingRepository.get_pending_booking_ids(
+                db=session,
+                booking_ids=[booking_id for booking_id in booking_ids if booking_id not in expired_ids]
+            ))
+            return expired
+
+        try:
+            count += expire_bookings(expire)
+        except Exception:
+            # Đưa lại vào lịch để thử lại, sweeper định kỳ là lưới an toàn cuối cùng
+            _reschedule(booking_ids, RETRY_DELAY)
+            raise
+
+        # Thanh toán đang xác nhận thất bại → booking được hủy ở lần thử lại, thành công → không còn PENDING
+        if skipped:
+            logger.info(f"Rescheduled {len(skipped)} locked bookings")
+            _reschedule(skipped, LOCKED_RETRY_DELAY)
+
+
+def _reschedule(booking_ids, delay: float) -> None:
+    retry_at = datetime.utcnow() + timedelta(seconds=delay)
+    for booking_id in booking_ids:
+        BookingExpiryScheduler.schedule(booking_id, retry_at)
+
+
+def run() -> None:
+    logger.info("Booking expiry dispatcher started")
+    while True:
+        try:
+            count = dispatch_due()
+            if count:
+                logger.info(f"Expired {count} bookings on schedule")
+
+            # Ngủ đến hạn gần nhất (hoặc đến khi có booking mới)
+            wait = BookingExpiryScheduler.seconds_until_next()
+            timeout = IDLE_TIMEOUT if wait is None else min(wait, IDLE_TIMEOUT)
+            if timeout >= MIN_WAIT:
+                BookingExpiryScheduler.wait(timeout)
+        except Exception as e:
+            logger.error(f"Booking expiry dispatcher error: {e}")
+            time.sleep(RETRY_DELAY)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run()
@@ -0,0 +1,73 @@
+"""
+Outbox relay
+Xử lý side effect của thanh toán đã ghi trong bảng outbox_events (OutboxService)
+
+Chạy: python -m app.worker.outbox_relay
+LISTEN kênh outbox_events để xử lý ngay khi transaction thanh toán commit,
+không có NOTIFY thì vẫn quét lại sau IDLE_TIMEOUT giây (event lỗi đến hạn thử lại).
+Có thể chạy nhiều instance, mỗi event chỉ được 1 instance lấy ra (SKIP LOCKED).
+"""
+import select
+import time
+from sqlmodel import Session
+from app.core.config import settings
+from app.core.database import engine
+from app.repositories.outbox_repo import OutboxRepository
+from app.services.outbox_service import OutboxService
+import logging
+
+logger = logging.getLogger(__name__)
+
+IDLE_TIMEOUT = 5.0
+RETRY_DELAY = 1.0
+
+
+def relay_pending() -> int:
+    """Xử lý hết event đang đến lượt, trả về số event đã lấy ra"""
+    return OutboxService.relay_pending(
+        db_factory=lambda: Session(engine),
+        limit=settings.OUTBOX_BATCH_SIZE
+    )
+
+
+def _listen():
+    """Kết nối riêng (autocommit) chỉ để nhận NOTIFY"""
+    connection = engine.raw_connection()
+    connection.driver_connection.autocommit = True
+    cursor = connection.cursor()
+    cursor.execute(f"LISTEN {OutboxRepository.NOTIFY_CHANNEL}")
+    cursor.close()
+    return connection
+
+
+def run() -> None:
+    logger.info("Outbox relay started")
+    connection = None
+    while True:
+        try:
+            if connection is None:
+                connection = _listen()
+            listener = connection.driver_connection
+
+            count = relay_pending()
+            if count:
+                logger.info(f"Relayed {count} outbox events")
+
+            # Chờ NOTIFY (nhiều NOTIFY đến cùng lúc chỉ cần 1 lần relay)
+            if select.select([listener], [], [], IDLE_TIMEOUT) != ([], [], []):
+                listener.poll()
+                listener.notifies.clear()
+        except Exception as e:
+            logger.error(f"Outbox relay error: {e}")
+            if connection is not None:
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+                connection = None
+            time.sleep(RETRY_DELAY)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run()
@@ -1,13 +1,20 @@
+import json
+import time
+import uuid
 from celery import Task
+from collections import defaultdict
 from datetime import datetime, timedelta
-from sqlmodel import Session, select
+from typing import Callable, List, Optional, Tuple
+from sqlmodel import Session
 from app.worker.celery_config import celery_app
+from app.core.config import settings
 from app.core.database import engine
-from app.models.seat_status import SeatStatus
-from app.models.booking import Booking
-from app.models.booking_detail import BookingDetail
-from app.utils.enum import SeatStatusEnum, BookingStatus, PaymentStatus
-from app.utils.email_service import send_payment_success_email
+from app.core.redis import redis_client
+from app.repositories.booking_repo import BookingRepository
+from app.repositories.seat_repo import SeatRepository
+from app.services.film_schedule_service import FilmScheduleService
+from app.utils.email_service import send_payment_success_email, send_payment_success_emails
+from app.utils.redis_lock import SeatLockManager
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,45 +29,86 @@ class DatabaseTask(Task):
             self._session = Session(engine)
         return self._session
 
-@celery_app.task
-def cleanup_expired_bookings():
+def expire_bookings(select_expired: Callable[[Session], List[Tuple[int, int, int]]]) -> int:
     """
-    Task định kỳ cleanup các booking hết hạn
+    Hủy 1 nhóm booking trong 1 transaction ngắn và trả ghế của chúng
     
-    Chạy mỗi 1 phút để:
-    - Hủy booking PENDING quá 10 phút chưa thanh toán
-    - Cập nhật payment_status thành FAILED
+    Args:
+        select_expired: hàm hủy booking trong DB, trả về (booking_id, showtime_id, user_id) đã hủy
+    
+    Returns:
+        Số booking đã hủy
     """
     with Session(engine) as session:
         try:
-            # Tìm booking PENDING quá 10 phút (tính từ booking_date)
-            ten_minutes_ago = datetime.utcnow() - timedelta(minutes=10)
-            
-            statement = select(Booking).where(
-                Booking.booking_status == BookingStatus.PENDING,
-                Booking.booking_date <= ten_minutes_ago
-            )
-            expired_bookings = session.exec(statement).all()
-            
-            count = 0
-            
-            for booking in expired_bookings:
-                # Cập nhật trạng thái booking
-                booking.booking_status = BookingStatus.CANCELLED
-                booking.payment_status = PaymentStatus.FAILED
-                session.add(booking)
-                
-                count += 1
-                logger.info(f"Expired booking {booking.id}")
+            expired = select_expired(session)
+            if not expired:
+                return 0
             
+            booking_ids = [booking_id for booking_id, _, _ in expired]
+            released_seats = SeatRepository.release_booking_holds(db=session, booking_ids=booking_ids)
+            seat_ids_by_booking = BookingRepository.get_seat_ids_by_bookings(db=session, booking_ids=booking_ids)
             session.commit()
-            logger.info(f"Cleaned up {count} expired bookings")
-            return {"expired_bookings": count}
-            
         except Exception as e:
-            logger.error(f"Error in cleanup_expired_bookings: {str(e)}")
+            logger.error(f"Error expiring bookings: {str(e)}")
             session.rollback()
             raise e
+    
+    logger.info(f"Expired {len(expired)} bookings, released {released_seats} held seats")
+    
+    # Bỏ lock Redis của các ghế thuộc booking đã hủy (nếu user còn giữ)
+    _release_booking_locks(expired, seat_ids_by_booking)
+    return len(expired)
+
+
+def _release_booking_locks(expired, seat_ids_by_booking) -> None:
+    """Gom ghế theo (suất chiếu, user) → 1 script bỏ lock cho mỗi nhóm"""
+    groups = defaultdict(list)
+    for booking_id, showtime_id, user_id in expired:
+        groups[(showtime_id, user_id)].extend(seat_ids_by_booking.get(booking_id, []))
+    
+    for (showtime_id, user_id), seat_ids in groups.items():
+        if not seat_ids:
+            continue
+        try:
+            SeatLockManager.unlock_seats(showtime_id=showtime_id, seat_ids=seat_ids, user_id=user_id)
+        except Exception as e:
+            logger.warning(f"Failed to release Redis locks of user {user_id} in showtime {showtime_id}: {e}")
+
+
+@celery_app.task
+def cleanup_expired_bookings():
+    """
+    Task định kỳ cleanup các booking hết hạn (lưới an toàn cho expiry scheduler)
+    
+    Booking được hủy đúng hạn bởi app/worker/expiry_scheduler.py, task này chỉ bắt các booking bị sót
+    (Redis mất dữ liệu, booking đang bị khóa lúc đến hạn...):
+    - Hủy booking PENDING quá hạn thanh toán chưa thanh toán
+    - Cập nhật payment_status thành FAILED
+    - Trả ghế đang HOLD của các booking đã hủy (DB + Redis)
+    
+    Xử lý theo từng chunk, mỗi chunk 1 transaction ngắn (FOR UPDATE SKIP LOCKED)
+    nên nhiều worker có thể chạy song song mà không chặn nhau
+    """
+    # Tìm booking PENDING quá hạn (tính từ booking_date)
+    cutoff = datetime.utcnow() - timedelta(minutes=settings.BOOKING_EXPIRE_MINUTES)
+    chunk_size = settings.BOOKING_SWEEP_CHUNK_SIZE
+    
+    count = 0
+    while True:
+        expired_count = expire_bookings(
+            lambda session: BookingRepository.expire_pending_bookings(
+                db=session,
+                cutoff=cutoff,
+                limit=chunk_size
+            )
+        )
+        count += expired_count
+        if expired_count < chunk_size:
+            break
+    
+    logger.info(f"Cleaned up {count} expired bookings")
+    return {"expired_bookings": count}
 
 
 @celery_app.task
@@ -72,3 +120,240 @@ def send_payment_success_email_task(to_email: str, booking_detail: dict):
     except Exception as e:  # noqa: BLE001
         logger.error("Error sending email to %s: %s", to_email, e)
         raise e
+
+
+# Hàng đợi email xác nhận thanh toán, gom gửi theo lô qua cùng 1 session SMTP
+# Task gửi chuyển payload sang list processing riêng (atomic) và chỉ xóa sau khi xử lý xong:
+# task lỗi / worker bị kill giữa chừng thì payload được trả lại hàng đợi, không bị mất
+EMAIL_QUEUE_KEY = "email_queue:payment_success"
+EMAIL_BATCH_SCHEDULED_KEY = "email_queue:payment_success:scheduled"
+EMAIL_PROCESSING_PREFIX = "email_queue:payment_success:worker"
+# zset list processing -> thời điểm cập nhật gần nhất (phát hiện list của worker đã chết)
+EMAIL_PROCESSING_KEY = "email_queue:payment_success:processing"
+EMAIL_DEAD_LETTER_KEY = "email_queue:payment_success:dead"
+EMAIL_PROCESSING_TIMEOUT = 35 * 60  # > task_time_limit
+EMAIL_BATCH_DELAY = 2
+EMAIL_MAX_ATTEMPTS = 3
+
+# Lua script chuyển tối đa ARGV[1] payload từ hàng đợi sang list processing
+# KEYS[1]: hàng đợi, KEYS[2]: list processing, KEYS[3]: zset processing, ARGV[2]: thời điểm hiện tại
+_CLAIM_EMAILS_SCRIPT = """
+local items = redis.call('LPOP', KEYS[1], tonumber(ARGV[1]))
+if not items then
+    return {}
+end
+redis.call('RPUSH', KEYS[2], unpack(items))
+redis.call('ZADD', KEYS[3], ARGV[2], KEYS[2])
+return items
+"""
+
+# Lua script trả toàn bộ payload của list processing về hàng đợi
+# KEYS[1]: list processing, KEYS[2]: hàng đợi, KEYS[3]: zset processing
+# Trả về số payload đã trả lại
+_RELEASE_EMAILS_SCRIPT = """
+local count = 0
+while redis.call('LMOVE', KEYS[1], KEYS[2], 'LEFT', 'RIGHT') do
+    count = count + 1
+end
+redis.call('ZREM', KEYS[3], KEYS[1])
+return count
+"""
+
+_claim_emails_script = redis_client.register_script(_CLAIM_EMAILS_SCRIPT)
+_release_emails_script = redis_client.register_script(_RELEASE_EMAILS_SCRIPT)
+
+
+def enqueue_payment_success_emails(booking_ids: List[int]) -> None:
+    """
+    Đưa email xác nhận của các booking vào hàng đợi (chỉ lưu booking_id, chi tiết đọc lại khi gửi),
+    chỉ lên lịch 1 task gửi lô cho các email đến gần nhau.
+    """
+    if not booking_ids:
+        return
+    _push_email_payloads([
+        json.dumps({"booking_id": booking_id, "attempts": 0})
+        for booking_id in booking_ids
+    ])
+
+
+def _push_email_payloads(payloads: List[str]) -> None:
+    pipe = redis_client.pipeline()
+    pipe.rpush(EMAIL_QUEUE_KEY, *payloads)
+    pipe.set(EMAIL_BATCH_SCHEDULED_KEY, 1, nx=True, ex=EMAIL_BATCH_DELAY * 30)
+    _, scheduled = pipe.execute()
+    if scheduled:
+        send_payment_success_emails_batch_task.apply_async(countdown=EMAIL_BATCH_DELAY)
+
+
+def _schedule_email_batch() -> None:
+    """Lên lịch task gửi lô nếu chưa có task nào đang chờ"""
+    if redis_client.set(EMAIL_BATCH_SCHEDULED_KEY, 1, nx=True, ex=EMAIL_BATCH_DELAY * 30):
+        send_payment_success_emails_batch_task.apply_async(countdown=EMAIL_BATCH_DELAY)
+
+
+def _release_email_payloads(processing_key: str) -> int:
+    """Trả các payload chưa xử lý xong của list processing về hàng đợi"""
+    return _release_emails_script(keys=[processing_key, EMAIL_QUEUE_KEY, EMAIL_PROCESSING_KEY])
+
+
+def _recover_stale_email_payloads() -> int:
+    """Trả lại payload của các list processing không được cập nhật quá lâu (worker đã chết)"""
+    count = 0
+    cutoff = time.time() - EMAIL_PROCESSING_TIMEOUT
+    for processing_key in redis_client.zrangebyscore(EMAIL_PROCESSING_KEY, "-inf", cutoff):
+        recovered = _release_email_payloads(processing_key)
+        if recovered:
+            logger.warning("Recovered %d queued emails from %s", recovered, processing_key)
+        count += recovered
+    return count
+
+
+def _ack_email_payloads(processing_key: str, payloads: List[str], requeue: Optional[List[str]] = None) -> None:
+    """
+    Xóa các payload đã xử lý khỏi list processing
+    requeue: payload gửi lại (lần thử tiếp theo) - giữ trong list processing, trả về hàng đợi khi task kết thúc
+    """
+    if not payloads and not requeue:
+        return
+    pipe = redis_client.pipeline()
+    for payload in payloads:
+        pipe.lrem(processing_key, 1, payload)
+    if requeue:
+        pipe.rpush(processing_key, *requeue)
+    pipe.zadd(EMAIL_PROCESSING_KEY, {processing_key: time.time()})
+    pipe.execute()
+
+
+def _dead_letter_email_payloads(processing_key: str, payloads: List[str]) -> None:
+    """Chuyển payload không thể xử lý sang list dead letter (giữ lại để kiểm tra / gửi lại thủ công)"""
+    pipe = redis_client.pipeline()
+    pipe.rpush(EMAIL_DEAD_LETTER_KEY, *payloads)
+    for payload in payloads:
+        pipe.lrem(processing_key, 1, payload)
+    pipe.execute()
+
+
+@celery_app.task
+def refresh_film_schedules():
+    """Tính lại lịch chiếu (film_schedules) của các suất chiếu vừa thay đổi"""
+    with Session(engine) as session:
+        count = FilmScheduleService.refresh_dirty(
+            db=session,
+            batch_size=settings.FILM_SCHEDULE_REFRESH_BATCH_SIZE
+        )
+    return {"refreshed": count}
+
+
+@celery_app.task
+def rebuild_film_schedules():
+    """Tính lại toàn bộ lịch chiếu (lưới an toàn hằng ngày)"""
+    with Session(engine) as session:
+        FilmScheduleService.rebuild(db=session)
+    return {"status": "rebuilt"}
+
+
+@celery_app.task
+def relay_outbox_events():
+    """Task định kỳ relay outbox (lưới an toàn khi tiến trình app.worker.outbox_relay không chạy)"""
+    from app.services.outbox_service import OutboxService
+
+    count = OutboxService.relay_pending(
+        db_factory=lambda: Session(engine),
+        limit=settings.OUTBOX_BATCH_SIZE
+    )
+    return {"relayed": count}
+
+
+@celery_app.task
+def send_payment_success_emails_batch_task():
+    """Task gửi lô email xác nhận thanh toán đang chờ trong hàng đợi."""
+    # Email đến sau thời điểm này sẽ lên lịch task mới (nếu task này không lấy kịp)
+    redis_client.delete(EMAIL_BATCH_SCHEDULED_KEY)
+    _recover_stale_email_payloads()
+
+    processing_key = f"{EMAIL_PROCESSING_PREFIX}:{uuid.uuid4().hex}"
+    sent = 0
+    retry = 0
+    failed = 0
+    try:
+        while True:
+            payloads = _claim_emails_script(
+                keys=[EMAIL_QUEUE_KEY, processing_key, EMAIL_PROCESSING_KEY],
+                args=[settings.EMAIL_BATCH_SIZE, time.time()]
+            )
+            if not payloads:
+                break
+
+            items = []
+            invalid = []
+            for payload in payloads:
+                try:
+                    item = json.loads(payload)
+                except ValueError:
+                    item = None
+                if isinstance(item, dict) and isinstance(item.get("booking_id"), int):
+                    items.append((payload, item))
+                else:
+                    invalid.append(payload)
+            if invalid:
+                logger.error("Moved %d invalid queued email payloads to %s", len(invalid), EMAIL_DEAD_LETTER_KEY)
+                _dead_letter_email_payloads(processing_key, invalid)
+
+            # Chi tiết của cả lô booking trong 2 query
+            # Lỗi DB → dừng, payload trong list processing được trả lại hàng đợi (finally)
+            with Session(engine) as session:
+                details = {
+                    detail["id"]: detail
+                    for detail in BookingRepository.get_bookings_with_details(
+                        db=session,
+                        booking_ids=[item["booking_id"] for _, item in items]
+                    )
+                }
+
+            done = []
+            sendable = []
+            for payload, item in items:
+                detail = details.get(item["booking_id"])
+                if detail is None or not detail.get("email"):
+                    # Booking không còn / không có email: không có gì để gửi
+                    logger.warning("Skipping payment success email for booking %s: no booking email", item["booking_id"])
+                    done.append(payload)
+                else:
+                    sendable.append((payload, item))
+
+            results = send_payment_success_emails([
+                (details[item["booking_id"]]["email"], details[item["booking_id"]])
+                for _, item in sendable
+            ])
+            requeue = []
+            exhausted = []
+            for (payload, item), ok in zip(sendable, results):
+                if ok:
+                    sent += 1
+                    done.append(payload)
+                elif item.get("attempts", 0) + 1 < EMAIL_MAX_ATTEMPTS:
+                    item["attempts"] = item.get("attempts", 0) + 1
+                    requeue.append(json.dumps(item))
+                    done.append(payload)
+                else:
+                    exhausted.append(payload)
+            if exhausted:
+                # Hết lượt thử: giữ lại trong dead letter để gửi lại thủ công, không bỏ mất email
+                logger.error(
+                    "Moved %d payment success emails to %s after %d attempts",
+                    len(exhausted), EMAIL_DEAD_LETTER_KEY, EMAIL_MAX_ATTEMPTS
+                )
+                _dead_letter_email_payloads(processing_key, exhausted)
+                failed += len(exhausted)
+            retry += len(requeue)
+            _ack_email_payloads(processing_key, done, requeue)
+    except Exception as e:
+        logger.error("Payment success email batch failed, re-queueing unsent emails: %s", e)
+        raise
+    finally:
+        # Email gửi lại + email chưa xử lý do lỗi → trả về hàng đợi cho task sau
+        released = _release_email_payloads(processing_key)
+        if released:
+            logger.warning("Re-queued %d payment success emails", released)
+            _schedule_email_batch()
+    return {"sent": sent, "retry": retry, "failed": failed}
@@ -3,18 +3,20 @@ from fastapi.middleware.cors import CORSMiddleware
 from mako.ext.autohandler import autohandler
 
 from app.core.config import settings
-from app.core.database import init_db
+from app.core.database import dispose_async_engine, init_db
 import uvicorn
 import logging
-from app.core.redis import redis_client
-from app.router.auth import router as auth_router
+from app.core.redis import async_redis_client, redis_client
+from app.utils.password_pool import PasswordPool
+from app.router.auth import router as auth_router, async_router as auth_async_router
 from app.router.cinema_room import router as cinema_room_router
 from app.router.theater import router as theater_router
 from app.router.film import router as film_router
 from app.router.showtime import router as showtime_router
-from app.router.seat import router as seat_router
-from app.router.booking import router as booking_router
+from app.router.seat import router as seat_router, async_router as seat_async_router
+from app.router.booking import router as booking_router, async_router as booking_async_router
 from app.router.payment import router as payment_router
+from app.router.metrics import router as metrics_router
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -29,11 +31,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Seat-Map-Version", "X-Next-Cursor", "Retry-After"],
 )
 @app.on_event("startup")
 def on_startup():
     init_db()
 
+@app.on_event("shutdown")
+async def on_shutdown():
+    PasswordPool.shutdown()
+    await dispose_async_engine()
+    await async_redis_client.aclose()
+
 @app.get("/")
 def root():
     return {"message": "FastAPI running with Docker 🚀"}
@@ -48,6 +57,13 @@ def redis_test():
     return {"value": redis_client.get("hello")}
 
 
+# Request path async (asyncpg + redis.asyncio) cho sơ đồ ghế, giữ ghế, booking, đăng nhập
+# Đăng ký trước nên thay thế route sync cùng method + path, các route còn lại vẫn dùng router sync
+if settings.ASYNC_REQUEST_PATH:
+    app.include_router(auth_async_router)
+    app.include_router(seat_async_router)
+    app.include_router(booking_async_router)
+
 app.include_router(auth_router)
 app.include_router(cinema_room_router)
 app.include_router(theater_router)
@@ -56,5 +72,6 @@ app.include_router(showtime_router)
 app.include_router(seat_router)
 app.include_router(booking_router)
 app.include_router(payment_router)
+app.include_router(metrics_router)
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
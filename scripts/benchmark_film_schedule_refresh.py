@@ -0,0 +1,73 @@
+"""
+Benchmark query cập nhật read model lịch chiếu
+So sánh plan và độ trễ của FilmScheduleRepository.refresh (suất chiếu ACTIVE của 1 phim trong 1 ngày, mọi rạp)
+trước và sau khi có index ix_showtimes_active_film_date_room
+
+Dùng chung dữ liệu giả lập của scripts/benchmark_showtime_indexes.py (schema bench_showtimes),
+mỗi lần refresh được rollback nên các lần đo chạy trên cùng dữ liệu.
+
+Chạy: python -m scripts.benchmark_film_schedule_refresh [--days 365] [--runs 200] [--keys 1] [--keep]
+"""
+import argparse
+import random
+from datetime import date, timedelta
+from typing import List, Tuple
+from sqlalchemy import text
+from sqlmodel import SQLModel, Session
+from app.core.database import engine
+from app.models import FilmSchedule
+from app.repositories.film_schedule_repo import FilmScheduleRepository
+from scripts.benchmark_showtime_indexes import (
+    FILMS, INDEX_NAME, SCHEMA, bench_engine, create_index, explain, measure, setup
+)
+
+
+def refresh(session: Session, keys: List[Tuple[int, date]]) -> None:
+    """Chạy refresh rồi rollback"""
+    FilmScheduleRepository.refresh(db=session, keys=keys)
+    session.rollback()
+
+
+def run_phase(label: str, runs: int, keys_per_run: int, days: int, start_date: date, seed: int) -> None:
+    print(f"\n===== {label} =====")
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(runs):
+        keys = [
+            (rng.randint(1, FILMS), start_date + timedelta(days=rng.randrange(days)))
+            for _ in range(keys_per_run)
+        ]
+        queries.append(lambda session, k=keys: refresh(session, k))
+
+    # Câu cuối của refresh: INSERT ... SELECT từ showtimes + cinema_rooms
+    print("\n-- FilmScheduleRepository.refresh")
+    print(explain(queries[0]))
+    print()
+    measure("FilmScheduleRepository.refresh", queries)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark query cập nhật read model lịch chiếu")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--keys", type=int, default=1, help="Số nhóm (phim, ngày) mỗi lần refresh")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help=f"Giữ lại schema {SCHEMA} sau khi chạy")
+    args = parser.parse_args()
+
+    start_date = date.today()
+    setup(args.days, start_date)
+    with bench_engine.begin() as connection:
+        SQLModel.metadata.create_all(connection, tables=[FilmSchedule.__table__])
+    try:
+        run_phase("Before (single-column indexes)", args.runs, args.keys, args.days, start_date, args.seed)
+        create_index()
+        run_phase(f"After ({INDEX_NAME})", args.runs, args.keys, args.days, start_date, args.seed)
+    finally:
+        if not args.keep:
+            with engine.begin() as connection:
+                connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Benchmark index truy vấn suất chiếu
+So sánh plan và độ trễ của danh sách suất chiếu (phim/rạp/ngày) và rạp theo phim
+trước và sau khi có index ix_showtimes_active_film_date_room
+(trang phim đọc read model film_schedules, query refresh được đo ở scripts/benchmark_film_schedule_refresh.py)
+
+Dữ liệu giả lập nằm trong schema riêng (bench_showtimes), không đụng đến bảng thật:
+30 rạp x 8 phòng x 6 suất/ngày trong --days ngày (mặc định 1 năm, ~525k suất chiếu)
+
+Chạy: python -m scripts.benchmark_showtime_indexes [--days 365] [--runs 200] [--keep]
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from typing import Callable, List, Tuple
+from sqlalchemy import event, text
+from sqlmodel import SQLModel, Session, select
+from app.core.database import engine
+from app.models import Film, Theater, CinemaRoom, Showtime
+
+SCHEMA = "bench_showtimes"
+FILMS = 60
+THEATERS = 30
+ROOMS_PER_THEATER = 8
+SHOWS_PER_DAY = 6
+INDEX_NAME = "ix_showtimes_active_film_date_room"
+
+TABLES = [Film.__table__, Theater.__table__, CinemaRoom.__table__, Showtime.__table__]
+
+# Bảng không ghi schema → chạy trên schema benchmark
+bench_engine = engine.execution_options(schema_translate_map={None: SCHEMA})
+
+
+def setup(days: int, start_date: date) -> None:
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        connection.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    with bench_engine.begin() as connection:
+        SQLModel.metadata.create_all(connection, tables=TABLES)
+        # Trạng thái "trước": chỉ có index đơn cột của migration đầu tiên
+        connection.execute(text(f"DROP INDEX {SCHEMA}.{INDEX_NAME}"))
+
+        connection.execute(text(f"""
+            INSERT INTO {SCHEMA}.films (title)
+            SELECT 'Film ' || i FROM generate_series(1, {FILMS}) AS i
+        """))
+        connection.execute(text(f"""
+            INSERT INTO {SCHEMA}.theaters (name, address, city)
+            SELECT 'Theater ' || i, 'Address ' || i, 'City ' || (i % 5)
+            FROM generate_series(1, {THEATERS}) AS i
+        """))
+        connection.execute(text(f"""
+            INSERT INTO {SCHEMA}.cinema_rooms (theater_id, name, capacity)
+            SELECT t, 'Room ' || r, 120
+            FROM generate_series(1, {THEATERS}) AS t, generate_series(1, {ROOMS_PER_THEATER}) AS r
+        """))
+        # ~10% suất chiếu bị hủy (không ACTIVE)
+        connection.execute(text(f"""
+            INSERT INTO {SCHEMA}.showtimes (film_id, room_id, show_date, start_time, end_time, format, status)
+            SELECT
+                1 + floor(random() * {FILMS})::int,
+                room.id,
+                day::date,
+                make_time(9 + slot * 2, 0, 0),
+                make_time(11 + slot * 2, 0, 0),
+                '2D',
+                CASE WHEN random() < 0.1 THEN 'CANCELLED' ELSE 'ACTIVE' END
+            FROM {SCHEMA}.cinema_rooms AS room,
+                 generate_series(CAST(:start AS date), CAST(:start AS date) + {days - 1}, interval '1 day') AS day,
+                 generate_series(0, {SHOWS_PER_DAY - 1}) AS slot
+        """), {"start": start_date})
+        connection.execute(text(f"ANALYZE {SCHEMA}.showtimes"))
+        count = connection.execute(text(f"SELECT count(*) FROM {SCHEMA}.showtimes")).scalar()
+    print(f"Loaded {count} showtimes over {days} days")
+
+
+def showtimes_by_film_theater_date(session: Session, film_id: int, theater_id: int, show_date: date):
+    """Suất chiếu ACTIVE của phim tại rạp trong ngày"""
+    stmt = (
+        select(Showtime)
+        .join(CinemaRoom, CinemaRoom.id == Showtime.room_id)
+        .where(
+            Showtime.film_id == film_id,
+            CinemaRoom.theater_id == theater_id,
+            Showtime.show_date == show_date,
+            Showtime.status == "ACTIVE",
+        )
+        .order_by(Showtime.start_time)
+    )
+    return session.exec(stmt).all()
+
+
+def theaters_by_film(session: Session, film_id: int):
+    """Rạp có suất chiếu ACTIVE của phim"""
+    stmt = (
+        select(Theater)
+        .join(CinemaRoom, CinemaRoom.theater_id == Theater.id)
+        .join(Showtime, Showtime.room_id == CinemaRoom.id)
+        .where(Showtime.film_id == film_id, Showtime.status == "ACTIVE")
+        .distinct()
+        .order_by(Theater.name)
+    )
+    return session.exec(stmt).all()
+
+
+def create_index() -> None:
+    index = next(index for index in Showtime.__table__.indexes if index.name == INDEX_NAME)
+    with bench_engine.begin() as connection:
+        index.create(connection)
+        connection.execute(text(f"ANALYZE {SCHEMA}.showtimes"))
+
+
+def explain(query: Callable[[Session], object]) -> str:
+    """EXPLAIN ANALYZE câu SQL cuối cùng mà query gửi đi"""
+    captured: List[Tuple[str, object]] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    event.listen(bench_engine.engine, "before_cursor_execute", capture)
+    try:
+        with Session(bench_engine) as session:
+            query(session)
+    finally:
+        event.remove(bench_engine.engine, "before_cursor_execute", capture)
+
+    statement, parameters = captured[-1]
+    with bench_engine.connect() as connection:
+        rows = connection.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters).all()
+    return "\n".join(row[0] for row in rows)
+
+
+def measure(name: str, queries: List[Callable[[Session], object]]) -> None:
+    latencies = []
+    with Session(bench_engine) as session:
+        for query in queries:
+            started = time.perf_counter()
+            query(session)
+            latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{name}: mean {statistics.mean(latencies):.2f} ms, p50 {statistics.median(latencies):.2f} ms, p95 {p95:.2f} ms")
+
+
+def run_phase(label: str, runs: int, days: int, start_date: date, seed: int) -> None:
+    print(f"\n===== {label} =====")
+    rng = random.Random(seed)
+    showtime_queries = []
+    theater_queries = []
+    for _ in range(runs):
+        film_id = rng.randint(1, FILMS)
+        theater_id = rng.randint(1, THEATERS)
+        show_date = start_date + timedelta(days=rng.randrange(days))
+        showtime_queries.append(
+            lambda session, f=film_id, t=theater_id, d=show_date:
+            showtimes_by_film_theater_date(session, f, t, d)
+        )
+        theater_queries.append(lambda session, f=film_id: theaters_by_film(session, f))
+
+    print("\n-- showtimes_by_film_theater_date")
+    print(explain(showtime_queries[0]))
+    print("\n-- theaters_by_film")
+    print(explain(theater_queries[0]))
+    print()
+    measure("showtimes_by_film_theater_date", showtime_queries)
+    measure("theaters_by_film", theater_queries)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark index truy vấn suất chiếu")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help=f"Giữ lại schema {SCHEMA} sau khi chạy")
+    args = parser.parse_args()
+
+    start_date = date.today()
+    setup(args.days, start_date)
+    try:
+        run_phase("Before (single-column indexes)", args.runs, args.days, start_date, args.seed)
+        create_index()
+        run_phase(f"After ({INDEX_NAME})", args.runs, args.days, start_date, args.seed)
+    finally:
+        if not args.keep:
+            with engine.begin() as connection:
+                connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Hủy booking hết hạn với FOR UPDATE SKIP LOCKED: booking đang bị khóa
+(vd: đang xác nhận thanh toán) được bỏ qua thay vì chặn worker
+"""
+from datetime import datetime, timedelta
+from sqlmodel import Session, select
+
+from app.models import Booking
+from app.repositories.booking_repo import BookingRepository
+
+
+def _pending_bookings(session: Session, seed, count: int):
+    booked_at = datetime.utcnow() - timedelta(hours=1)
+    bookings = [
+        Booking(user_id=seed.user_ids[0], showtime_id=seed.showtime_id, total_amount=50000, booking_date=booked_at)
+        for _ in range(count)
+    ]
+    session.add_all(bookings)
+    session.commit()
+    return [booking.id for booking in bookings]
+
+
+def _lock_booking(session: Session, booking_id: int) -> None:
+    session.exec(select(Booking.id).where(Booking.id == booking_id).with_for_update()).one()
+
+
+def test_expire_pending_bookings_skips_locked_rows(db_engine, seed):
+    with Session(db_engine) as session:
+        locked_id, free_id = _pending_bookings(session, seed, 2)
+
+    with Session(db_engine) as locker, Session(db_engine) as worker:
+        _lock_booking(locker, locked_id)
+
+        expired = BookingRepository.expire_pending_bookings(worker, datetime.utcnow(), limit=10)
+        worker.commit()
+        assert [booking_id for booking_id, _, _ in expired] == [free_id]
+
+        locker.rollback()
+        expired = BookingRepository.expire_pending_bookings(worker, datetime.utcnow(), limit=10)
+        worker.commit()
+        assert [booking_id for booking_id, _, _ in expired] == [locked_id]
+
+    with Session(db_engine) as session:
+        statuses = session.exec(select(Booking.booking_status, Booking.payment_status)).all()
+        assert statuses == [("CANCELLED", "FAILED")] * 2
+
+
+def test_expire_bookings_by_ids_ignores_non_pending(db_engine, seed):
+    with Session(db_engine) as session:
+        paid_id, pending_id = _pending_bookings(session, seed, 2)
+        BookingRepository.update_payment_status(session, paid_id, "PAID")
+        session.commit()
+
+        expired = BookingRepository.expire_bookings_by_ids(session, [paid_id, pending_id])
+        session.commit()
+
+        assert [booking_id for booking_id, _, _ in expired] == [pending_id]
+        assert session.get(Booking, paid_id).booking_status == "CONFIRMED"
+
+
+def test_dispatch_due_reschedules_locked_pending_booking(db_engine, seed):
+    from app.utils.booking_expiry import BookingExpiryScheduler
+    from app.worker import expiry_scheduler
+
+    with Session(db_engine) as session:
+        locked_id, free_id = _pending_bookings(session, seed, 2)
+    due = datetime.utcnow() - timedelta(seconds=1)
+    BookingExpiryScheduler.schedule(locked_id, due)
+    BookingExpiryScheduler.schedule(free_id, due)
+
+    with Session(db_engine) as locker:
+        _lock_booking(locker, locked_id)
+        assert expiry_scheduler.dispatch_due() == 1
+
+    # Booking bị khóa vẫn PENDING → được đưa lại vào lịch sau LOCKED_RETRY_DELAY
+    assert BookingExpiryScheduler.pop_due(10) == []
+    wait = BookingExpiryScheduler.seconds_until_next()
+    assert 0 < wait <= expiry_scheduler.LOCKED_RETRY_DELAY
+    BookingExpiryScheduler.schedule(locked_id, due)
+    assert expiry_scheduler.dispatch_due() == 1
+    with Session(db_engine) as session:
+        assert session.get(Booking, locked_id).booking_status == "CANCELLED"
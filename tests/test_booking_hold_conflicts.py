@@ -0,0 +1,65 @@
+"""
+Ghế đang được user khác giữ: bỏ lock strict không bỏ ghế nào, create_booking trả 400 và không tạo booking
+"""
+import pytest
+from fastapi import HTTPException
+from sqlmodel import Session, func, select
+
+from app.models import Booking, BookingDetail
+from app.schemas.booking import BookingCreateRequest
+from app.services.booking_service import BookingService
+from app.utils.redis_lock import SeatLockManager
+
+SHOWTIME_ID = 1
+OWNER_ID = 7
+OTHER_ID = 8
+
+
+def test_strict_unlock_with_conflict_releases_nothing(fake_redis):
+    assert SeatLockManager.lock_seats(SHOWTIME_ID, [1, 2], OWNER_ID, 60) == []
+    assert SeatLockManager.lock_seats(SHOWTIME_ID, [3], OTHER_ID, 60) == []
+
+    released, conflicts = SeatLockManager.unlock_seats(SHOWTIME_ID, [1, 2, 3], OWNER_ID, strict=True)
+
+    assert released == []
+    assert conflicts == [{"seat_id": 3, "user_id": OTHER_ID}]
+    assert SeatLockManager.is_seat_locked(SHOWTIME_ID, 1)
+    assert SeatLockManager.is_seat_locked(SHOWTIME_ID, 2)
+
+
+def test_non_strict_unlock_releases_own_seats(fake_redis):
+    SeatLockManager.lock_seats(SHOWTIME_ID, [1], OWNER_ID, 60)
+    SeatLockManager.lock_seats(SHOWTIME_ID, [3], OTHER_ID, 60)
+
+    released, conflicts = SeatLockManager.unlock_seats(SHOWTIME_ID, [1, 3], OWNER_ID)
+
+    assert released == [1]
+    assert conflicts == [{"seat_id": 3, "user_id": OTHER_ID}]
+    assert not SeatLockManager.is_seat_locked(SHOWTIME_ID, 1)
+    assert SeatLockManager.is_seat_locked(SHOWTIME_ID, 3)
+
+
+def test_create_booking_rejects_seat_held_by_other_user(db_engine, seed):
+    owner_id, other_id = seed.user_ids
+    own_seat, taken_seat, _ = seed.seat_ids
+    SeatLockManager.lock_seats(seed.showtime_id, [own_seat], owner_id, 60)
+    SeatLockManager.lock_seats(seed.showtime_id, [taken_seat], other_id, 60)
+    request = BookingCreateRequest(
+        userId=owner_id,
+        showtimeId=seed.showtime_id,
+        totalAmount=100000,
+        paymentMethod="VNPAY",
+        seats=[{"seat_id": own_seat, "price": 50000}, {"seat_id": taken_seat, "price": 50000}]
+    )
+
+    with Session(db_engine) as session:
+        with pytest.raises(HTTPException) as exc_info:
+            BookingService.create_booking(db=session, booking_request=request, current_user_id=owner_id)
+
+    assert exc_info.value.status_code == 400
+    assert "A2" in exc_info.value.detail
+    with Session(db_engine) as session:
+        assert session.exec(select(func.count()).select_from(Booking)).one() == 0
+        assert session.exec(select(func.count()).select_from(BookingDetail)).one() == 0
+    # Không bỏ lock ghế nào: user vẫn giữ ghế của mình để thử lại
+    assert SeatLockManager.get_seat_lock_info(seed.showtime_id, own_seat)["user_id"] == owner_id
@@ -0,0 +1,91 @@
+"""
+Cache danh mục: chỉ 1 request nạp key đang thiếu (single-flight),
+dữ liệu thay đổi xóa cache theo tag sau khi commit
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlmodel import Session
+
+from app.models import Film
+from app.utils.catalog_cache import CatalogCache
+
+
+class CountingLoader:
+    def __init__(self, value, delay: float = 0.0):
+        self.value = value
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return self.value
+
+
+def _get(loader, key: str = "1", tags=("films", "films:1")):
+    return CatalogCache.get_or_load("film", key, list(tags), 60, loader)
+
+
+def test_concurrent_cold_loads_call_loader_once(fake_redis):
+    loader = CountingLoader({"id": 1, "title": "Test film"}, delay=0.3)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: _get(loader), range(8)))
+
+    assert loader.calls == 1
+    assert results == [{"id": 1, "title": "Test film"}] * 8
+    assert CatalogCache.stats()["film"] == {"hit": 0, "miss": 8}
+
+
+def test_invalidate_tag_drops_dependent_keys(fake_redis):
+    film_loader = CountingLoader({"id": 1})
+    list_loader = CountingLoader([{"id": 1}])
+    _get(film_loader)
+    _get(list_loader, key="all", tags=("films",))
+    _get(film_loader)
+    assert film_loader.calls == 1
+
+    CatalogCache.invalidate({"films:1"})
+    _get(film_loader)
+    _get(list_loader, key="all", tags=("films",))
+
+    assert film_loader.calls == 2
+    assert list_loader.calls == 1
+
+
+def test_result_loaded_before_invalidation_is_not_stored(fake_redis):
+    def loader():
+        # Dữ liệu bị sửa (và cache bị xóa) trong lúc đang đọc DB
+        CatalogCache.invalidate({"films"})
+        return {"id": 1, "title": "old"}
+
+    assert _get(loader) == {"id": 1, "title": "old"}
+    refreshed = CountingLoader({"id": 1, "title": "new"})
+    assert _get(refreshed) == {"id": 1, "title": "new"}
+    assert refreshed.calls == 1
+
+
+def test_film_update_invalidates_after_commit_only(db_engine, seed):
+    loader = CountingLoader({"id": seed.film_id})
+    tags = ("films", f"films:{seed.film_id}")
+    _get(loader, key=str(seed.film_id), tags=tags)
+
+    with Session(db_engine) as session:
+        film = session.get(Film, seed.film_id)
+        film.title = "Renamed"
+        session.add(film)
+        session.flush()
+        session.rollback()
+        _get(loader, key=str(seed.film_id), tags=tags)
+        assert loader.calls == 1
+
+        film = session.get(Film, seed.film_id)
+        film.title = "Renamed"
+        session.add(film)
+        session.commit()
+
+    _get(loader, key=str(seed.film_id), tags=tags)
+    assert loader.calls == 2
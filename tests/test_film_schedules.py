@@ -0,0 +1,107 @@
+"""
+Read model lịch chiếu: suất chiếu / phòng chiếu thay đổi → nhóm (film_id, show_date) được đánh dấu sau commit,
+refresh_dirty tính lại film_schedules và chỉ bỏ đánh dấu sau khi tính lại thành công
+"""
+from datetime import time, timedelta
+import pytest
+from sqlmodel import Session, select
+
+from app.models import CinemaRoom, FilmSchedule, Showtime, Theater
+from app.repositories.film_schedule_repo import FilmScheduleRepository
+from app.services.film_schedule_service import FilmScheduleService
+
+BATCH_SIZE = 100
+
+
+def _pending(fake_redis):
+    return fake_redis.zrange(FilmScheduleService.DIRTY_KEY, 0, -1)
+
+
+def _schedules(session: Session):
+    return session.exec(
+        select(FilmSchedule.film_id, FilmSchedule.theater_id, FilmSchedule.show_date, FilmSchedule.start_times)
+    ).all()
+
+
+def test_showtime_insert_and_update_refresh_schedule(db_engine, fake_redis, seed):
+    assert _pending(fake_redis) == [f"{seed.film_id}:{seed.show_date.isoformat()}"]
+
+    with Session(db_engine) as session:
+        assert FilmScheduleService.refresh_dirty(session, BATCH_SIZE) == 1
+        assert _schedules(session) == [(seed.film_id, seed.theater_id, seed.show_date, [time(19, 0)])]
+        assert _pending(fake_redis) == []
+
+        showtime = session.get(Showtime, seed.showtime_id)
+        showtime.start_time = time(20, 0)
+        session.add(showtime)
+        session.commit()
+        FilmScheduleService.refresh_dirty(session, BATCH_SIZE)
+        assert _schedules(session) == [(seed.film_id, seed.theater_id, seed.show_date, [time(20, 0)])]
+
+        # Đổi ngày chiếu → nhóm cũ (ngày cũ) bị xóa, nhóm mới được tạo
+        new_date = seed.show_date + timedelta(days=1)
+        showtime = session.get(Showtime, seed.showtime_id)
+        showtime.show_date = new_date
+        session.add(showtime)
+        session.commit()
+        assert FilmScheduleService.refresh_dirty(session, BATCH_SIZE) == 2
+        assert _schedules(session) == [(seed.film_id, seed.theater_id, new_date, [time(20, 0)])]
+
+
+def test_rolled_back_change_is_not_marked(db_engine, fake_redis, seed):
+    with Session(db_engine) as session:
+        FilmScheduleService.refresh_dirty(session, BATCH_SIZE)
+        showtime = session.get(Showtime, seed.showtime_id)
+        showtime.status = "CANCELLED"
+        session.add(showtime)
+        session.flush()
+        session.rollback()
+
+    assert _pending(fake_redis) == []
+
+
+def test_room_moved_to_other_theater_refreshes_schedule(db_engine, fake_redis, seed):
+    with Session(db_engine) as session:
+        FilmScheduleService.refresh_dirty(session, BATCH_SIZE)
+        theater = Theater(name="Other theater", address="2 Test", city="Hà Nội")
+        session.add(theater)
+        session.flush()
+        room = session.get(CinemaRoom, seed.room_id)
+        room.theater_id = theater.id
+        session.add(room)
+        session.commit()
+
+        assert _pending(fake_redis) == [f"{seed.film_id}:{seed.show_date.isoformat()}"]
+        FilmScheduleService.refresh_dirty(session, BATCH_SIZE)
+        assert _schedules(session) == [(seed.film_id, theater.id, seed.show_date, [time(19, 0)])]
+
+
+def test_failed_refresh_keeps_keys_pending(db_engine, fake_redis, seed, monkeypatch):
+    def fail(db, keys):
+        raise RuntimeError("worker died")
+
+    monkeypatch.setattr(FilmScheduleRepository, "refresh", staticmethod(fail))
+    with Session(db_engine) as session:
+        with pytest.raises(RuntimeError):
+            FilmScheduleService.refresh_dirty(session, BATCH_SIZE)
+
+    assert _pending(fake_redis) == [f"{seed.film_id}:{seed.show_date.isoformat()}"]
+
+
+def test_key_marked_during_refresh_is_refreshed_again(db_engine, fake_redis, seed, monkeypatch):
+    refresh = FilmScheduleRepository.refresh
+    calls = []
+
+    def refresh_while_marked(db, keys):
+        calls.append(keys)
+        if len(calls) == 1:
+            # Suất chiếu bị sửa (và commit) trong lúc đang tính lại
+            FilmScheduleService.mark_dirty(keys)
+        refresh(db=db, keys=keys)
+
+    monkeypatch.setattr(FilmScheduleRepository, "refresh", staticmethod(refresh_while_marked))
+    with Session(db_engine) as session:
+        assert FilmScheduleService.refresh_dirty(session, BATCH_SIZE) == 2
+
+    assert len(calls) == 2
+    assert _pending(fake_redis) == []
@@ -0,0 +1,50 @@
+"""
+Rate limit cửa sổ trượt: vượt giới hạn trả 429 kèm Retry-After, thống kê allowed/rejected theo tên giới hạn
+"""
+import pytest
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.utils.rate_limit import RateLimiter
+
+
+@pytest.fixture
+def client(fake_redis):
+    app = FastAPI()
+
+    @app.get("/limited", dependencies=[Depends(RateLimiter("test", 2, 60))])
+    def limited():
+        return {"ok": True}
+
+    return TestClient(app)
+
+
+def test_requests_over_limit_get_429_with_retry_after(client):
+    assert client.get("/limited").status_code == 200
+    assert client.get("/limited").status_code == 200
+
+    response = client.get("/limited")
+
+    assert response.status_code == 429
+    assert 1 <= int(response.headers["Retry-After"]) <= 60
+    assert RateLimiter.stats()["test"] == {"allowed": 2, "rejected": 1}
+
+
+def test_limit_is_per_client_ip(fake_redis):
+    limiter = RateLimiter("test", 1, 60)
+    limiter.check("ip:10.0.0.1")
+    limiter.check("ip:10.0.0.2")
+
+    with pytest.raises(HTTPException) as exc_info:
+        limiter.check("ip:10.0.0.1")
+    assert exc_info.value.status_code == 429
+
+
+def test_redis_unavailable_allows_request(monkeypatch):
+    from app.utils import rate_limit
+
+    def unavailable(**kwargs):
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(rate_limit, "_sliding_window_script", unavailable)
+    RateLimiter("test", 0, 60).check("ip:10.0.0.1")
@@ -0,0 +1,60 @@
+"""
+Chuyển ghế sang BOOKED bằng 1 câu UPSERT: ghế đã BOOKED không có trong RETURNING
+→ xác nhận thanh toán phát hiện double-booking (409) và không đổi booking
+"""
+import pytest
+from fastapi import HTTPException
+from sqlmodel import Session, select
+
+from app.models import Booking, BookingDetail, SeatStatus
+from app.repositories.seat_repo import SeatRepository
+from app.services.payment_service import PaymentService
+
+
+def _pending_booking(session: Session, user_id: int, showtime_id: int, seat_ids) -> int:
+    booking = Booking(user_id=user_id, showtime_id=showtime_id, total_amount=50000 * len(seat_ids))
+    session.add(booking)
+    session.flush()
+    session.add_all([BookingDetail(booking_id=booking.id, seat_id=seat_id, price=50000) for seat_id in seat_ids])
+    session.commit()
+    return booking.id
+
+
+def test_book_seats_returns_only_newly_booked_seats(db_engine, seed):
+    held_seat, booked_seat, new_seat = seed.seat_ids
+    with Session(db_engine) as session:
+        session.add_all([
+            SeatStatus(seat_id=held_seat, showtime_id=seed.showtime_id, status="HOLD", hold_by_user_id=seed.user_ids[0]),
+            SeatStatus(seat_id=booked_seat, showtime_id=seed.showtime_id, status="BOOKED"),
+        ])
+        session.commit()
+
+        booked = SeatRepository.book_seats(session, seed.showtime_id, [held_seat, booked_seat, new_seat])
+        session.commit()
+
+        assert sorted(booked) == [held_seat, new_seat]
+        statuses = session.exec(
+            select(SeatStatus.seat_id, SeatStatus.status, SeatStatus.hold_by_user_id)
+            .where(SeatStatus.showtime_id == seed.showtime_id)
+        ).all()
+        assert sorted(statuses) == sorted([(seat_id, "BOOKED", None) for seat_id in seed.seat_ids])
+
+
+def test_confirm_payment_rejects_double_booking(db_engine, seed):
+    first_user, second_user = seed.user_ids
+    seat_id = seed.seat_ids[0]
+    with Session(db_engine) as session:
+        first_id = _pending_booking(session, first_user, seed.showtime_id, [seat_id])
+        second_id = _pending_booking(session, second_user, seed.showtime_id, [seat_id])
+
+    with Session(db_engine) as session:
+        assert PaymentService.confirm_vnpay_payment(session, first_id, "00")["status"] == "success"
+
+    with Session(db_engine) as session:
+        with pytest.raises(HTTPException) as exc_info:
+            PaymentService.confirm_vnpay_payment(session, second_id, "00")
+
+    assert exc_info.value.status_code == 409
+    with Session(db_engine) as session:
+        assert session.get(Booking, first_id).payment_status == "PAID"
+        assert session.get(Booking, second_id).payment_status == "PENDING"
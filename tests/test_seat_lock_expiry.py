@@ -0,0 +1,46 @@
+"""
+Ghế hết hạn giữ phải làm tăng version sơ đồ ghế (ETag / since / SSE thấy ghế trống trở lại)
+Chạy Lua script của SeatLockManager trên fakeredis (cần fakeredis + lupa)
+"""
+import time
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+from app.utils import redis_lock
+from app.utils.redis_lock import SeatLockManager
+
+SHOWTIME_ID = 1
+USER_ID = 7
+SEAT_ID = 42
+
+
+@pytest.fixture
+def client():
+    return fakeredis.FakeStrictRedis(decode_responses=True)
+
+
+def _map_version(client) -> int:
+    return int(redis_lock._get_map_version_script(
+        keys=SeatLockManager._get_index_keys(SHOWTIME_ID),
+        client=client
+    ))
+
+
+def test_expired_hold_bumps_map_version(client):
+    keys, args = SeatLockManager._lock_seats_params(SHOWTIME_ID, [SEAT_ID], USER_ID, 1, {SEAT_ID: 0})
+    assert redis_lock._lock_seats_script(keys=keys, args=args, client=client) == []
+    held_version = _map_version(client)
+
+    time.sleep(2.1)
+
+    assert _map_version(client) > held_version
+    version, complete, seat_ids = redis_lock._get_map_changes_script(
+        keys=SeatLockManager._get_index_keys(SHOWTIME_ID),
+        args=[held_version],
+        client=client
+    )
+    assert complete == 1
+    assert [int(seat_id) for seat_id in seat_ids] == [SEAT_ID]
+    assert client.getbit(f"{SeatLockManager.HELD_BITS_PREFIX}:{SHOWTIME_ID}", 0) == 0
@@ -0,0 +1,92 @@
+"""
+Cache token đã xác thực: logout / user thay đổi xóa cache, put sau khi cache bị xóa bị bỏ qua,
+user bị sửa chỉ xóa cache sau khi commit
+"""
+import time
+import pytest
+from sqlmodel import Session
+
+from app.models import User
+from app.utils.token_cache import TokenCache
+
+TOKEN = "access-token"
+
+
+@pytest.fixture
+def token_cache(fake_redis, monkeypatch):
+    """Cache ở trạng thái đang nghe kênh pub/sub, không khởi động thread listener"""
+    monkeypatch.setattr(TokenCache, "_ensure_listener", staticmethod(lambda: None))
+    TokenCache._drop_all()
+    TokenCache._listening.set()
+    yield TokenCache
+    TokenCache._listening.clear()
+    TokenCache._drop_all()
+
+
+def _user(user_id: int = 1) -> User:
+    return User(id=user_id, username=f"user{user_id}", password="x", email=f"user{user_id}@example.com")
+
+
+def _exp() -> int:
+    return int(time.time()) + 600
+
+
+def test_put_then_get_returns_copy(token_cache):
+    token_cache.put(TOKEN, _user(), _exp(), token_cache.generation())
+
+    cached = token_cache.get(TOKEN)
+    assert cached.id == 1
+    assert cached is not token_cache.get(TOKEN)
+
+
+def test_logout_revokes_token(token_cache, fake_redis):
+    pubsub = fake_redis.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(TokenCache.CHANNEL)
+    token_cache.put(TOKEN, _user(), _exp(), token_cache.generation())
+
+    token_cache.invalidate_token(TOKEN)
+
+    assert token_cache.get(TOKEN) is None
+    messages = [pubsub.get_message(timeout=0.1) for _ in range(3)]
+    assert [message["data"] for message in messages if message] == [f"token:{TokenCache._key(TOKEN)}"]
+
+
+def test_put_skipped_after_invalidation_since_generation(token_cache):
+    # Request lấy generation, kiểm tra blacklist xong thì user bị sửa ở tiến trình khác
+    generation = token_cache.generation()
+    TokenCache._on_invalidation("user:1")
+
+    token_cache.put(TOKEN, _user(), _exp(), generation)
+
+    assert token_cache.get(TOKEN) is None
+
+
+def test_put_skipped_while_not_listening(token_cache):
+    TokenCache._listening.clear()
+    token_cache.put(TOKEN, _user(), _exp(), token_cache.generation())
+
+    TokenCache._listening.set()
+    assert token_cache.get(TOKEN) is None
+
+
+def test_user_update_invalidates_after_commit_only(token_cache, db_engine, seed):
+    user_id = seed.user_ids[0]
+    with Session(db_engine) as session:
+        user = session.get(User, user_id)
+        token_cache.put(TOKEN, user, _exp(), token_cache.generation())
+
+        user.role = "ADMIN"
+        session.add(user)
+        session.flush()
+        session.rollback()
+        assert token_cache.get(TOKEN) is not None
+
+        user = session.get(User, user_id)
+        user.role = "ADMIN"
+        session.add(user)
+        session.flush()
+        # Chưa commit: request khác vẫn thấy user cũ trong DB, xóa cache lúc này vô ích
+        assert token_cache.get(TOKEN) is not None
+        session.commit()
+
+    assert token_cache.get(TOKEN) is None